@@ -51,6 +51,49 @@ class Settings(BaseSettings):
     docs_url: str | None = config["docs_url"]
     redoc_url: str | None = config["redoc_url"]
     secret_key_name: str = config["secret_key_name"]
+    secret_keys_file: str = getenv("SECRET_KEYS_FILE", config["secret_keys_file"])
+    secret_keys_reload_interval: float = float(config["secret_keys_reload_interval"])
+    executor_backend: str = config["executor_backend"]
+    executor_max_workers: int = int(config["executor_max_workers"])
+    executor_max_queue: int = int(config["executor_max_queue"])
+    batch_max_subjects: int = int(config["batch_max_subjects"])
+    batch_chunk_size: int = int(config["batch_chunk_size"])
+    ephemeris_max_samples: int = int(config["ephemeris_max_samples"])
+    transit_events_max_days: int = int(config["transit_events_max_days"])
+    subject_cache_max_size: int = int(config["subject_cache_max_size"])
+    subject_cache_ttl: int = int(config["subject_cache_ttl"])
+    natal_session_max_size: int = int(config["natal_session_max_size"])
+    natal_session_ttl: int = int(config["natal_session_ttl"])
+    chart_cache_backend: str = config["chart_cache_backend"]
+    chart_cache_directory: str = config["chart_cache_directory"]
+    chart_cache_max_size: int = int(config["chart_cache_max_size"])
+    chart_cache_ttl: int = int(config["chart_cache_ttl"])
+    geocoding_index_path: str = getenv("GEOCODING_INDEX_PATH", config["geocoding_index_path"])
+    geocoding_cache_backend: str = config["geocoding_cache_backend"]
+    geocoding_cache_path: str = config["geocoding_cache_path"]
+    geocoding_cache_max_size: int = int(config["geocoding_cache_max_size"])
+    geocoding_cache_ttl: int = int(config["geocoding_cache_ttl"])
+    geocoding_cache_negative_ttl: int = int(config["geocoding_cache_negative_ttl"])
+    geonames_timeout: float = float(config["geonames_timeout"])
+    time_sync_enabled: bool = config["time_sync_enabled"]
+    time_sync_ntp_server: str = config["time_sync_ntp_server"]
+    time_sync_interval: int = int(config["time_sync_interval"])
+    time_sync_timeout: float = float(config["time_sync_timeout"])
+    compression_enabled: bool = config["compression_enabled"]
+    compression_minimum_size: int = int(config["compression_minimum_size"])
+    rate_limit_enabled: bool = config["rate_limit_enabled"]
+    rate_limit_backend: str = config["rate_limit_backend"]
+    rate_limit_path: str = config["rate_limit_path"]
+    rate_limit_rate: float = float(config["rate_limit_rate"])
+    rate_limit_burst: float = float(config["rate_limit_burst"])
+    rate_limit_max_in_flight: int = int(config["rate_limit_max_in_flight"])
+    rate_limit_default_cost: float = float(config["rate_limit_default_cost"])
+    rate_limit_costs: dict = config["rate_limit_costs"]
+    server_timing_enabled: bool = config["server_timing_enabled"]
+    metrics_enabled: bool = config["metrics_enabled"]
+    profiling_admin_keys: list = config["profiling_admin_keys"]
+    profiling_directory: str = config["profiling_directory"]
+    profiling_sampling_interval: float = float(config["profiling_sampling_interval"])
 
     # Common settings
     log_level: int = int(config["log_level"])
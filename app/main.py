@@ -2,18 +2,47 @@
     This is part of Astrologer API (C) 2023 Giacomo Battaglia
 """
 
+import asyncio
 import logging
 import logging.config
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from .routers import main_router
+from .routers import main_router, metrics_router
 from .config.settings import settings
 from .middleware.secret_key_checker_middleware import SecretKeyCheckerMiddleware
+from .middleware.compression_middleware import CompressionMiddleware
+from .middleware.rate_limit_middleware import RateLimitMiddleware
+from .middleware.server_timing_middleware import ServerTimingMiddleware
+from .middleware.metrics_middleware import MetricsMiddleware
+from .middleware.profiling_middleware import ProfilingMiddleware
+from .utils.chart_executor import chart_executor
+from .utils.fast_json_response import FastJsonResponse
+from .utils.secret_key_registry import secret_key_registry
+from .utils.rate_limiter import rate_limiter
+from .utils.request_profiler import get_profiles_directory
+from .utils.request_metrics import request_metrics
+from .utils.time_sync import time_sync
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    time_sync_task = asyncio.create_task(time_sync.run()) if settings.time_sync_enabled else None
+    now_snapshot_task = asyncio.create_task(main_router.now_snapshot.run())
+
+    yield
+
+    now_snapshot_task.cancel()
+    if time_sync_task is not None:
+        time_sync_task.cancel()
+    chart_executor.shutdown()
 
 
 logging.config.dictConfig(settings.LOGGING_CONFIG)
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=FastJsonResponse,
     debug=settings.debug,
     docs_url=settings.docs_url,
     redoc_url=settings.redoc_url,
@@ -348,81 +377,6 @@ WIDGET_HTML = r'''<!doctype html>
     }
   }
 
-  // === Endpoints auxiliares ===
-  async function fetchAsc(subject){
-    const tryEndpoints = ['/natal-positions','/positions','/natal-points','/points','/chart-data','/natal-aspects-data'];
-    for(const ep of tryEndpoints){
-      try{
-        const res = await callWithFallbacks(APIBASE+ep, {subject, language:LANG, active_points:["Ascendant"]}, false);
-        const lists = [res?.points, res?.planets, res?.data?.points, res?.data?.planets, Array.isArray(res)?res: null].filter(Boolean);
-        const arr = lists[0] || [];
-        for(const p of arr){
-          const name = toCanon(p.name ?? p.point ?? p.id ?? p.code ?? p.label);
-          if(name==="Ascendant"){
-            const v = getLonFromObj(p);
-            if(Number.isFinite(v)) return clamp360(v);
-          }
-        }
-      }catch(_){}
-    }
-    return null;
-  }
-
-  // PLANETAS: obtenemos longitudes y, si el backend lo trae, **número de casa** directo.
-  async function fetchPlanetPositionsAndHouses(subject){
-    const tryEndpoints = ['/natal-positions','/positions','/natal-points','/points','/chart-data'];
-    for(const ep of tryEndpoints){
-      try{
-        const res = await callWithFallbacks(APIBASE+ep, {subject, language:LANG, active_points:["Sun","Moon","Mercury","Venus","Mars","Jupiter","Saturn","Uranus","Neptune","Pluto","Ascendant","Medium_Coeli"]}, false);
-        const lists = [res?.planets, res?.points, res?.data?.planets, res?.data?.points, Array.isArray(res)?res: null].filter(Boolean);
-        const arr = lists[0] || [];
-        const lonBy = {}, houseBy = {};
-        for(const p of arr){
-          const canon = toCanon(p.name ?? p.point ?? p.id ?? p.code ?? p.label);
-          const lon = getLonFromObj(p);
-          if(Number.isFinite(lon)) lonBy[canon] = clamp360(lon);
-          // Casa puede venir como: house, house_index, house_no, house_number, domus…
-          const hv = p.house ?? p.house_index ?? p.house_no ?? p.house_number ?? p.domus ?? p?.position?.house ?? p?.domicile ?? null;
-          if(hv!=null){
-            const n = parseInt(hv,10);
-            if(Number.isFinite(n) && n>=1 && n<=12) houseBy[canon] = n;
-          }
-        }
-        return {lonBy, houseBy};
-      }catch(_){}
-    }
-    return {lonBy:{}, houseBy:{}};
-  }
-
-  // Cúspides (para calcular casas si el backend NO trae house por planeta)
-  async function fetchCusps(subject){
-    const tryEndpoints = ['/natal-houses','/houses','/natal-chart-data','/natal-positions','/chart-data','/natal-aspects-data'];
-    for(const ep of tryEndpoints){
-      try{
-        const res = await callWithFallbacks(APIBASE+ep, {subject, language:LANG, active_points:["Ascendant","Medium_Coeli"]}, false);
-        const candidates = [
-          res?.house_cusps, res?.houses, res?.cusps, res?.houses_cusps,
-          res?.data?.house_cusps, res?.data?.houses, res?.data?.cusps,
-          res?.chart?.house_cusps, res?.chart?.houses, res?.chart?.cusps
-        ];
-        for(const cont of candidates){
-          if(!cont) continue;
-          const out=[null];
-          if(Array.isArray(cont) && cont.length>=12){
-            for(let i=0;i<12;i++){ const v=getLonFromObj(cont[i]); out[i+1]=Number.isFinite(v)?clamp360(v):null; }
-          }else if(typeof cont==='object'){
-            for(let i=1;i<=12;i++){
-              const v = getLonFromObj(cont[i] ?? cont[`cusp${i}`] ?? cont[`house${i}`] ?? cont[`house_${i}`] ?? cont[`H${i}`] ?? cont[`House${i}`]);
-              out[i] = Number.isFinite(v)?clamp360(v):null;
-            }
-          }
-          if(out.slice(1).every(x=>Number.isFinite(x))) return out;
-        }
-      }catch(_){}
-    }
-    return [];
-  }
-
   // === Generar ===
   async function generar(){
     try{
@@ -445,35 +399,21 @@ WIDGET_HTML = r'''<!doctype html>
 
       const active_points=["Sun","Moon","Mercury","Venus","Mars","Jupiter","Saturn","Uranus","Neptune","Pluto","Ascendant","Medium_Coeli","Mean_Node","Mean_South_Node","Chiron","Mean_Lilith"];
 
-      // 1) Gráfico (SVG)
-      const svg = await callWithFallbacks(APIBASE+'/birth-chart',{ subject, language:LANG, theme:THEME, style:THEME, chart_theme:THEME, active_points }, true);
-      if(svg && svg.includes('<svg')) $svg.innerHTML = svg;
-
-      // 2) Aspectos
-      const data = await callWithFallbacks(APIBASE+'/natal-aspects-data',{ subject, language:LANG, active_points }, false);
-      const aspects = (data && (data.aspects||data.natal_aspects)) ? (data.aspects||data.natal_aspects) : [];
-
-      // 3) Posiciones planetarias + casas del backend (si están)
-      const {lonBy, houseBy} = await fetchPlanetPositionsAndHouses(subject);
-
-      // 4) Si faltan longitudes, intentar recuperarlas desde los aspectos
-      if(Object.keys(lonBy).length < 10){
-        aspects.forEach(a=>{
-          const n1 = toCanon(a.p1_name ?? a.point_1 ?? a.point1 ?? a.p1 ?? a.object1 ?? a.planet1);
-          const n2 = toCanon(a.p2_name ?? a.point_2 ?? a.point2 ?? a.p2 ?? a.object2 ?? a.planet2);
-          const l1 = parseAngleAny(a.p1_abs_pos ?? a.p1_longitude ?? a.p1_lon ?? a?.p1?.longitude);
-          const l2 = parseAngleAny(a.p2_abs_pos ?? a.p2_longitude ?? a.p2_lon ?? a?.p2?.longitude);
-          if(Number.isFinite(l1) && !lonBy[n1]) lonBy[n1]=clamp360(l1);
-          if(Number.isFinite(l2) && !lonBy[n2]) lonBy[n2]=clamp360(l2);
-        });
-      }
-
-      // 5) Si NO hay casa por planeta, calculamos con cúspides o Whole Sign (con ASC)
-      let cusps = [];
-      if(Object.keys(houseBy).length < 5){ // si el backend no dio casi nada
-        cusps = await fetchCusps(subject);
+      // 1) Gráfico, posiciones con casas, cúspides, ASC/MC y aspectos en una sola llamada
+      const bundle = await callWithFallbacks(APIBASE+'/natal-bundle',{ subject, language:LANG, theme:THEME, active_points }, false);
+      const svg = bundle.chart || '';
+      if(svg.includes('<svg')) $svg.innerHTML = svg;
+      const aspects = bundle.aspects || [];
+
+      const lonBy = {}, houseBy = {};
+      for(const p of (bundle.points || [])){
+        const canon = toCanon(p.name);
+        const lon = getLonFromObj(p);
+        if(Number.isFinite(lon)) lonBy[canon] = clamp360(lon);
+        if(Number.isFinite(p.house_number)) houseBy[canon] = p.house_number;
       }
-      const ascLon = await fetchAsc(subject);
+      const cusps = (bundle.house_cusps || []).length === 12 ? [null, ...bundle.house_cusps.map(clamp360)] : [];
+      const ascLon = Number.isFinite(bundle.ascendant) ? clamp360(bundle.ascendant) : null;
 
       function houseOfByCusps(lon){
         if(!cusps || cusps.filter(x=>Number.isFinite(x)).length!==12) return null;
@@ -609,10 +549,30 @@ def widget():
 
 app.include_router(main_router.router, tags=["Endpoints"])
 
+if settings.metrics_enabled:
+    app.include_router(metrics_router.router)
+
 #------------------------------------------------------------------------------
 # Middleware 
 #------------------------------------------------------------------------------
 
+# Added first, so that it runs after the secret key check
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=rate_limiter,
+        costs=settings.rate_limit_costs,
+        default_cost=settings.rate_limit_default_cost,
+    )
+
+# Added before the secret key checker, so that it runs after it and sees the key label
+app.add_middleware(
+    ProfilingMiddleware,
+    directory=get_profiles_directory(),
+    admin_keys=settings.profiling_admin_keys,
+    always_allowed=settings.debug,
+)
+
 if settings.debug is True:
     pass
 
@@ -620,7 +580,16 @@ else:
     app.add_middleware(
         SecretKeyCheckerMiddleware,
         secret_key_name=settings.secret_key_name,
-        secret_keys=[
-            settings.rapid_api_secret_key,
-        ],
+        registry=secret_key_registry,
+        excluded_paths=["/metrics"] if settings.metrics_enabled else [],
     )
+
+if settings.server_timing_enabled:
+    app.add_middleware(ServerTimingMiddleware)
+
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
+# Added last, so that the rejected requests are counted too
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, metrics=request_metrics)
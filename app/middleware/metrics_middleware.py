@@ -0,0 +1,43 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.request_metrics import RequestMetrics
+
+
+class MetricsMiddleware:
+    """
+    Counts the requests by endpoint, method and status, and observes their duration until the last byte.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            # The route is set in the scope by the router, when the path matches one
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            self.metrics.observe_request(endpoint, scope["method"], status, time.perf_counter() - start)
@@ -0,0 +1,74 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import asyncio
+from logging import getLogger
+from pathlib import Path
+from typing import Iterable
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.request_profiler import PROFILE_MODES, save_profile, start_profile
+
+
+logger = getLogger(__name__)
+
+PROFILE_HEADER = b"x-debug-profile"
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the calculations of the requests with the X-Debug-Profile header
+    (cprofile or sampling), saves the profile in `directory` and sends the name
+    of the file in the X-Debug-Profile-File header.
+
+    The header is accepted for every request when `always_allowed` (debug mode),
+    otherwise only for the secret key labels in `admin_keys`, stored by
+    SecretKeyCheckerMiddleware, which must run first. It is ignored for the others.
+    """
+
+    def __init__(self, app: ASGIApp, directory: str | Path, admin_keys: Iterable[str] = (), always_allowed: bool = False) -> None:
+        self.app = app
+        self.directory = Path(directory)
+        self.admin_keys = frozenset(admin_keys)
+        self.always_allowed = always_allowed
+
+    def get_mode(self, scope: Scope) -> str | None:
+        mode = next((value.decode("latin-1").strip().lower() for name, value in scope["headers"] if name == PROFILE_HEADER), None)
+        if mode is None:
+            return None
+
+        if mode not in PROFILE_MODES:
+            logger.warning(f"Ignoring invalid profile mode '{mode}'")
+            return None
+
+        if not self.always_allowed and scope.get("state", {}).get("secret_key_label") not in self.admin_keys:
+            logger.warning(f"Ignoring profile request for {scope['path']}: not an admin key")
+            return None
+
+        return mode
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = self.get_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = start_profile(mode)  # type: ignore
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                path = await asyncio.to_thread(save_profile, profile, self.directory)
+                if path is not None:
+                    MutableHeaders(scope=message).append("X-Debug-Profile-File", path.name)
+                    logger.info(f"Saved the {mode} profile of {scope['path']} in {path}")
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_profile)
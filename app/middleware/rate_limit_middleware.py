@@ -0,0 +1,77 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import asyncio
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..utils.rate_limiter import RateLimiter, get_retry_after
+
+
+class RateLimitMiddleware:
+    """
+    Admission control per API key: token bucket rate and in-flight requests limits.
+
+    The key is the label stored by SecretKeyCheckerMiddleware, which must run first,
+    or the client address when the secret key is not checked. Every path costs
+    `costs[path]` tokens, the other /api/ paths cost `default_cost` and the
+    remaining ones are not limited. Rejected requests get a 429 with Retry-After.
+
+    The limiters that block (the SQLite one) are called in a thread, not on the event loop.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter, costs: dict[str, float] | None = None, default_cost: float = 1) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.costs = costs or {}
+        self.default_cost = default_cost
+
+    def get_cost(self, path: str) -> float:
+        cost = self.costs.get(path)
+        if cost is not None:
+            return cost
+
+        return self.default_cost if path.startswith("/api/") else 0
+
+    @staticmethod
+    def get_key(scope: Scope) -> str:
+        label = scope.get("state", {}).get("secret_key_label")
+        if label:
+            return label
+
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cost = self.get_cost(scope["path"])
+        if cost <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter.blocking:
+            slot, retry_after = await asyncio.to_thread(self.limiter.acquire, self.get_key(scope), cost)
+        else:
+            slot, retry_after = self.limiter.acquire(self.get_key(scope), cost)
+
+        if slot is None:
+            response = JSONResponse(
+                status_code=429,
+                content={"status": "KO", "message": "Too Many Requests"},
+                headers={"Retry-After": get_retry_after(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if self.limiter.blocking:
+                await asyncio.to_thread(self.limiter.release, slot)
+            else:
+                self.limiter.release(slot)
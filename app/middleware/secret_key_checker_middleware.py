@@ -2,31 +2,56 @@
     This is part of Astrologer API (C) 2023 Giacomo Battaglia
 """
 
-from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
 from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Iterable
 import logging
 
+from ..utils.secret_key_registry import SecretKeyRegistry
+
+
 class SecretKeyCheckerMiddleware:
-    def __init__(self, app: ASGIApp, secret_key_name: str, secret_keys: list = []) -> None:
+    """
+    Rejects the requests without a valid secret key header, except the ones to `excluded_paths`.
+    The label of the key is stored in the request state as secret_key_label.
+    """
+
+    def __init__(self, app: ASGIApp, secret_key_name: str, registry: SecretKeyRegistry, excluded_paths: Iterable[str] = ()) -> None:
         self.app = app
-        self.secret_key_values = list(secret_keys)
+        self.registry = registry
+        self.excluded_paths = frozenset(excluded_paths)
         self.secret_key_name = secret_key_name
+        self.header_name = secret_key_name.lower().encode("latin-1")
 
-        if not self.secret_key_name or not self.secret_key_values:
+        # Without any key the requests are let through, unless a keys file is configured: then they are rejected until it has keys
+        self.enabled = bool(self.secret_key_name) and (len(self.registry) > 0 or self.registry.keys_file is not None)
+
+        if not self.enabled:
             logging.critical("Secret key name or secret key values not set. The middleware will let all requests pass through!")
+        elif len(self.registry) == 0:
+            logging.critical(f"No secret keys loaded from {self.registry.keys_file}. The middleware will reject all requests until the file has keys!")
+
+    def _get_header_key(self, scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                return value.decode("latin-1").split(":")[0]
+
+        return ""
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        headers = Headers(scope=scope)
-        header_key = headers.get(self.secret_key_name, "").split(":")[0]
-        is_valid_key = False
+        # Lifespan events have no headers, only requests are checked
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.enabled or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
 
-        for key in self.secret_key_values:
-            if header_key == key:
-                is_valid_key = True
-                break
+        label = self.registry.check(self._get_header_key(scope))
 
-        if is_valid_key:
+        if label is not None:
+            scope.setdefault("state", {})["secret_key_label"] = label
             await self.app(scope, receive, send)
 
         else:
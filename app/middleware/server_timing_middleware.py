@@ -0,0 +1,44 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.stage_timings import get_server_timing_header, stage_histograms, start_timings
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the stage timings of every request, sends them in the Server-Timing
+    header, with the total time until the response starts, and adds them to the
+    stage histograms of the endpoint.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings = start_timings()
+
+        async def send_with_timings(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timings["total"] = time.perf_counter() - start
+                MutableHeaders(scope=message).append("Server-Timing", get_server_timing_header(timings))
+
+                # The route is known only after the routing, unmatched paths are not aggregated
+                route = scope.get("route")
+                if route is not None:
+                    for stage, duration in timings.items():
+                        stage_histograms.observe((route.path, stage), duration)
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_timings)
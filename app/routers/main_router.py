@@ -1,22 +1,43 @@
 # External Libraries
+import asyncio
+from datetime import datetime, timezone
+from functools import partial
+from typing import AsyncIterator, Callable, Optional, get_args
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from logging import getLogger
 from kerykeion import (
-    AstrologicalSubject, 
-    KerykeionChartSVG, 
-    SynastryAspects, 
-    NatalAspects, 
-    RelationshipScoreFactory, 
+    AstrologicalSubject,
+    KerykeionChartSVG,
     CompositeSubjectFactory
 )
+from kerykeion.kr_types import Houses
 from kerykeion.settings.config_constants import DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS
 
 # Local
+from ..config.settings import settings
 from ..utils.internal_server_error_json_response import InternalServerErrorJsonResponse
-from ..utils.get_time_from_google import get_time_from_google
+from ..utils.service_unavailable_json_response import ServiceUnavailableJsonResponse
+from ..utils.time_sync import time_sync
+from ..utils.minute_snapshot import MinuteSnapshot
 from ..utils.write_request_to_log import get_write_request_to_log
+from ..utils.build_astrological_subject import build_astrological_subject
+from ..utils.chart_executor import chart_executor, ExecutorQueueFullError
+from ..utils.chart_cache import chart_cache, get_chart_cache_key
+from ..utils.ephemeris import calculate_ephemeris, get_sample_timestamps
+from ..utils.transit_events import find_transit_events
+from ..utils.resolve_city_location import GeonamesUnavailableError
+from ..utils.aspects import AspectMatrixRelationshipScoreFactory, calculate_cross_aspects, calculate_natal_aspects
+from ..utils.natal_sessions import NatalSession, NatalSessionNotFoundError, get_natal_id, get_natal_session, natal_sessions
+from ..utils.fast_json_response import FastJsonResponse
+from ..utils.stage_timings import time_stage
+from ..utils.request_metrics import request_metrics
+from ..utils.svg_response import SVG_MEDIA_TYPE, SvgResponse, accepts_svg
+from ..utils.compression import negotiate_encoding
+from ..utils.ndjson_streaming_response import NDJsonStreamingResponse, accepts_ndjson
+from ..utils.columnar import ColumnarFormat, ColumnarResponse, columns_to_table, encode_columnar, get_columnar_format, rows_to_table
 from ..types.request_models import (
+    SubjectModel,
     BirthDataRequestModel,
     BirthChartRequestModel,
     SynastryChartRequestModel,
@@ -24,7 +45,13 @@ from ..types.request_models import (
     RelationshipScoreRequestModel,
     SynastryAspectsRequestModel,
     NatalAspectsRequestModel,
-    CompositeChartRequestModel
+    CompositeChartRequestModel,
+    BatchBirthDataRequestModel,
+    BatchNatalAspectsRequestModel,
+    NatalBundleRequestModel,
+    EphemerisRequestModel,
+    TransitEventsRequestModel,
+    NatalSessionRequestModel,
 )
 from ..types.response_models import (
     BirthDataResponseModel,
@@ -35,180 +62,214 @@ from ..types.response_models import (
     CompositeChartResponseModel,
     CompositeAspectsResponseModel,
     TransitAspectsResponseModel,
-    TransitChartResponseModel
+    TransitChartResponseModel,
+    BatchBirthDataResponseModel,
+    BatchNatalAspectsResponseModel,
+    NatalBundleResponseModel,
+    EphemerisResponseModel,
+    TransitEventsResponseModel,
+    NatalSessionResponseModel,
 )
 
 logger = getLogger(__name__)
 write_request_to_log = get_write_request_to_log(logger)
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJsonResponse)
+
+ChartRequestModel = BirthChartRequestModel | SynastryChartRequestModel | TransitChartRequestModel | CompositeChartRequestModel | NatalBundleRequestModel
+
+# "First_House" -> 1, ..., "Twelfth_House" -> 12
+HOUSE_NUMBERS = {house: number for number, house in enumerate(get_args(Houses), start=1)}
+
+# Documentation of the raw SVG mode of the chart endpoints
+SVG_CHART_RESPONSES: dict = {200: {"content": {SVG_MEDIA_TYPE: {}}}}
+
+NATAL_SESSION_ERROR_MESSAGE = "Unknown or expired natal_id. Please create the natal session again, with the same subject it gets the same natal_id."
+
+GEONAMES_UNAVAILABLE_MESSAGE = "The GeoNames service is unavailable or refused the request (network error, exhausted credits or disabled username). Please try again later, or send the latitude, longitude and timezone of the subject instead of the geonames_username."
 
 GEONAMES_ERROR_MESSAGE = "City/Nation name error or invalid GeoNames username. Please check your username or city name and try again. You can create a free username here: https://www.geonames.org/login/. If you want to bypass the usage of GeoNames, please remove the geonames_username field from the request. Note: The nation field should be the country code (e.g. US, UK, FR, DE, etc.)."
 
-@router.get("/api/v4/health", response_description="Health check", include_in_schema=False)
-async def health(request: Request) -> JSONResponse:
+# Classes of the errors of the batch items in the metrics, by message
+BATCH_ERROR_CLASSES = {GEONAMES_ERROR_MESSAGE: "geonames", GEONAMES_UNAVAILABLE_MESSAGE: "geonames_unavailable"}
+
+
+def get_error_message(e: Exception) -> str:
     """
-    Health check endpoint.
+    Returns the message shown to the client for a failed calculation.
     """
 
-    write_request_to_log(20, request, "Health check")
+    if isinstance(e, GeonamesUnavailableError):
+        return GEONAMES_UNAVAILABLE_MESSAGE
 
-    return JSONResponse(content={"status": "OK"}, status_code=200)
+    if "data found for this city" in str(e):
+        return GEONAMES_ERROR_MESSAGE
 
+    return "Internal Server Error"
 
-@router.get("/", response_description="Status of the API", response_model=BirthDataResponseModel, include_in_schema=False)
-async def status(request: Request) -> JSONResponse:
+
+def get_error_class(e: Exception) -> str:
     """
-    Returns the status of the API.
+    Class of the error in the metrics: "queue_full", "geonames", "geonames_unavailable", "natal_session" or "internal".
     """
 
-    from ..config.settings import settings
+    if isinstance(e, ExecutorQueueFullError):
+        return "queue_full"
 
-    write_request_to_log(20, request, "API is up and running")
-    response_dict = {
-        "status": "OK",
-        "environment": settings.env_type,
-        "debug": settings.debug,
-    }
+    if isinstance(e, GeonamesUnavailableError):
+        return "geonames_unavailable"
 
-    return JSONResponse(content=response_dict, status_code=200)
+    if isinstance(e, NatalSessionNotFoundError):
+        return "natal_session"
 
+    if "data found for this city" in str(e):
+        return "geonames"
 
-@router.get("/api/v4/now", response_description="Current astrological data", response_model=BirthDataResponseModel)
-async def get_now(request: Request) -> JSONResponse:
+    return "internal"
+
+
+def get_endpoint(request: Request) -> str:
+    route = request.scope.get("route")
+
+    return route.path if route is not None else request.url.path
+
+
+def get_error_json_response(request: Request, e: Exception) -> JSONResponse:
     """
-    Retrieve astrological data for the current moment.
+    Logs and counts the exception and converts it to the matching error response.
     """
 
-    # Get current UTC time from the time API
-    write_request_to_log(20, request, "Getting current astrological data")
-    
-    logger.debug("Getting current UTC time from the time API")
-    try:
-        utc_datetime = get_time_from_google()
-        datetime_dict = {
-            "year": utc_datetime.year, # type: ignore
-            "month": utc_datetime.month, # type: ignore
-            "day": utc_datetime.day, # type: ignore
-            "hour": utc_datetime.hour, # type: ignore
-            "minute": utc_datetime.minute, # type: ignore
-            "second": utc_datetime.second, # type: ignore
-        }
-    except Exception as e:
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
-    logger.debug(f"Current UTC time: {datetime_dict}")
+    write_request_to_log(40, request, e)
 
-    try:
-        # On some Cloud providers, the time is not set correctly, so we need to get the current UTC time from the time API
-        today_subject = AstrologicalSubject(
-            city="GMT",
-            nation="UK",
-            lat=51.477928,
-            lng=-0.001545,
-            tz_str="GMT",
-            year=datetime_dict["year"],
-            month=datetime_dict["month"],
-            day=datetime_dict["day"],
-            hour=datetime_dict["hour"],
-            minute=datetime_dict["minute"],
-            online=False,
+    error_class = get_error_class(e)
+    request_metrics.count_error(get_endpoint(request), error_class)
+
+    if error_class == "queue_full":
+        return ServiceUnavailableJsonResponse
+
+    if error_class == "geonames":
+        return FastJsonResponse(
+            content={
+                "status": "ERROR",
+                "message": GEONAMES_ERROR_MESSAGE,
+            },
+            status_code=400,
         )
 
-        response_dict = {"status": "OK", "data": today_subject.model().model_dump()}
+    if error_class == "geonames_unavailable":
+        return FastJsonResponse(
+            content={
+                "status": "ERROR",
+                "message": GEONAMES_UNAVAILABLE_MESSAGE,
+            },
+            status_code=502,
+        )
 
-        return JSONResponse(content=response_dict, status_code=200)
+    if error_class == "natal_session":
+        return FastJsonResponse(
+            content={
+                "status": "ERROR",
+                "message": NATAL_SESSION_ERROR_MESSAGE,
+            },
+            status_code=404,
+        )
 
-    except Exception as e:
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+    return InternalServerErrorJsonResponse
 
 
-@router.post("/api/v4/birth-data", response_description="Birth data", response_model=BirthDataResponseModel)
-async def birth_data(birth_data_request: BirthDataRequestModel, request: Request):
+def resolve_natal_session(transit_request: TransitChartRequestModel) -> tuple[TransitChartRequestModel, Optional[NatalSession]]:
     """
-    Retrieve astrological data for a specific birth date. Does not include the chart nor the aspects.
+    Returns the request with the natal subject of its natal_id and the natal session, or the request as it is without a natal_id.
+    Raises NatalSessionNotFoundError for unknown or expired natal IDs.
     """
 
-    write_request_to_log(20, request, f"Birth data request")
-
-    subject = birth_data_request.subject
-
-    try:
-        astrological_subject = AstrologicalSubject(
-            name=subject.name,
-            year=subject.year,
-            month=subject.month,
-            day=subject.day,
-            hour=subject.hour,
-            minute=subject.minute,
-            city=subject.city,
-            nation=subject.nation,
-            lat=subject.latitude,
-            lng=subject.longitude,
-            tz_str=subject.timezone,
-            zodiac_type=subject.zodiac_type, # type: ignore
-            sidereal_mode=subject.sidereal_mode,
-            houses_system_identifier=subject.houses_system_identifier, # type: ignore
-            perspective_type=subject.perspective_type, # type: ignore
-            geonames_username=subject.geonames_username,
-            online=True if subject.geonames_username else False,
-        )
+    if transit_request.natal_id is None:
+        return transit_request, None
 
-        data = astrological_subject.model().model_dump()
+    natal_session = get_natal_session(transit_request.natal_id)
 
-        response_dict = {"status": "OK", "data": data}
+    return transit_request.model_copy(update={"first_subject": natal_session.subject}), natal_session
 
-        return JSONResponse(content=response_dict, status_code=200)
 
-    except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+#------------------------------------------------------------------------------
+# Calculations
+#
+# These functions run on the chart executor, outside of the event loop.
+# They must be defined at module level and return plain dicts, so that
+# they can be used with the process backend too.
+#------------------------------------------------------------------------------
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+def get_chart_request_cache_key(chart_type: str, subjects: list[SubjectModel], chart_request: ChartRequestModel) -> str:
+    return get_chart_cache_key(
+        chart_type,
+        subjects,
+        theme=chart_request.theme,
+        language=chart_request.language,
+        wheel_only=chart_request.wheel_only,
+        active_points=chart_request.active_points,
+        active_aspects=chart_request.active_aspects,
+    )
 
 
-@router.post("/api/v4/birth-chart", response_description="Birth chart", response_model=BirthChartResponseModel)
-async def birth_chart(request_body: BirthChartRequestModel, request: Request):
+def render_chart_svg(kerykeion_chart: KerykeionChartSVG, cache_key: str, wheel_only: bool | None) -> str:
     """
-    Retrieve an astrological birth chart for a specific birth date. Includes the data for the subject and the aspects.
+    Returns the minified SVG of the chart, rendering it only when it is not cached yet.
     """
 
-    write_request_to_log(20, request, f"Birth chart request")
+    svg = chart_cache.get(cache_key)
+    if svg is not None:
+        return svg
 
-    subject = request_body.subject
+    with time_stage("svg"):
+        if wheel_only:
+            svg = kerykeion_chart.makeWheelOnlyTemplate(minify=True)
+        else:
+            svg = kerykeion_chart.makeTemplate(minify=True)
 
-    try:
-        astrological_subject = AstrologicalSubject(
-            name=subject.name,
-            year=subject.year,
-            month=subject.month,
-            day=subject.day,
-            hour=subject.hour,
-            minute=subject.minute,
-            city=subject.city,
-            nation=subject.nation,
-            lat=subject.latitude,
-            lng=subject.longitude,
-            tz_str=subject.timezone,
-            zodiac_type=subject.zodiac_type, # type: ignore
-            sidereal_mode=subject.sidereal_mode,
-            houses_system_identifier=subject.houses_system_identifier, # type: ignore
-            perspective_type=subject.perspective_type, # type: ignore
-            geonames_username=subject.geonames_username,
-            online=True if subject.geonames_username else False,
-        )
+    chart_cache.set(cache_key, svg)
+
+    return svg
 
-        data = astrological_subject.model().model_dump()
 
+def calculate_now(utc_datetime: datetime) -> dict:
+    logger.debug(f"Current UTC time: {utc_datetime}")
+
+    today_subject = AstrologicalSubject(
+        city="GMT",
+        nation="UK",
+        lat=51.477928,
+        lng=-0.001545,
+        tz_str="GMT",
+        year=utc_datetime.year,
+        month=utc_datetime.month,
+        day=utc_datetime.day,
+        hour=utc_datetime.hour,
+        minute=utc_datetime.minute,
+        online=False,
+    )
+
+    return {"status": "OK", "data": today_subject.model().model_dump()}
+
+
+def render_now(minute: int) -> bytes:
+    return FastJsonResponse(content=calculate_now(datetime.fromtimestamp(minute, tz=timezone.utc))).body
+
+
+# On some Cloud providers, the time is not set correctly, so the UTC time is synchronized in background.
+# The data only changes once a minute: it is precomputed and served as bytes.
+now_snapshot = MinuteSnapshot(render_now, clock=time_sync.timestamp)
+
+
+def calculate_birth_data(birth_data_request: BirthDataRequestModel) -> dict:
+    astrological_subject = build_astrological_subject(birth_data_request.subject)
+
+    return {"status": "OK", "data": astrological_subject.model().model_dump()}
+
+
+def calculate_birth_chart(request_body: BirthChartRequestModel) -> dict:
+    astrological_subject = build_astrological_subject(request_body.subject)
+
+    with time_stage("aspects"):
         kerykeion_chart = KerykeionChartSVG(
             astrological_subject,
             theme=request_body.theme,
@@ -217,89 +278,63 @@ async def birth_chart(request_body: BirthChartRequestModel, request: Request):
             active_aspects=request_body.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-        if request_body.wheel_only:
-            svg = kerykeion_chart.makeWheelOnlyTemplate(minify=True)
-        else:
-            svg = kerykeion_chart.makeTemplate(minify=True)
-
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "chart": svg,
-                "data": data,
-                "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list]
-            },
-            status_code=200,
-        )
-
-    except Exception as e:
-        # If error contains "wrong username"
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+    cache_key = get_chart_request_cache_key("Natal", [request_body.subject], request_body)
+    svg = render_chart_svg(kerykeion_chart, cache_key, request_body.wheel_only)
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+    return {
+        "status": "OK",
+        "chart": svg,
+        "data": astrological_subject.model().model_dump(),
+        "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
+    }
 
 
-@router.post("/api/v4/synastry-chart", response_description="Synastry data", response_model=SynastryChartResponseModel)
-async def synastry_chart(synastry_chart_request: SynastryChartRequestModel, request: Request):
+def calculate_natal_bundle(natal_bundle_request: NatalBundleRequestModel) -> dict:
     """
-    Retrieve a synastry chart between two subjects. Includes the data for the subjects and the aspects.
+    The birth chart, the active points with their house, the house cusps and the aspects, from a single subject calculation.
     """
 
-    write_request_to_log(20, request, f"Synastry chart request")
-
-    first_subject = synastry_chart_request.first_subject
-    second_subject = synastry_chart_request.second_subject
+    astrological_subject = build_astrological_subject(natal_bundle_request.subject)
+    active_points = natal_bundle_request.active_points or DEFAULT_ACTIVE_POINTS
 
-    try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
+    with time_stage("aspects"):
+        kerykeion_chart = KerykeionChartSVG(
+            astrological_subject,
+            theme=natal_bundle_request.theme,
+            chart_language=natal_bundle_request.language or "EN",
+            active_points=active_points,
+            active_aspects=natal_bundle_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-        second_astrological_subject = AstrologicalSubject(
-            name=second_subject.name,
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=second_subject.zodiac_type, # type: ignore
-            sidereal_mode=second_subject.sidereal_mode,
-            houses_system_identifier=second_subject.houses_system_identifier, # type: ignore
-            perspective_type=second_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
-        )
+    # Same key as the birth chart: the two endpoints share the cached SVG
+    cache_key = get_chart_request_cache_key("Natal", [natal_bundle_request.subject], natal_bundle_request)
+    svg = render_chart_svg(kerykeion_chart, cache_key, natal_bundle_request.wheel_only)
+
+    subject_model = astrological_subject.model()
+
+    points = []
+    for point_name in active_points:
+        point = getattr(subject_model, point_name.lower(), None)
+        if point is not None:
+            points.append({**point.model_dump(), "house_number": HOUSE_NUMBERS.get(point.house)})
+
+    return {
+        "status": "OK",
+        "chart": svg,
+        "data": subject_model.model_dump(),
+        "points": points,
+        "house_cusps": [getattr(subject_model, house.lower()).abs_pos for house in HOUSE_NUMBERS],
+        "ascendant": subject_model.ascendant.abs_pos,
+        "medium_coeli": subject_model.medium_coeli.abs_pos,
+        "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
+    }
 
+
+def calculate_synastry_chart(synastry_chart_request: SynastryChartRequestModel) -> dict:
+    first_astrological_subject = build_astrological_subject(synastry_chart_request.first_subject)
+    second_astrological_subject = build_astrological_subject(synastry_chart_request.second_subject)
+
+    with time_stage("aspects"):
         kerykeion_chart = KerykeionChartSVG(
             first_astrological_subject,
             second_obj=second_astrological_subject,
@@ -310,91 +345,43 @@ async def synastry_chart(synastry_chart_request: SynastryChartRequestModel, requ
             active_aspects=synastry_chart_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-        if synastry_chart_request.wheel_only:
-            svg = kerykeion_chart.makeWheelOnlyTemplate(minify=True)
-        else:
-            svg = kerykeion_chart.makeTemplate(minify=True)
+    cache_key = get_chart_request_cache_key("Synastry", [synastry_chart_request.first_subject, synastry_chart_request.second_subject], synastry_chart_request)
+    svg = render_chart_svg(kerykeion_chart, cache_key, synastry_chart_request.wheel_only)
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "chart": svg,
-                "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
-                "data": {
-                    "first_subject": first_astrological_subject.model().model_dump(),
-                    "second_subject": second_astrological_subject.model().model_dump(),
-                },
-            },
-            status_code=200,
-        )
-
-    except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
-
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+    return {
+        "status": "OK",
+        "chart": svg,
+        "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
+        "data": {
+            "first_subject": first_astrological_subject.model().model_dump(),
+            "second_subject": second_astrological_subject.model().model_dump(),
+        },
+    }
 
 
-@router.post("/api/v4/transit-chart", response_description="Transit data", response_model=TransitChartResponseModel)
-async def transit_chart(transit_chart_request: TransitChartRequestModel, request: Request):
-    """
-    Retrieve a transit chart for a specific subject. Includes the data for the subject and the aspects.
-    """
+def build_transit_subjects(transit_chart_request: TransitChartRequestModel, natal_session: Optional[NatalSession] = None) -> tuple[AstrologicalSubject, AstrologicalSubject]:
+    first_subject = transit_chart_request.first_subject
+    if natal_session is not None:
+        first_astrological_subject = natal_session.astrological_subject
+    else:
+        first_astrological_subject = build_astrological_subject(first_subject)
 
-    write_request_to_log(20, request, f"Transit chart request")
+    second_astrological_subject = build_astrological_subject(
+        transit_chart_request.transit_subject,
+        name="Transit",
+        zodiac_type=first_astrological_subject.zodiac_type,
+        sidereal_mode=first_subject.sidereal_mode,
+        houses_system_identifier=first_subject.houses_system_identifier,
+        perspective_type=first_subject.perspective_type,
+    )
 
-    first_subject = transit_chart_request.first_subject
-    second_subject = transit_chart_request.transit_subject
+    return first_astrological_subject, second_astrological_subject
 
-    try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
-        )
 
-        second_astrological_subject = AstrologicalSubject(
-            name="Transit",
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=first_astrological_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
-        )
+def calculate_transit_chart(transit_chart_request: TransitChartRequestModel, natal_session: Optional[NatalSession] = None) -> dict:
+    first_astrological_subject, second_astrological_subject = build_transit_subjects(transit_chart_request, natal_session)
 
+    with time_stage("aspects"):
         kerykeion_chart = KerykeionChartSVG(
             first_astrological_subject,
             second_obj=second_astrological_subject,
@@ -405,274 +392,513 @@ async def transit_chart(transit_chart_request: TransitChartRequestModel, request
             active_aspects=transit_chart_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-        if transit_chart_request.wheel_only:
-            svg = kerykeion_chart.makeWheelOnlyTemplate(minify=True)
-        else:
-            svg = kerykeion_chart.makeTemplate(minify=True)
+    cache_key = get_chart_request_cache_key("Transit", [transit_chart_request.first_subject, transit_chart_request.transit_subject], transit_chart_request)
+    svg = render_chart_svg(kerykeion_chart, cache_key, transit_chart_request.wheel_only)
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "chart": svg,
-                "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
-                "data": {
-                    "subject": first_astrological_subject.model().model_dump(),
-                    "transit": second_astrological_subject.model().model_dump(),
-                },
-            },
-            status_code=200,
+    return {
+        "status": "OK",
+        "chart": svg,
+        "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
+        "data": {
+            "subject": natal_session.data if natal_session is not None else first_astrological_subject.model().model_dump(),
+            "transit": second_astrological_subject.model().model_dump(),
+        },
+    }
+
+
+def calculate_transit_aspects_data(transit_chart_request: TransitChartRequestModel, natal_session: Optional[NatalSession] = None) -> dict:
+    first_astrological_subject, second_astrological_subject = build_transit_subjects(transit_chart_request, natal_session)
+
+    with time_stage("aspects"):
+        aspects = calculate_cross_aspects(
+            first_astrological_subject,
+            second_astrological_subject,
+            active_points=transit_chart_request.active_points or DEFAULT_ACTIVE_POINTS,
+            active_aspects=transit_chart_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-    except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+    return {
+        "status": "OK",
+        "data": {
+            "subject": natal_session.data if natal_session is not None else first_astrological_subject.model().model_dump(),
+            "transit": second_astrological_subject.model().model_dump(),
+        },
+        "aspects": [aspect.model_dump() for aspect in aspects],
+    }
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
 
+def calculate_synastry_aspects_data(aspects_request_content: SynastryAspectsRequestModel) -> dict:
+    first_astrological_subject = build_astrological_subject(aspects_request_content.first_subject)
+    second_astrological_subject = build_astrological_subject(aspects_request_content.second_subject)
 
-@router.post("/api/v4/transit-aspects-data", response_description="Transit aspects data", response_model=TransitAspectsResponseModel)
-async def transit_aspects_data(transit_chart_request: TransitChartRequestModel, request: Request) -> JSONResponse:
-    """
-    Retrieve transit aspects and data for a specific subject. Does not include the chart.
-    """
+    with time_stage("aspects"):
+        aspects = calculate_cross_aspects(
+            first_astrological_subject,
+            second_astrological_subject,
+            active_points=aspects_request_content.active_points or DEFAULT_ACTIVE_POINTS,
+            active_aspects=aspects_request_content.active_aspects or DEFAULT_ACTIVE_ASPECTS,
+        )
 
-    write_request_to_log(20, request, f"Transit aspects data request")
+    return {
+        "status": "OK",
+        "data": {
+            "first_subject": first_astrological_subject.model().model_dump(),
+            "second_subject": second_astrological_subject.model().model_dump(),
+        },
+        "aspects": [aspect.model_dump() for aspect in aspects],
+    }
 
-    first_subject = transit_chart_request.first_subject
-    second_subject = transit_chart_request.transit_subject
 
-    try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
+def calculate_natal_aspects_data(aspects_request_content: NatalAspectsRequestModel) -> dict:
+    first_astrological_subject = build_astrological_subject(aspects_request_content.subject)
+
+    with time_stage("aspects"):
+        aspects = calculate_natal_aspects(
+            first_astrological_subject,
+            active_points=aspects_request_content.active_points or DEFAULT_ACTIVE_POINTS,
+            active_aspects=aspects_request_content.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-        second_astrological_subject = AstrologicalSubject(
-            name="Transit",
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=first_astrological_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
+    return {
+        "status": "OK",
+        "data": {"subject": first_astrological_subject.model().model_dump()},
+        "aspects": [aspect.model_dump() for aspect in aspects],
+    }
+
+
+def calculate_relationship_score(relationship_score_request: RelationshipScoreRequestModel) -> dict:
+    first_astrological_subject = build_astrological_subject(relationship_score_request.first_subject)
+    second_astrological_subject = build_astrological_subject(relationship_score_request.second_subject)
+
+    with time_stage("aspects"):
+        score_factory = AspectMatrixRelationshipScoreFactory(first_astrological_subject, second_astrological_subject)
+        score_model = score_factory.get_relationship_score()
+
+    return {
+        "status": "OK",
+        "score": score_model.score_value,
+        "score_description": score_model.score_description,
+        "is_destiny_sign": score_model.is_destiny_sign,
+        "aspects": [aspect.model_dump() for aspect in score_model.aspects],
+        "data": {
+            "first_subject": first_astrological_subject.model().model_dump(),
+            "second_subject": second_astrological_subject.model().model_dump(),
+        },
+    }
+
+
+def calculate_composite_chart(composite_chart_request: CompositeChartRequestModel) -> dict:
+    first_astrological_subject = build_astrological_subject(composite_chart_request.first_subject)
+    second_astrological_subject = build_astrological_subject(composite_chart_request.second_subject)
+
+    with time_stage("subject"):
+        composite_factory = CompositeSubjectFactory(first_astrological_subject, second_astrological_subject)
+        composite_subject = composite_factory.get_midpoint_composite_subject_model()
+
+    with time_stage("aspects"):
+        kerykeion_chart = KerykeionChartSVG(
+            composite_subject,
+            chart_type="Composite",
+            theme=composite_chart_request.theme
         )
 
-        aspects = SynastryAspects(
-            first_astrological_subject,
-            second_astrological_subject,
-            active_points=transit_chart_request.active_points or DEFAULT_ACTIVE_POINTS,
-            active_aspects=transit_chart_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
-        ).relevant_aspects
+    cache_key = get_chart_request_cache_key("Composite", [composite_chart_request.first_subject, composite_chart_request.second_subject], composite_chart_request)
+    svg = render_chart_svg(kerykeion_chart, cache_key, composite_chart_request.wheel_only)
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "data": {
-                    "subject": first_astrological_subject.model().model_dump(),
-                    "transit": second_astrological_subject.model().model_dump(),
-                },
-                "aspects": [aspect.model_dump() for aspect in aspects],
-            },
-            status_code=200,
+    composite_subject_dict = composite_subject.model_dump()
+    for key in ["first_subject", "second_subject"]:
+        if key in composite_subject_dict:
+            composite_subject_dict.pop(key)
+
+    return {
+        "status": "OK",
+        "chart": svg,
+        "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
+        "data": {
+            "composite_subject": composite_subject_dict,
+            "first_subject": first_astrological_subject.model().model_dump(),
+            "second_subject": second_astrological_subject.model().model_dump(),
+        },
+    }
+
+
+def calculate_composite_aspects_data(composite_chart_request: CompositeChartRequestModel) -> dict:
+    first_astrological_subject = build_astrological_subject(composite_chart_request.first_subject)
+    second_astrological_subject = build_astrological_subject(composite_chart_request.second_subject)
+
+    with time_stage("subject"):
+        composite_factory = CompositeSubjectFactory(first_astrological_subject, second_astrological_subject)
+        composite_data = composite_factory.get_midpoint_composite_subject_model()
+    with time_stage("aspects"):
+        aspects = calculate_natal_aspects(
+            composite_data,
+            active_points=composite_chart_request.active_points or DEFAULT_ACTIVE_POINTS,
+            active_aspects=composite_chart_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
         )
 
-    except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+    composite_subject_dict = composite_data.model_dump()
+    for key in ["first_subject", "second_subject"]:
+        if key in composite_subject_dict:
+            composite_subject_dict.pop(key)
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+    return {
+        "status": "OK",
+        "data": {
+            "composite_subject": composite_subject_dict,
+            "first_subject": first_astrological_subject.model().model_dump(),
+            "second_subject": second_astrological_subject.model().model_dump(),
+        },
+        "aspects": [aspect.model_dump() for aspect in aspects],
+    }
 
 
-@router.post("/api/v4/synastry-aspects-data", response_description="Synastry aspects data", response_model=SynastryAspectsResponseModel)
-async def synastry_aspects_data(aspects_request_content: SynastryAspectsRequestModel, request: Request) -> JSONResponse:
+def calculate_ephemeris_series(ephemeris_request: EphemerisRequestModel) -> dict:
+    timestamps = get_sample_timestamps(ephemeris_request.start, ephemeris_request.end, ephemeris_request.step)
+
+    points = calculate_ephemeris(
+        timestamps,
+        ephemeris_request.active_points,
+        latitude=ephemeris_request.latitude,
+        longitude=ephemeris_request.longitude,
+        zodiac_type=ephemeris_request.zodiac_type,
+        sidereal_mode=ephemeris_request.sidereal_mode,
+        perspective_type=ephemeris_request.perspective_type,
+    )
+
+    return {"status": "OK", "data": {"timestamps": timestamps, "points": points}}
+
+
+def calculate_transit_events(transit_events_request: TransitEventsRequestModel, natal_session: Optional[NatalSession] = None) -> dict:
+    if natal_session is not None:
+        natal_subject = natal_session.astrological_subject
+    else:
+        natal_subject = build_astrological_subject(transit_events_request.subject)
+    active_points = transit_events_request.active_points or DEFAULT_ACTIVE_POINTS
+    active_aspects = transit_events_request.active_aspects or DEFAULT_ACTIVE_ASPECTS
+
+    search = find_transit_events(
+        transit_events_request.start.timestamp(),
+        transit_events_request.end.timestamp(),
+        transit_points=active_points,
+        natal_positions={point: natal_subject[point.lower()]["abs_pos"] for point in active_points},
+        aspects=[aspect["name"] for aspect in active_aspects],
+        event_types=transit_events_request.event_types,
+        latitude=natal_subject.lat,
+        longitude=natal_subject.lng,
+        zodiac_type=natal_subject.zodiac_type,
+        sidereal_mode=natal_subject.sidereal_mode,
+        perspective_type=natal_subject.perspective_type,
+    )
+
+    return {"status": "OK", **search}
+
+
+def create_natal_session(subject: SubjectModel) -> NatalSession:
+    astrological_subject = build_astrological_subject(subject)
+
+    return NatalSession(
+        natal_id=get_natal_id(subject),
+        subject=subject,
+        astrological_subject=astrological_subject,
+        data=astrological_subject.model().model_dump(),
+    )
+
+
+def calculate_columnar_ephemeris_series(ephemeris_request: EphemerisRequestModel, columnar_format: ColumnarFormat) -> bytes:
     """
-    Retrieve synastry aspects between two subjects. Does not include the chart.
+    The ephemeris as a single table: a timestamp column and one column per point and field ("Sun.longitude").
     """
 
-    write_request_to_log(20, request, f"Synastry aspects data request")
+    data = calculate_ephemeris_series(ephemeris_request)["data"]
+
+    columns = {"timestamp": data["timestamps"]}
+    for point, series in data["points"].items():
+        for field, values in series.items():
+            columns[f"{point}.{field}"] = values
+
+    return encode_columnar({"status": "OK", "format": "columnar", "data": columns_to_table(columns)}, "data", columnar_format)
+
+
+def encode_columnar_batch_results(results: list[dict], columnar_format: ColumnarFormat) -> bytes:
+    return encode_columnar({"status": "OK", "format": "columnar", "results": rows_to_table(results)}, "results", columnar_format)
+
+
+def calculate_batch_chunk(calculation: Callable[..., dict], chunk: list) -> list[dict]:
+    """
+    Runs the calculation for every request of the chunk, a failed item does not stop the others.
+    """
+
+    results = []
+    for item_request in chunk:
+        try:
+            results.append(calculation(item_request))
+
+        except Exception as e:
+            logger.warning(f"Batch item error: {e}")
+            results.append({"status": "ERROR", "message": get_error_message(e)})
+
+    return results
+
+
+async def iter_batch_results(calculation: Callable[..., dict], item_requests: list, endpoint: str) -> AsyncIterator[dict]:
+    """
+    Splits the item requests in chunks of batch_chunk_size and runs them on the chart executor.
+    Yields one result per item, with its index, as soon as its chunk is calculated.
+    """
+
+    chunk_size = max(1, settings.batch_chunk_size)
+    chunks = (item_requests[start:start + chunk_size] for start in range(0, len(item_requests), chunk_size))
+
+    async for chunk_index, chunk_results in chart_executor.as_completed(partial(calculate_batch_chunk, calculation), chunks):
+        for offset, result in enumerate(chunk_results):
+            if result["status"] == "ERROR":
+                request_metrics.count_error(endpoint, BATCH_ERROR_CLASSES.get(result["message"], "internal"))
+
+            yield {"index": chunk_index * chunk_size + offset, **result}
+
+
+async def get_batch_response(calculation: Callable[..., dict], item_requests: list, request: Request) -> Response:
+    """
+    Streams the results as NDJSON, one line per item in completion order, when the client accepts it.
+    Otherwise returns a single JSON document with the results in the same order of the request, as a table when a columnar format is asked.
+    """
+
+    if accepts_ndjson(request):
+        return NDJsonStreamingResponse(iter_batch_results(calculation, item_requests, get_endpoint(request)))
 
-    first_subject = aspects_request_content.first_subject
-    second_subject = aspects_request_content.second_subject
+    results: list[dict] = [{} for _ in item_requests]
+    async for result in iter_batch_results(calculation, item_requests, get_endpoint(request)):
+        results[result["index"]] = result
+
+    columnar_format = get_columnar_format(request)
+    if columnar_format is not None:
+        body = await chart_executor.run(encode_columnar_batch_results, results, columnar_format)
+        return ColumnarResponse(content=body, columnar_format=columnar_format)
+
+    return FastJsonResponse(content={"status": "OK", "results": results}, status_code=200)
+
+
+async def get_chart_svg_response(calculation: Callable[..., dict], chart_request: ChartRequestModel, cache_key: str, request: Request) -> Response:
+    """
+    Returns only the SVG of the chart, without the data and the aspects.
+    Cached charts are sent as they are stored, compressed too when the client accepts it:
+    the first request of a coding compresses the entry, in a thread, and stores it.
+    A missing entry is counted as a miss only once, by render_chart_svg.
+    """
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", "")) if settings.compression_enabled else None
+    if encoding is not None:
+        compressed_svg = await asyncio.to_thread(chart_cache.get_compressed, cache_key, encoding)
+        if compressed_svg is not None:
+            return SvgResponse(content=compressed_svg, headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+
+    svg = chart_cache.get(cache_key, count_miss=False)
+    if svg is None:
+        response_dict = await chart_executor.run(calculation, chart_request)
+        svg = response_dict["chart"]
+
+    return SvgResponse(content=svg)
+
+
+#------------------------------------------------------------------------------
+# Endpoints
+#------------------------------------------------------------------------------
+
+@router.get("/api/v4/health", response_description="Health check", include_in_schema=False)
+async def health(request: Request) -> FastJsonResponse:
+    """
+    Health check endpoint.
+    """
+
+    write_request_to_log(20, request, "Health check")
+
+    return FastJsonResponse(content={"status": "OK"}, status_code=200)
+
+
+@router.get("/", response_description="Status of the API", response_model=BirthDataResponseModel, include_in_schema=False)
+async def status(request: Request) -> FastJsonResponse:
+    """
+    Returns the status of the API.
+    """
+
+    write_request_to_log(20, request, "API is up and running")
+    response_dict = {
+        "status": "OK",
+        "environment": settings.env_type,
+        "debug": settings.debug,
+    }
+
+    return FastJsonResponse(content=response_dict, status_code=200)
+
+
+@router.get("/api/v4/now", response_description="Current astrological data", response_model=BirthDataResponseModel)
+async def get_now(request: Request) -> FastJsonResponse:
+    """
+    Retrieve astrological data for the current moment.
+    """
+
+    write_request_to_log(20, request, "Getting current astrological data")
 
     try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
-        )
+        return Response(content=await now_snapshot.get_current(), status_code=200, media_type="application/json")
 
-        second_astrological_subject = AstrologicalSubject(
-            name=second_subject.name,
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=second_subject.zodiac_type, # type: ignore
-            sidereal_mode=second_subject.sidereal_mode,
-            houses_system_identifier=second_subject.houses_system_identifier, # type: ignore
-            perspective_type=second_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
-        )
+    except Exception as e:
+        return get_error_json_response(request, e)
 
-        aspects = SynastryAspects(
-            first_astrological_subject,
-            second_astrological_subject,
-            active_points=aspects_request_content.active_points or DEFAULT_ACTIVE_POINTS,
-            active_aspects=aspects_request_content.active_aspects or DEFAULT_ACTIVE_ASPECTS,
-        ).relevant_aspects
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "data": {
-                    "first_subject": first_astrological_subject.model().model_dump(),
-                    "second_subject": second_astrological_subject.model().model_dump(),
-                },
-                "aspects": [aspect.model_dump() for aspect in aspects],
-            },
-            status_code=200,
-        )
+@router.post("/api/v4/birth-data", response_description="Birth data", response_model=BirthDataResponseModel)
+async def birth_data(birth_data_request: BirthDataRequestModel, request: Request):
+    """
+    Retrieve astrological data for a specific birth date. Does not include the chart nor the aspects.
+    """
+
+    write_request_to_log(20, request, f"Birth data request")
+
+    try:
+        response_dict = await chart_executor.run(calculate_birth_data, birth_data_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
 
     except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+        return get_error_json_response(request, e)
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
 
+@router.post("/api/v4/birth-chart", response_description="Birth chart", response_model=BirthChartResponseModel, responses=SVG_CHART_RESPONSES)
+async def birth_chart(request_body: BirthChartRequestModel, request: Request):
+    """
+    Retrieve an astrological birth chart for a specific birth date. Includes the data for the subject and the aspects.
 
-@router.post("/api/v4/natal-aspects-data", response_description="Birth aspects data", response_model=SynastryAspectsResponseModel)
-async def natal_aspects_data(aspects_request_content: NatalAspectsRequestModel, request: Request) -> JSONResponse:
+    With the "Accept: image/svg+xml" header or the format=svg query parameter, only the SVG is returned.
     """
-    Retrieve natal aspects and data for a specific subject. Does not include the chart.
+
+    write_request_to_log(20, request, f"Birth chart request")
+
+    try:
+        if accepts_svg(request):
+            cache_key = get_chart_request_cache_key("Natal", [request_body.subject], request_body)
+            return await get_chart_svg_response(calculate_birth_chart, request_body, cache_key, request)
+
+        response_dict = await chart_executor.run(calculate_birth_chart, request_body)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
+
+
+@router.post("/api/v4/natal-bundle", response_description="Natal bundle", response_model=NatalBundleResponseModel)
+async def natal_bundle(natal_bundle_request: NatalBundleRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve everything needed to display a birth chart in a single request: the SVG chart, the data of the subject,
+    the active points with the number of their house, the 12 house cusps, the ascendant, the midheaven and the aspects.
     """
 
-    write_request_to_log(20, request, f"Natal aspects data request")
+    write_request_to_log(20, request, f"Natal bundle request")
+
+    try:
+        response_dict = await chart_executor.run(calculate_natal_bundle, natal_bundle_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
+
 
-    subject = aspects_request_content.subject
+@router.post("/api/v4/synastry-chart", response_description="Synastry data", response_model=SynastryChartResponseModel, responses=SVG_CHART_RESPONSES)
+async def synastry_chart(synastry_chart_request: SynastryChartRequestModel, request: Request):
+    """
+    Retrieve a synastry chart between two subjects. Includes the data for the subjects and the aspects.
+
+    With the "Accept: image/svg+xml" header or the format=svg query parameter, only the SVG is returned.
+    """
+
+    write_request_to_log(20, request, f"Synastry chart request")
 
     try:
-        first_astrological_subject = AstrologicalSubject(
-            name=subject.name,
-            year=subject.year,
-            month=subject.month,
-            day=subject.day,
-            hour=subject.hour,
-            minute=subject.minute,
-            city=subject.city,
-            nation=subject.nation,
-            lat=subject.latitude,
-            lng=subject.longitude,
-            tz_str=subject.timezone,
-            zodiac_type=subject.zodiac_type, # type: ignore
-            sidereal_mode=subject.sidereal_mode,
-            houses_system_identifier=subject.houses_system_identifier, # type: ignore
-            perspective_type=subject.perspective_type, # type: ignore
-            geonames_username=subject.geonames_username,
-            online=True if subject.geonames_username else False,
-        )
+        if accepts_svg(request):
+            cache_key = get_chart_request_cache_key("Synastry", [synastry_chart_request.first_subject, synastry_chart_request.second_subject], synastry_chart_request)
+            return await get_chart_svg_response(calculate_synastry_chart, synastry_chart_request, cache_key, request)
 
-        aspects = NatalAspects(
-            first_astrological_subject,
-            active_points=aspects_request_content.active_points or DEFAULT_ACTIVE_POINTS,
-            active_aspects=aspects_request_content.active_aspects or DEFAULT_ACTIVE_ASPECTS,
-        ).relevant_aspects
+        response_dict = await chart_executor.run(calculate_synastry_chart, synastry_chart_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "data": {"subject": first_astrological_subject.model().model_dump()},
-                "aspects": [aspect.model_dump() for aspect in aspects],
-            },
-            status_code=200,
-        )
+
+@router.post("/api/v4/transit-chart", response_description="Transit data", response_model=TransitChartResponseModel, responses=SVG_CHART_RESPONSES)
+async def transit_chart(transit_chart_request: TransitChartRequestModel, request: Request):
+    """
+    Retrieve a transit chart for a specific subject. Includes the data for the subject and the aspects.
+
+    With the "Accept: image/svg+xml" header or the format=svg query parameter, only the SVG is returned.
+    """
+
+    write_request_to_log(20, request, f"Transit chart request")
+
+    try:
+        transit_chart_request, natal_session = resolve_natal_session(transit_chart_request)
+        calculation = partial(calculate_transit_chart, natal_session=natal_session)
+
+        if accepts_svg(request):
+            cache_key = get_chart_request_cache_key("Transit", [transit_chart_request.first_subject, transit_chart_request.transit_subject], transit_chart_request)
+            return await get_chart_svg_response(calculation, transit_chart_request, cache_key, request)
+
+        response_dict = await chart_executor.run(calculation, transit_chart_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
 
     except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+        return get_error_json_response(request, e)
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+
+@router.post("/api/v4/transit-aspects-data", response_description="Transit aspects data", response_model=TransitAspectsResponseModel)
+async def transit_aspects_data(transit_chart_request: TransitChartRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve transit aspects and data for a specific subject. Does not include the chart.
+    """
+
+    write_request_to_log(20, request, f"Transit aspects data request")
+
+    try:
+        transit_chart_request, natal_session = resolve_natal_session(transit_chart_request)
+        response_dict = await chart_executor.run(calculate_transit_aspects_data, transit_chart_request, natal_session)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
+
+
+@router.post("/api/v4/synastry-aspects-data", response_description="Synastry aspects data", response_model=SynastryAspectsResponseModel)
+async def synastry_aspects_data(aspects_request_content: SynastryAspectsRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve synastry aspects between two subjects. Does not include the chart.
+    """
+
+    write_request_to_log(20, request, f"Synastry aspects data request")
+
+    try:
+        response_dict = await chart_executor.run(calculate_synastry_aspects_data, aspects_request_content)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
+
+
+@router.post("/api/v4/natal-aspects-data", response_description="Birth aspects data", response_model=SynastryAspectsResponseModel)
+async def natal_aspects_data(aspects_request_content: NatalAspectsRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve natal aspects and data for a specific subject. Does not include the chart.
+    """
+
+    write_request_to_log(20, request, f"Natal aspects data request")
+
+    try:
+        response_dict = await chart_executor.run(calculate_natal_aspects_data, aspects_request_content)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
 
 
 @router.post("/api/v4/relationship-score", response_description="Relationship score", response_model=RelationshipScoreResponseModel)
-async def relationship_score(relationship_score_request: RelationshipScoreRequestModel, request: Request) -> JSONResponse:
+async def relationship_score(relationship_score_request: RelationshipScoreRequestModel, request: Request) -> FastJsonResponse:
     """
     Calculates the relevance of the relationship between two subjects using the Ciro Discepolo method.
 
@@ -693,83 +919,43 @@ async def relationship_score(relationship_score_request: RelationshipScoreReques
     write_request_to_log(20, request, f"Getting composite data for: {first_subject} and {second_subject}")
 
     try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
-        )
+        response_dict = await chart_executor.run(calculate_relationship_score, relationship_score_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
 
-        second_astrological_subject = AstrologicalSubject(
-            name=second_subject.name,
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=second_subject.zodiac_type, # type: ignore
-            sidereal_mode=second_subject.sidereal_mode,
-            houses_system_identifier=second_subject.houses_system_identifier, # type: ignore
-            perspective_type=second_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
-        )
+    except Exception as e:
+        return get_error_json_response(request, e)
 
-        score_factory = RelationshipScoreFactory(first_astrological_subject, second_astrological_subject)
-        score_model = score_factory.get_relationship_score()
 
-        response_content = {
-            "status": "OK",
-            "score": score_model.score_value,
-            "score_description": score_model.score_description,
-            "is_destiny_sign": score_model.is_destiny_sign,
-            "aspects": [aspect.model_dump() for aspect in score_model.aspects],
-            "data": {
-                "first_subject": first_astrological_subject.model().model_dump(),
-                "second_subject": second_astrological_subject.model().model_dump(),
-            },
-        }
+@router.post("/api/v4/composite-chart", response_description="Composite data", response_model=CompositeChartResponseModel, responses=SVG_CHART_RESPONSES)
+async def composite_chart(composite_chart_request: CompositeChartRequestModel, request: Request) -> Response:
+    """
+    Retrieve a composite chart between two subjects. Includes the data for the subjects and the aspects.
+    The method used is the midpoint method.
 
-        return JSONResponse(content=response_content, status_code=200)
+    With the "Accept: image/svg+xml" header or the format=svg query parameter, only the SVG is returned.
+    """
 
-    except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+    first_subject = composite_chart_request.first_subject
+    second_subject = composite_chart_request.second_subject
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
+    write_request_to_log(20, request, f"Getting composite data for: {first_subject} and {second_subject}")
+
+    try:
+        if accepts_svg(request):
+            cache_key = get_chart_request_cache_key("Composite", [composite_chart_request.first_subject, composite_chart_request.second_subject], composite_chart_request)
+            return await get_chart_svg_response(calculate_composite_chart, composite_chart_request, cache_key, request)
 
+        response_dict = await chart_executor.run(calculate_composite_chart, composite_chart_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
 
-@router.post("/api/v4/composite-chart", response_description="Composite data", response_model=CompositeChartResponseModel)
-async def composite_chart(composite_chart_request: CompositeChartRequestModel, request: Request) -> JSONResponse:
+    except Exception as e:
+        return get_error_json_response(request, e)
+
+
+@router.post("/api/v4/composite-aspects-data", response_description="Composite aspects data", response_model=CompositeAspectsResponseModel)
+async def composite_aspects_data(composite_chart_request: CompositeChartRequestModel, request: Request) -> FastJsonResponse:
     """
-    Retrieve a composite chart between two subjects. Includes the data for the subjects and the aspects.
-    The method used is the midpoint method.
+    Retrieves the data and the aspects for a composite chart between two subjects. Does not include the chart.
     """
 
     first_subject = composite_chart_request.first_subject
@@ -778,182 +964,134 @@ async def composite_chart(composite_chart_request: CompositeChartRequestModel, r
     write_request_to_log(20, request, f"Getting composite data for: {first_subject} and {second_subject}")
 
     try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
-        )
+        response_dict = await chart_executor.run(calculate_composite_aspects_data, composite_chart_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
 
-        second_astrological_subject = AstrologicalSubject(
-            name=second_subject.name,
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=second_subject.zodiac_type, # type: ignore
-            sidereal_mode=second_subject.sidereal_mode,
-            houses_system_identifier=second_subject.houses_system_identifier, # type: ignore
-            perspective_type=second_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
-        )
+    except Exception as e:
+        return get_error_json_response(request, e)
 
-        composite_factory = CompositeSubjectFactory(first_astrological_subject, second_astrological_subject)
-        composite_subject = composite_factory.get_midpoint_composite_subject_model()
 
-        kerykeion_chart = KerykeionChartSVG(
-            composite_subject,
-            chart_type="Composite",
-            theme=composite_chart_request.theme
-        )
+@router.post("/api/v4/ephemeris", response_description="Positions of the points over a range of dates", response_model=EphemerisResponseModel)
+async def ephemeris(ephemeris_request: EphemerisRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve the longitude, the speed and the retrograde status of the active points from start to end, every step.
+    The series are columns, one value per sample, aligned with the timestamps.
 
-        if composite_chart_request.wheel_only:
-            svg = kerykeion_chart.makeWheelOnlyTemplate(minify=True)
-        else:
-            svg = kerykeion_chart.makeTemplate(minify=True)
+    Much faster than one Birth Data request per date: only the positions of the requested points are calculated.
 
-        composite_subject_dict = composite_subject.model_dump()
-        for key in ["first_subject", "second_subject"]:
-            if key in composite_subject_dict:
-                composite_subject_dict.pop(key)
+    With format=columnar (or format=columnar-binary for packed little endian buffers) the series are returned as a single table,
+    see the README for the layout.
+    """
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "chart": svg,
-                "aspects": [aspect.model_dump() for aspect in kerykeion_chart.aspects_list],
-                "data": {
-                    "composite_subject": composite_subject_dict,
-                    "first_subject": first_astrological_subject.model().model_dump(),
-                    "second_subject": second_astrological_subject.model().model_dump(),
-                },
-            },
+    write_request_to_log(20, request, f"Ephemeris request from {ephemeris_request.start} to {ephemeris_request.end} every {ephemeris_request.step}")
+
+    try:
+        columnar_format = get_columnar_format(request)
+        if columnar_format is not None:
+            body = await chart_executor.run(calculate_columnar_ephemeris_series, ephemeris_request, columnar_format)
+            return ColumnarResponse(content=body, columnar_format=columnar_format)
+
+        response_dict = await chart_executor.run(calculate_ephemeris_series, ephemeris_request)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
+
+
+@router.post("/api/v4/natal-sessions", response_description="Natal session for the transit requests", response_model=NatalSessionResponseModel)
+async def create_natal_session_endpoint(natal_session_request: NatalSessionRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Calculate a natal subject once and get its natal_id. The Transit Chart, Transit Aspects Data and Transit Events endpoints
+    accept the natal_id instead of the natal subject: then only the transit subject and the aspects are calculated.
+
+    The natal_id is a hash of the subject, creating the session again (for example after it expired) gives the same ID.
+
+    Sessions are kept in the memory of the worker that created them: with several workers the transit requests
+    must be routed to the same worker (sticky sessions), or the session created again after a 404 response.
+    """
+
+    write_request_to_log(20, request, f"Natal session request for {natal_session_request.subject.name}")
+
+    try:
+        natal_id = get_natal_id(natal_session_request.subject)
+        natal_session = natal_sessions.get(natal_id)
+        if natal_session is None:
+            natal_session = await chart_executor.run(create_natal_session, natal_session_request.subject)
+
+        # Stored again to restart the expiration
+        natal_sessions.set(natal_id, natal_session)
+
+        return FastJsonResponse(
+            content={"status": "OK", "natal_id": natal_id, "expires_in": settings.natal_session_ttl, "data": {"subject": natal_session.data}},
             status_code=200,
         )
 
     except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
-            )
+        return get_error_json_response(request, e)
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
 
+@router.post("/api/v4/transit-events", response_description="Exact times of the transit events", response_model=TransitEventsResponseModel)
+async def transit_events(transit_events_request: TransitEventsRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve the exact date and time of the transit events from start to end, sorted by date:
+    the exact aspects of the transiting points to the natal points, the sign ingresses and the stations.
 
-@router.post("/api/v4/composite-aspects-data", response_description="Composite aspects data", response_model=CompositeAspectsResponseModel)
-async def composite_aspects_data(composite_chart_request: CompositeChartRequestModel, request: Request) -> JSONResponse:
+    Much faster than sampling the Transit Aspects Data endpoint: the exact times are found by root finding on the motion of the points.
     """
-    Retrieves the data and the aspects for a composite chart between two subjects. Does not include the chart.
+
+    write_request_to_log(20, request, f"Transit events request from {transit_events_request.start} to {transit_events_request.end}")
+
+    try:
+        natal_session = get_natal_session(transit_events_request.natal_id) if transit_events_request.natal_id is not None else None
+        response_dict = await chart_executor.run(calculate_transit_events, transit_events_request, natal_session)
+        return FastJsonResponse(content=response_dict, status_code=200)
+
+    except Exception as e:
+        return get_error_json_response(request, e)
+
+
+@router.post("/api/v4/batch/birth-data", response_description="Birth data for many subjects", response_model=BatchBirthDataResponseModel)
+async def batch_birth_data(batch_request: BatchBirthDataRequestModel, request: Request) -> FastJsonResponse:
     """
+    Retrieve astrological data for many subjects in a single request, like calling the Birth Data endpoint once per subject.
+    Every result has its own status: a subject that can not be calculated does not make the whole request fail.
 
-    first_subject = composite_chart_request.first_subject
-    second_subject = composite_chart_request.second_subject
+    With the "Accept: application/x-ndjson" header the results are streamed, one JSON line per subject, as soon as they are calculated.
+    With format=columnar or format=columnar-binary the results are returned as a single table, see the README for the layout.
+    """
 
-    write_request_to_log(20, request, f"Getting composite data for: {first_subject} and {second_subject}")
+    write_request_to_log(20, request, f"Batch birth data request for {len(batch_request.subjects)} subjects")
 
     try:
-        first_astrological_subject = AstrologicalSubject(
-            name=first_subject.name,
-            year=first_subject.year,
-            month=first_subject.month,
-            day=first_subject.day,
-            hour=first_subject.hour,
-            minute=first_subject.minute,
-            city=first_subject.city,
-            nation=first_subject.nation,
-            lat=first_subject.latitude,
-            lng=first_subject.longitude,
-            tz_str=first_subject.timezone,
-            zodiac_type=first_subject.zodiac_type, # type: ignore
-            sidereal_mode=first_subject.sidereal_mode,
-            houses_system_identifier=first_subject.houses_system_identifier, # type: ignore
-            perspective_type=first_subject.perspective_type, # type: ignore
-            geonames_username=first_subject.geonames_username,
-            online=True if first_subject.geonames_username else False,
-        )
+        item_requests = [BirthDataRequestModel(subject=subject) for subject in batch_request.subjects]
+        return await get_batch_response(calculate_birth_data, item_requests, request)
 
-        second_astrological_subject = AstrologicalSubject(
-            name=second_subject.name,
-            year=second_subject.year,
-            month=second_subject.month,
-            day=second_subject.day,
-            hour=second_subject.hour,
-            minute=second_subject.minute,
-            city=second_subject.city,
-            nation=second_subject.nation,
-            lat=second_subject.latitude,
-            lng=second_subject.longitude,
-            tz_str=second_subject.timezone,
-            zodiac_type=second_subject.zodiac_type, # type: ignore
-            sidereal_mode=second_subject.sidereal_mode,
-            houses_system_identifier=second_subject.houses_system_identifier, # type: ignore
-            perspective_type=second_subject.perspective_type, # type: ignore
-            geonames_username=second_subject.geonames_username,
-            online=True if second_subject.geonames_username else False,
-        )
+    except Exception as e:
+        return get_error_json_response(request, e)
 
-        composite_factory = CompositeSubjectFactory(first_astrological_subject, second_astrological_subject)
-        composite_data = composite_factory.get_midpoint_composite_subject_model()
-        aspects = NatalAspects(
-            composite_data,
-            active_points=composite_chart_request.active_points or DEFAULT_ACTIVE_POINTS,
-            active_aspects=composite_chart_request.active_aspects or DEFAULT_ACTIVE_ASPECTS,
-        ).relevant_aspects
 
-        composite_subject_dict = composite_data.model_dump()
-        for key in ["first_subject", "second_subject"]:
-            if key in composite_subject_dict:
-                composite_subject_dict.pop(key)
+@router.post("/api/v4/batch/natal-aspects-data", response_description="Natal aspects data for many subjects", response_model=BatchNatalAspectsResponseModel)
+async def batch_natal_aspects_data(batch_request: BatchNatalAspectsRequestModel, request: Request) -> FastJsonResponse:
+    """
+    Retrieve natal aspects and data for many subjects in a single request, like calling the Natal Aspects Data endpoint once per subject.
+    Every result has its own status: a subject that can not be calculated does not make the whole request fail.
 
-        return JSONResponse(
-            content={
-                "status": "OK",
-                "data": {
-                    "composite_subject": composite_subject_dict,
-                    "first_subject": first_astrological_subject.model().model_dump(),
-                    "second_subject": second_astrological_subject.model().model_dump(),
-                },
-                "aspects": [aspect.model_dump() for aspect in aspects],
-            },
-            status_code=200,
-        )
+    With the "Accept: application/x-ndjson" header the results are streamed, one JSON line per subject, as soon as they are calculated.
+    With format=columnar or format=columnar-binary the results are returned as a single table, see the README for the layout.
+    """
 
-    except Exception as e:
-        if "data found for this city" in str(e):
-            write_request_to_log(40, request, e)
-            return JSONResponse(
-                content={
-                    "status": "ERROR",
-                    "message": GEONAMES_ERROR_MESSAGE,
-                },
-                status_code=400,
+    write_request_to_log(20, request, f"Batch natal aspects data request for {len(batch_request.subjects)} subjects")
+
+    try:
+        item_requests = [
+            NatalAspectsRequestModel(
+                subject=subject,
+                active_points=batch_request.active_points,
+                active_aspects=batch_request.active_aspects,
             )
+            for subject in batch_request.subjects
+        ]
+        return await get_batch_response(calculate_natal_aspects_data, item_requests, request)
 
-        write_request_to_log(40, request, e)
-        return InternalServerErrorJsonResponse
\ No newline at end of file
+    except Exception as e:
+        return get_error_json_response(request, e)
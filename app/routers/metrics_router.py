@@ -0,0 +1,109 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from logging import getLogger
+
+from ..config.settings import settings
+from ..utils.chart_cache import chart_cache
+from ..utils.chart_executor import chart_executor
+from ..utils.geocoding_cache import geocoding_cache
+from ..utils.geocoding_index import get_geocoding_index
+from ..utils.prometheus_writer import PROMETHEUS_MEDIA_TYPE, PrometheusWriter
+from ..utils.rate_limiter import rate_limiter
+from ..utils.request_metrics import request_metrics
+from ..utils.secret_key_registry import secret_key_registry
+from ..utils.stage_timings import stage_histograms
+from ..utils.subject_cache import subject_cache
+from ..utils.time_sync import time_sync
+from ..utils.write_request_to_log import get_write_request_to_log
+
+logger = getLogger(__name__)
+write_request_to_log = get_write_request_to_log(logger)
+
+router = APIRouter()
+
+
+def get_metrics() -> str:
+    writer = PrometheusWriter()
+
+    # Requests
+    writer.add(
+        "requests_total",
+        "counter",
+        "Requests by endpoint, method and status.",
+        [({"endpoint": endpoint, "method": method, "status": status}, count) for (endpoint, method, status), count in list(request_metrics.requests.items())],
+    )
+    writer.add_histogram("request_duration_seconds", "Duration of the requests until the last byte.", request_metrics.durations, ["endpoint"])
+    writer.add_histogram("request_stage_duration_seconds", "Duration of the request stages.", stage_histograms, ["endpoint", "stage"])
+    writer.add(
+        "errors_total",
+        "counter",
+        "Failed calculations by endpoint and class: geonames (400), natal_session (404), internal (500), geonames_unavailable (502), queue_full (503).",
+        [({"endpoint": endpoint, "class": error_class}, count) for (endpoint, error_class), count in list(request_metrics.errors.items())],
+    )
+
+    # Chart executor
+    writer.add("executor_in_flight", "gauge", "Calculations running on a worker.", [({}, chart_executor.in_flight)])
+    writer.add("executor_queue_depth", "gauge", "Calculations waiting for a free worker.", [({}, chart_executor.queue_depth)])
+    writer.add("executor_max_workers", "gauge", "Workers of the chart executor.", [({}, chart_executor.max_workers)])
+    writer.add("executor_max_queue", "gauge", "Maximum calculations waiting for a worker.", [({}, chart_executor.max_queue)])
+
+    # Caches, only when they are filled in this process: with the process executor each worker
+    # process has its own subject, chart and geocoding caches, which this process never sees
+    if chart_executor.backend != "process":
+        caches = {"subject": subject_cache.stats(), "chart": chart_cache.stats(), "geocoding": geocoding_cache.stats()}
+        geocoding_index = get_geocoding_index()
+        if geocoding_index is not None:
+            index_stats = geocoding_index.stats()
+            lookups = index_stats["lookups"]
+            caches["geocoding_index"] = {
+                "size": index_stats["size"],
+                "hits": index_stats["hits"],
+                "misses": lookups - index_stats["hits"],
+                "hit_ratio": index_stats["hits"] / lookups if lookups else 0.0,
+            }
+
+        for metric, metric_type, help_text in [
+            ("hits", "counter", "Cache hits, including the negative ones."),
+            ("misses", "counter", "Cache misses."),
+            ("hit_ratio", "gauge", "Hits over lookups since the start."),
+            ("size", "gauge", "Entries in the cache."),
+        ]:
+            samples = []
+            for cache_name, stats in caches.items():
+                value = stats.get(metric)
+                if metric == "hits":
+                    value = stats.get("hits", 0) + stats.get("negative_hits", 0)
+                if value is not None:
+                    samples.append(({"cache": cache_name}, value))
+
+            writer.add(f"cache_{metric}_total" if metric_type == "counter" else f"cache_{metric}", metric_type, help_text, samples)
+
+    # Admission control
+    # Not by key label: /metrics is public, it must not list the customers and their volume
+    writer.add("secret_key_accepted_total", "counter", "Requests accepted with a valid secret key.", [({}, sum(list(secret_key_registry.request_counts.values())))])
+    writer.add("secret_key_rejected_total", "counter", "Requests rejected for a missing or invalid secret key.", [({}, secret_key_registry.rejected_count)])
+
+    if settings.rate_limit_enabled:
+        writer.add("rate_limit_admitted_total", "counter", "Requests admitted by the rate limiter.", [({}, rate_limiter.admitted)])
+        writer.add("rate_limit_rejected_total", "counter", "Requests rejected by the rate limiter, by reason.", [({"reason": reason}, count) for reason, count in list(rate_limiter.rejected.items())])
+
+    # Time synchronization
+    writer.add("time_sync_offset_seconds", "gauge", "Synchronized time minus local time.", [({"source": time_sync.source}, time_sync.offset)])
+    writer.add("time_sync_failures_total", "counter", "Failed time synchronizations.", [({}, time_sync.failures)])
+
+    return writer.render()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request) -> PlainTextResponse:
+    """
+    Metrics in the Prometheus text format.
+    """
+
+    write_request_to_log(10, request, "Metrics request")
+
+    return PlainTextResponse(get_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -1,10 +1,12 @@
+from datetime import datetime, timedelta
 from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Optional, get_args, Union
+from typing import Literal, Optional, get_args, Union
 from kerykeion.kr_types.kr_models import ActiveAspect
-from pytz import all_timezones
+from pytz import all_timezones, timezone as get_timezone
 from kerykeion.kr_types.kr_literals import KerykeionChartTheme, KerykeionChartLanguage, SiderealMode, ZodiacType, HousesSystemIdentifier, PerspectiveType, AxialCusps, Planet
 from kerykeion.settings.config_constants import DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS
 from abc import ABC
+from ..config.settings import settings
 
 class AbstractBaseSubjectModel(BaseModel, ABC):
     year: int = Field(description="The year of birth.", examples=[1980])
@@ -228,7 +230,8 @@ class TransitChartRequestModel(BaseModel):
     The request model for the Transit Chart endpoint.
     """
 
-    first_subject: SubjectModel = Field(description="The name of the person to get the Birth Chart for.")
+    first_subject: Optional[SubjectModel] = Field(default=None, description="The name of the person to get the Birth Chart for. Exactly one of first_subject and natal_id must be set.")
+    natal_id: Optional[str] = Field(default=None, description="The ID of a natal session, instead of first_subject: the natal subject is not calculated again. Exactly one of first_subject and natal_id must be set.", examples=[None])
     transit_subject: TransitSubjectModel = Field(description="The name of the person to get the Birth Chart for.")
     theme: Optional[KerykeionChartTheme] = Field(default="classic", description="The theme of the chart.", examples=["classic", "light", "dark", "dark-high-contrast"])
     language: Optional[KerykeionChartLanguage] = Field(default="EN", description="The language of the chart.", examples=list(get_args(KerykeionChartLanguage)))
@@ -236,6 +239,12 @@ class TransitChartRequestModel(BaseModel):
     active_points: Optional[list[Union[Planet, AxialCusps]]] = Field(default=DEFAULT_ACTIVE_POINTS, description="The active points to display in the chart.", examples=[DEFAULT_ACTIVE_POINTS])
     active_aspects: Optional[list[ActiveAspect]] = Field(default=DEFAULT_ACTIVE_ASPECTS, description="The active aspects to display in the chart.", examples=[DEFAULT_ACTIVE_ASPECTS])
 
+    @model_validator(mode="after")
+    def check_natal_subject(self):
+        if (self.first_subject is None) == (self.natal_id is None):
+            raise ValueError("Please set exactly one of first_subject and natal_id.")
+        return self
+
 class BirthDataRequestModel(BaseModel):
     """
     The request model for the Birth Data endpoint.
@@ -285,3 +294,140 @@ class CompositeChartRequestModel(BaseModel):
     wheel_only: Optional[bool] = Field(default=False, description="If set to True, only the zodiac wheel will be returned. No additional information will be displayed.")
     active_points: Optional[list[Union[Planet, AxialCusps]]] = Field(default=DEFAULT_ACTIVE_POINTS, description="The active points to display in the chart.", examples=[DEFAULT_ACTIVE_POINTS])
     active_aspects: Optional[list[ActiveAspect]] = Field(default=DEFAULT_ACTIVE_ASPECTS, description="The active aspects to display in the chart.", examples=[DEFAULT_ACTIVE_ASPECTS])
+
+
+class BatchBirthDataRequestModel(BaseModel):
+    """
+    The request model for the Batch Birth Data endpoint.
+    """
+
+    subjects: list[SubjectModel] = Field(description="The subjects to get the Birth Data for.", min_length=1, max_length=settings.batch_max_subjects)
+
+
+class BatchNatalAspectsRequestModel(BaseModel):
+    """
+    The request model for the Batch Natal Aspects Data endpoint.
+    """
+
+    subjects: list[SubjectModel] = Field(description="The subjects to get the natal aspects for.", min_length=1, max_length=settings.batch_max_subjects)
+    active_points: Optional[list[Union[Planet, AxialCusps]]] = Field(default=DEFAULT_ACTIVE_POINTS, description="The active points to display in the chart.", examples=[DEFAULT_ACTIVE_POINTS])
+    active_aspects: Optional[list[ActiveAspect]] = Field(default=DEFAULT_ACTIVE_ASPECTS, description="The active aspects to display in the chart.", examples=[DEFAULT_ACTIVE_ASPECTS])
+
+
+class NatalBundleRequestModel(BaseModel):
+    """
+    The request model for the Natal Bundle endpoint.
+    """
+
+    subject: SubjectModel = Field(description="The name of the person to get the Natal Bundle for.")
+    theme: Optional[KerykeionChartTheme] = Field(default="classic", description="The theme of the chart.", examples=["classic", "light", "dark", "dark-high-contrast"])
+    language: Optional[KerykeionChartLanguage] = Field(default="EN", description="The language of the chart.", examples=list(get_args(KerykeionChartLanguage)))
+    wheel_only: Optional[bool] = Field(default=False, description="If set to True, only the zodiac wheel will be returned. No additional information will be displayed.")
+    active_points: Optional[list[Union[Planet, AxialCusps]]] = Field(default=DEFAULT_ACTIVE_POINTS, description="The active points to display in the chart and to return in the points list.", examples=[DEFAULT_ACTIVE_POINTS])
+    active_aspects: Optional[list[ActiveAspect]] = Field(default=DEFAULT_ACTIVE_ASPECTS, description="The active aspects to display in the chart.", examples=[DEFAULT_ACTIVE_ASPECTS])
+
+
+class EphemerisRequestModel(BaseModel):
+    """
+    The request model for the Ephemeris endpoint.
+    """
+
+    start: datetime = Field(description="The date and time of the first sample, in ISO 8601. Without an offset, it is in the given timezone.", examples=["2024-01-01T00:00:00"])
+    end: datetime = Field(description="The date and time of the last sample, included when it falls on a step.", examples=["2024-12-31T00:00:00"])
+    step: timedelta = Field(default=timedelta(days=1), description="The interval between two samples, as an ISO 8601 duration (P1D, PT6H...) or in seconds.", examples=["P1D"])
+    timezone: str = Field(default="UTC", description="The timezone of start and end when they have no offset.", examples=["Europe/London"])
+    latitude: float = Field(default=51.4825766, description="The latitude of the location, used by the axes and the topocentric perspective. Defaults on London.", examples=[51.4825766])
+    longitude: float = Field(default=0, description="The longitude of the location, used by the axes and the topocentric perspective. Defaults on London.", examples=[0])
+    zodiac_type: ZodiacType = Field(default="Tropic", description="The type of zodiac used (Tropic or Sidereal).", examples=list(get_args(ZodiacType)))
+    sidereal_mode: Union[SiderealMode, None] = Field(default=None, description="The sidereal mode used.", examples=[None])
+    perspective_type: PerspectiveType = Field(default="Apparent Geocentric", description="The perspective type used.", examples=list(get_args(PerspectiveType)))
+    active_points: list[Union[Planet, AxialCusps]] = Field(default=DEFAULT_ACTIVE_POINTS, description="The points of the series.", examples=[["Sun", "Moon", "Mercury"]], min_length=1)
+
+    @field_validator("timezone")
+    def validate_timezone(cls, value):
+        if value not in all_timezones:
+            raise ValueError(f"Invalid timezone '{value}'. Please use a valid timezone. You can find a list of valid timezones at https://en.wikipedia.org/wiki/List_of_tz_database_time_zones.")
+        return value
+
+    @field_validator("latitude")
+    def validate_latitude(cls, value):
+        if value < -90 or value > 90:
+            raise ValueError(f"Invalid latitude '{value}'. Please use a value between -90 and 90.")
+        return value
+
+    @field_validator("longitude")
+    def validate_longitude(cls, value):
+        if value < -180 or value > 180:
+            raise ValueError(f"Invalid longitude '{value}'. Please use a value between -180 and 180.")
+        return value
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if self.sidereal_mode and self.zodiac_type != "Sidereal":
+            raise ValueError("Please use 'Sidereal' as zodiac_type when sidereal_mode is set.")
+
+        # Without an offset, the dates are in the request timezone
+        if self.start.tzinfo is None:
+            self.start = get_timezone(self.timezone).localize(self.start)
+        if self.end.tzinfo is None:
+            self.end = get_timezone(self.timezone).localize(self.end)
+
+        if self.end < self.start:
+            raise ValueError("The end of the series must not be before its start.")
+        if self.step <= timedelta(0):
+            raise ValueError("The step must be positive.")
+
+        samples = (self.end - self.start) // self.step + 1
+        if samples > settings.ephemeris_max_samples:
+            raise ValueError(f"Too many samples ({samples}), the maximum is {settings.ephemeris_max_samples}. Please use a shorter range or a longer step.")
+
+        return self
+
+
+class TransitEventsRequestModel(BaseModel):
+    """
+    The request model for the Transit Events endpoint.
+    """
+
+    subject: Optional[SubjectModel] = Field(default=None, description="The natal subject, its zodiac type, sidereal mode, perspective and location are used for the transits too. Exactly one of subject and natal_id must be set.")
+    natal_id: Optional[str] = Field(default=None, description="The ID of a natal session, instead of subject: the natal subject is not calculated again. Exactly one of subject and natal_id must be set.", examples=[None])
+    start: datetime = Field(description="The beginning of the search, in ISO 8601. Without an offset, it is in the given timezone.", examples=["2024-01-01T00:00:00"])
+    end: datetime = Field(description="The end of the search, in ISO 8601.", examples=["2024-12-31T00:00:00"])
+    timezone: str = Field(default="UTC", description="The timezone of start and end when they have no offset.", examples=["Europe/London"])
+    active_points: Optional[list[Union[Planet, AxialCusps]]] = Field(default=DEFAULT_ACTIVE_POINTS, description="The transiting and natal points. The axes are only used as natal points.", examples=[DEFAULT_ACTIVE_POINTS])
+    active_aspects: Optional[list[ActiveAspect]] = Field(default=DEFAULT_ACTIVE_ASPECTS, description="The aspects to search, the orbs are not used: only the exact aspects are events.", examples=[DEFAULT_ACTIVE_ASPECTS])
+    event_types: list[Literal["aspect", "ingress", "station"]] = Field(default=["aspect", "ingress", "station"], description="The types of events to search.", examples=[["aspect", "ingress", "station"]], min_length=1)
+
+    @field_validator("timezone")
+    def validate_timezone(cls, value):
+        if value not in all_timezones:
+            raise ValueError(f"Invalid timezone '{value}'. Please use a valid timezone. You can find a list of valid timezones at https://en.wikipedia.org/wiki/List_of_tz_database_time_zones.")
+        return value
+
+    @model_validator(mode="after")
+    def check_range(self):
+        if (self.subject is None) == (self.natal_id is None):
+            raise ValueError("Please set exactly one of subject and natal_id.")
+
+        # Without an offset, the dates are in the request timezone
+        if self.start.tzinfo is None:
+            self.start = get_timezone(self.timezone).localize(self.start)
+        if self.end.tzinfo is None:
+            self.end = get_timezone(self.timezone).localize(self.end)
+
+        if self.end <= self.start:
+            raise ValueError("The end of the search must be after its start.")
+
+        days = (self.end - self.start) / timedelta(days=1)
+        if days > settings.transit_events_max_days:
+            raise ValueError(f"The search is too long ({days:.0f} days), the maximum is {settings.transit_events_max_days} days.")
+
+        return self
+
+
+class NatalSessionRequestModel(BaseModel):
+    """
+    The request model for the Natal Sessions endpoint.
+    """
+
+    subject: SubjectModel = Field(description="The natal subject, calculated once and referenced by the natal_id of the transit requests.")
@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field
 
 from kerykeion.kr_types import LunarPhaseModel, AstrologicalSubjectModel, CompositeSubjectModel
 from kerykeion.kr_types import Quality, Element, Sign, Houses, Planet, AxialCusps, AspectName, SignsEmoji, SignNumbers, PointType, ZodiacType
-from typing import Optional
+from typing import Optional, Union
 
 
 class AspectModel(BaseModel):
@@ -213,4 +213,138 @@ class CompositeAspectsResponseModel(BaseModel):
 
     status: str = Field(description="The status of the response.")
     data: CompositeDataModel = Field(description="The data of the subjects and the composite chart.")
-    aspects: list[AspectModel] = Field(description="A list with the aspects between the two subjects.")
\ No newline at end of file
+    aspects: list[AspectModel] = Field(description="A list with the aspects between the two subjects.")
+
+
+class SubjectDataModel(BaseModel):
+    """
+    The model for the data of a single subject.
+    """
+    subject: AstrologicalSubjectModel = Field(description="The data of the subject.")
+
+
+class BatchBirthDataItemModel(BaseModel):
+    """
+    The model for one subject of the Batch Birth Data endpoint.
+    """
+    index: int = Field(description="The position of the subject in the request.")
+    status: str = Field(description="The status of the calculation for this subject, OK or ERROR.")
+    data: Optional[BirthDataModel] = Field(default=None, description="The data of the subject, missing on error.")
+    message: Optional[str] = Field(default=None, description="The error message, only on error.")
+
+
+class BatchBirthDataResponseModel(BaseModel):
+    """
+    The response model for the Batch Birth Data endpoint.
+    """
+    status: str = Field(description="The status of the response.")
+    results: list[BatchBirthDataItemModel] = Field(description="The results, in the same order of the request subjects.")
+
+
+class BatchNatalAspectsItemModel(BaseModel):
+    """
+    The model for one subject of the Batch Natal Aspects Data endpoint.
+    """
+    index: int = Field(description="The position of the subject in the request.")
+    status: str = Field(description="The status of the calculation for this subject, OK or ERROR.")
+    data: Optional[SubjectDataModel] = Field(default=None, description="The data of the subject, missing on error.")
+    aspects: Optional[list[AspectModel]] = Field(default=None, description="The natal aspects of the subject, missing on error.")
+    message: Optional[str] = Field(default=None, description="The error message, only on error.")
+
+
+class BatchNatalAspectsResponseModel(BaseModel):
+    """
+    The response model for the Batch Natal Aspects Data endpoint.
+    """
+    status: str = Field(description="The status of the response.")
+    results: list[BatchNatalAspectsItemModel] = Field(description="The results, in the same order of the request subjects.")
+
+
+class NatalBundlePointModel(PlanetModel):
+    """
+    The model for a point of the Natal Bundle endpoint, with the number of its house.
+    """
+    house_number: Optional[int] = Field(default=None, description="The number (1-12) of the house in which the point is located.")
+
+
+class NatalBundleResponseModel(BaseModel):
+    """
+    The response model for the Natal Bundle endpoint.
+    """
+    status: str = Field(description="The status of the response.")
+    data: BirthDataModel = Field(description="The data of the subject.")
+    chart: str = Field(description="The SVG chart of the birth chart.")
+    points: list[NatalBundlePointModel] = Field(description="The active points, in the order of the request, with their house number.")
+    house_cusps: list[float] = Field(description="The absolute positions of the cusps of the 12 houses, from the first one.")
+    ascendant: float = Field(description="The absolute position of the ascendant.")
+    medium_coeli: float = Field(description="The absolute position of the midheaven.")
+    aspects: list[AspectModel] = Field(description="The aspects of the birth chart.")
+
+
+class EphemerisPointSeriesModel(BaseModel):
+    """
+    The model for the series of a point of the Ephemeris endpoint, one value per sample.
+    """
+    longitude: list[float] = Field(description="The absolute positions of the point in the 360 degrees circle of the zodiac.")
+    speed: list[float] = Field(description="The speeds of the point, in degrees per day.")
+    retrograde: list[bool] = Field(description="The retrograde status of the point.")
+
+
+class EphemerisDataModel(BaseModel):
+    """
+    The model for the data of the Ephemeris endpoint.
+    """
+    timestamps: list[float] = Field(description="The UTC Unix timestamps of the samples, in seconds.")
+    points: dict[str, EphemerisPointSeriesModel] = Field(description="The series of the active points, by name.")
+
+
+class EphemerisResponseModel(BaseModel):
+    """
+    The response model for the Ephemeris endpoint.
+    """
+    status: str = Field(description="The status of the response.")
+    data: EphemerisDataModel = Field(description="The series of the points.")
+
+
+class TransitEventModel(BaseModel):
+    """
+    The model for an event of the Transit Events endpoint. The fields of the other types of events are null.
+    """
+    date: str = Field(description="The UTC date and time of the event, in ISO 8601.")
+    timestamp: float = Field(description="The UTC Unix timestamp of the event, in seconds.")
+    type: str = Field(description="The type of the event: aspect, ingress or station.")
+    point: Planet = Field(description="The transiting point.")
+    longitude: float = Field(description="The absolute position of the transiting point at the time of the event.")
+    retrograde: bool = Field(description="The retrograde status of the transiting point, after the event for the stations.")
+    natal_point: Optional[Union[Planet, AxialCusps]] = Field(default=None, description="The natal point of the exact aspect.")
+    aspect: Optional[AspectName] = Field(default=None, description="The name of the exact aspect.")
+    aspect_degrees: Optional[int] = Field(default=None, description="The degrees of the exact aspect.")
+    sign: Optional[Sign] = Field(default=None, description="The sign entered by the transiting point.")
+    sign_num: Optional[SignNumbers] = Field(default=None, description="The number of the sign entered by the transiting point.")
+    direction: Optional[str] = Field(default=None, description="The motion after the station: retrograde or direct.")
+
+
+class TransitEventsResponseModel(BaseModel):
+    """
+    The response model for the Transit Events endpoint.
+    """
+    status: str = Field(description="The status of the response.")
+    events: list[TransitEventModel] = Field(description="The events, sorted by date.")
+    evaluations: int = Field(description="The number of positions calculated to find the events.")
+
+
+class NatalSessionDataModel(BaseModel):
+    """
+    The model for the data of the Natal Sessions endpoint.
+    """
+    subject: AstrologicalSubjectModel = Field(description="The data of the natal subject.")
+
+
+class NatalSessionResponseModel(BaseModel):
+    """
+    The response model for the Natal Sessions endpoint.
+    """
+    status: str = Field(description="The status of the response.")
+    natal_id: str = Field(description="The ID of the session, to use as natal_id in the transit requests.")
+    expires_in: int = Field(description="The seconds after which the session expires (0 = never), it must then be created again.")
+    data: NatalSessionDataModel = Field(description="The data of the natal subject.")
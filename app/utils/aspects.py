@@ -0,0 +1,227 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Aspects between the points of one or two subjects: the rows of the
+    kerykeion NatalAspects and SynastryAspects, in the same order, without
+    their quadratic filter of the aspects to the axes.
+
+    With NumPy installed, the angular distances of all the pairs of points
+    and the matching aspects are calculated at once, as matrices. Otherwise
+    the pairs are looped over in Python, with the same results.
+"""
+
+from logging import getLogger
+from typing import Union
+
+from kerykeion import AstrologicalSubject
+from kerykeion.aspects.natal_aspects import AXES_LIST
+from kerykeion.kr_types.kr_models import ActiveAspect, AspectModel, AstrologicalSubjectModel
+from kerykeion.relationship_score.relationship_score_factory import RelationshipScoreFactory
+from kerykeion.settings.config_constants import DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS
+from kerykeion.settings.kerykeion_settings import get_settings
+from swisseph import difdeg2n
+
+logger = getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+    logger.warning("NumPy is not installed, the aspects are calculated with the slower Python loops. Install the packages of the Pipfile.")
+
+
+_SETTINGS = get_settings()
+
+# In the order of the kerykeion settings, which is the order of the aspects
+CELESTIAL_POINT_IDS: dict[str, int] = {point["name"]: point["id"] for point in _SETTINGS.celestial_points}
+ASPECT_DEGREES: dict[str, int] = {aspect["name"]: aspect["degree"] for aspect in _SETTINGS.aspects}
+AXES_ORBIT: float = _SETTINGS.general_settings.axes_orbit
+
+# Always in opposition, skipped by the natal aspects
+OPPOSITE_PAIRS = {
+    frozenset(("Ascendant", "Descendant")),
+    frozenset(("Medium_Coeli", "Imum_Coeli")),
+    frozenset(("True_Node", "True_South_Node")),
+    frozenset(("Mean_Node", "Mean_South_Node")),
+}
+
+Subject = Union[AstrologicalSubject, AstrologicalSubjectModel]
+# Index of the first point, index of the second point, index of the aspect, distance
+AspectMatch = tuple[int, int, int, float]
+
+
+def get_active_points(subject: Subject, active_points: list[str]) -> list:
+    """
+    The points of the subject that are active, in the order of the settings.
+    """
+
+    return [subject[name.lower()] for name in CELESTIAL_POINT_IDS if name in active_points]
+
+
+def get_aspect_orbs(active_aspects: list[ActiveAspect], first_orb_wins: bool = False) -> list[tuple[str, int, float]]:
+    """
+    Name, degrees and orb of the active aspects, in the order of the settings: the first matching aspect wins.
+    An aspect repeated in active_aspects has its last orb, like in SynastryAspects, or its first one, like in NatalAspects.
+    """
+
+    orbs: dict[str, float] = {}
+    for active_aspect in active_aspects:
+        if not (first_orb_wins and active_aspect["name"] in orbs):
+            orbs[active_aspect["name"]] = active_aspect["orb"]
+
+    return [(name, degrees, orbs[name]) for name, degrees in ASPECT_DEGREES.items() if name in orbs]
+
+
+def _find_aspects_python(first_longitudes: list[float], second_longitudes: list[float], aspect_orbs: list[tuple[str, int, float]], upper_triangle: bool) -> list[AspectMatch]:
+    matches = []
+    for first_index, first_longitude in enumerate(first_longitudes):
+        for second_index in range(first_index + 1 if upper_triangle else 0, len(second_longitudes)):
+            distance = abs(difdeg2n(first_longitude, second_longitudes[second_index]))
+
+            for aspect_index, (_, degrees, orb) in enumerate(aspect_orbs):
+                # kerykeion compares the distance truncated to the degree
+                if degrees - orb <= int(distance) <= degrees + orb:
+                    matches.append((first_index, second_index, aspect_index, distance))
+                    break
+
+    return matches
+
+
+def _find_aspects_numpy(first_longitudes: list[float], second_longitudes: list[float], aspect_orbs: list[tuple[str, int, float]], upper_triangle: bool) -> list[AspectMatch]:
+    if not first_longitudes or not second_longitudes or not aspect_orbs:
+        return []
+
+    # swe_difdeg2n on every pair, with the same floating point operations
+    normalized = np.fmod(np.subtract.outer(np.asarray(first_longitudes, dtype=float), np.asarray(second_longitudes, dtype=float)), 360.0)
+    normalized[np.abs(normalized) < 1e-13] = 0
+    normalized[normalized < 0] += 360.0
+    distances = np.abs(np.where(normalized >= 180.0, normalized - 360.0, normalized))
+
+    truncated = np.trunc(distances)
+    degrees = np.array([aspect_degrees for _, aspect_degrees, _ in aspect_orbs], dtype=float)[:, None, None]
+    orbs = np.array([orb for _, _, orb in aspect_orbs], dtype=float)[:, None, None]
+
+    # One matrix per aspect, the first matching aspect of every pair wins
+    in_orb = (degrees - orbs <= truncated) & (truncated <= degrees + orbs)
+    matched = in_orb.any(axis=0)
+    if upper_triangle:
+        matched &= np.triu(np.ones(matched.shape, dtype=bool), k=1)
+
+    aspect_indexes = in_orb.argmax(axis=0)
+    first_indexes, second_indexes = np.nonzero(matched)
+
+    return [
+        (first_index, second_index, int(aspect_indexes[first_index, second_index]), float(distances[first_index, second_index]))
+        for first_index, second_index in zip(first_indexes.tolist(), second_indexes.tolist())
+    ]
+
+
+def find_aspects(first_longitudes: list[float], second_longitudes: list[float], aspect_orbs: list[tuple[str, int, float]], upper_triangle: bool = False) -> list[AspectMatch]:
+    """
+    The pairs of points in aspect, in row major order, with the index of their aspect in aspect_orbs and their distance.
+    With upper_triangle only the pairs where the second index is greater than the first one are considered.
+    """
+
+    if np is not None:
+        return _find_aspects_numpy(first_longitudes, second_longitudes, aspect_orbs, upper_triangle)
+
+    return _find_aspects_python(first_longitudes, second_longitudes, aspect_orbs, upper_triangle)
+
+
+def _get_aspect_models(
+    first_owner: str,
+    first_points: list,
+    second_owner: str,
+    second_points: list,
+    aspect_orbs: list[tuple[str, int, float]],
+    matches: list[AspectMatch],
+    relevant_only: bool,
+) -> list[AspectModel]:
+    aspects = []
+    for first_index, second_index, aspect_index, distance in matches:
+        first_point, second_point = first_points[first_index], second_points[second_index]
+        name, degrees, _ = aspect_orbs[aspect_index]
+        orbit = distance - degrees
+
+        if relevant_only and (first_point["name"] in AXES_LIST or second_point["name"] in AXES_LIST) and abs(orbit) >= AXES_ORBIT:
+            continue
+
+        aspects.append(
+            AspectModel(
+                p1_name=first_point["name"],
+                p1_owner=first_owner,
+                p1_abs_pos=first_point["abs_pos"],
+                p2_name=second_point["name"],
+                p2_owner=second_owner,
+                p2_abs_pos=second_point["abs_pos"],
+                aspect=name,
+                orbit=orbit,
+                aspect_degrees=degrees,
+                diff=abs(first_point["abs_pos"] - second_point["abs_pos"]),
+                p1=CELESTIAL_POINT_IDS[first_point["name"]],
+                p2=CELESTIAL_POINT_IDS[second_point["name"]],
+            )
+        )
+
+    return aspects
+
+
+def calculate_cross_aspects(
+    first_subject: Subject,
+    second_subject: Subject,
+    active_points: list[str],
+    active_aspects: list[ActiveAspect],
+    relevant_only: bool = True,
+) -> list[AspectModel]:
+    """
+    The aspects between every active point of the first subject and every active point of the second one:
+    the relevant_aspects of SynastryAspects, or its all_aspects when relevant_only is False.
+    Relevant aspects to the axes are within the axes orbit of the settings.
+    """
+
+    aspect_orbs = get_aspect_orbs(active_aspects)
+    first_points = get_active_points(first_subject, active_points)
+    second_points = get_active_points(second_subject, active_points)
+
+    matches = find_aspects([point["abs_pos"] for point in first_points], [point["abs_pos"] for point in second_points], aspect_orbs)
+
+    return _get_aspect_models(first_subject.name, first_points, second_subject.name, second_points, aspect_orbs, matches, relevant_only)
+
+
+def calculate_natal_aspects(subject: Subject, active_points: list[str], active_aspects: list[ActiveAspect]) -> list[AspectModel]:
+    """
+    The aspects between the active points of the subject, every pair once: the relevant_aspects of NatalAspects.
+    """
+
+    aspect_orbs = get_aspect_orbs(active_aspects, first_orb_wins=True)
+    points = get_active_points(subject, active_points)
+    longitudes = [point["abs_pos"] for point in points]
+
+    matches = [
+        match
+        for match in find_aspects(longitudes, longitudes, aspect_orbs, upper_triangle=True)
+        if frozenset((points[match[0]]["name"], points[match[1]]["name"])) not in OPPOSITE_PAIRS
+    ]
+
+    return _get_aspect_models(subject.name, points, subject.name, points, aspect_orbs, matches, relevant_only=True)
+
+
+class AspectMatrixRelationshipScoreFactory(RelationshipScoreFactory):
+    """
+    RelationshipScoreFactory with the synastry aspects of calculate_cross_aspects, the score is the same.
+
+    kerykeion has no public way to pass the aspects to the factory: this sets the attributes of the
+    kerykeion 4.26 constructor, which is why kerykeion is pinned to 4.26 in the Pipfile.
+    """
+
+    def __init__(self, first_subject: Subject, second_subject: Subject, use_only_major_aspects: bool = True) -> None:
+        # The attributes of RelationshipScoreFactory.__init__, without its SynastryAspects
+        self.first_subject = first_subject.model() if isinstance(first_subject, AstrologicalSubject) else first_subject
+        self.second_subject = second_subject.model() if isinstance(second_subject, AstrologicalSubject) else second_subject
+        self.use_only_major_aspects = use_only_major_aspects
+
+        self.score_value = 0
+        self.relationship_score_description = "Minimal"
+        self.is_destiny_sign = True
+        self.relationship_score_aspects = []
+        self._synastry_aspects = calculate_cross_aspects(self.first_subject, self.second_subject, DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS, relevant_only=False)
@@ -0,0 +1,78 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from typing import Optional
+
+from kerykeion import AstrologicalSubject
+
+from .ephemeris import swisseph_global_state
+from .subject_cache import subject_cache, get_subject_cache_key
+from .resolve_city_location import resolve_city_location
+from .stage_timings import time_stage
+from ..types.request_models import AbstractBaseSubjectModel
+
+
+def build_astrological_subject(
+    subject: AbstractBaseSubjectModel,
+    name: Optional[str] = None,
+    zodiac_type: Optional[str] = None,
+    sidereal_mode: Optional[str] = None,
+    houses_system_identifier: Optional[str] = None,
+    perspective_type: Optional[str] = None,
+) -> AstrologicalSubject:
+    """
+    Creates the kerykeion AstrologicalSubject for a request subject.
+
+    The optional arguments override the values of the subject, they are needed
+    for the transit subjects, which inherit them from the natal subject.
+
+    Subjects are cached by the hash of their arguments, the returned object is
+    shared between requests and must not be modified.
+
+    The coordinates and the timezone of online subjects are resolved by resolve_city_location,
+    which uses the offline geocoding index and the geocoding cache before calling GeoNames.
+    """
+
+    zodiac_type = zodiac_type or getattr(subject, "zodiac_type", None)
+    sidereal_mode = sidereal_mode or getattr(subject, "sidereal_mode", None)
+    houses_system_identifier = houses_system_identifier or getattr(subject, "houses_system_identifier", None)
+    perspective_type = perspective_type or getattr(subject, "perspective_type", None)
+
+    subject_kwargs = dict(
+        name=name or getattr(subject, "name", "Now"),
+        year=subject.year,
+        month=subject.month,
+        day=subject.day,
+        hour=subject.hour,
+        minute=subject.minute,
+        city=subject.city,
+        nation=subject.nation,
+        lat=subject.latitude,
+        lng=subject.longitude,
+        tz_str=subject.timezone,
+        zodiac_type=zodiac_type,
+        sidereal_mode=sidereal_mode,
+        houses_system_identifier=houses_system_identifier,
+        perspective_type=perspective_type,
+        geonames_username=subject.geonames_username,
+        online=True if subject.geonames_username else False,
+    )
+
+    cache_key = get_subject_cache_key(subject_kwargs)
+    astrological_subject = subject_cache.get(cache_key)
+    if astrological_subject is not None:
+        return astrological_subject
+
+    if subject_kwargs["online"]:
+        with time_stage("geocoding"):
+            location = resolve_city_location(subject.city, subject.nation, subject.geonames_username)
+        subject_kwargs.update(nation=location.nation, lat=location.lat, lng=location.lng, tz_str=location.tz_str, online=False)
+
+    with time_stage("subject"):
+        with swisseph_global_state(zodiac_type, perspective_type):
+            astrological_subject = AstrologicalSubject(**subject_kwargs)  # type: ignore
+
+    subject_cache.set(cache_key, astrological_subject)
+
+    return astrological_subject
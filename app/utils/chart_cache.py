@@ -0,0 +1,305 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+from .compression import SUPPORTED_ENCODINGS, precompress
+from .lru_cache import LRUCache
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+
+def get_chart_cache_key(
+    chart_type: str,
+    subjects: list[BaseModel],
+    theme: Optional[str],
+    language: Optional[str],
+    wheel_only: Optional[bool],
+    active_points: Optional[list],
+    active_aspects: Optional[list],
+) -> str:
+    """
+    Returns a content hash of everything that changes the rendered SVG.
+    """
+
+    key_data = {
+        "chart_type": chart_type,
+        "subjects": [subject.model_dump(mode="json") for subject in subjects],
+        "theme": theme,
+        "language": language,
+        "wheel_only": bool(wheel_only),
+        "active_points": active_points,
+        "active_aspects": active_aspects,
+    }
+    canonical_json = json.dumps(key_data, sort_keys=True, separators=(",", ":"), default=str)
+
+    return sha256(canonical_json.encode("utf-8")).hexdigest()
+
+
+class ChartCache(ABC):
+    """
+    Storage for the rendered SVG charts.
+    The compressed representations of an entry are made on the first request asking for them, then stored with it.
+    """
+
+    @abstractmethod
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """
+        count_miss=False for lookups that are followed by a counted one (render_chart_svg) on a miss.
+        """
+
+    @abstractmethod
+    def get_compressed(self, key: str, encoding: str) -> Optional[bytes]:
+        """
+        Returns the SVG compressed with the content coding (see compression.SUPPORTED_ENCODINGS), compressing it on the first request.
+        A missing entry returns None and is not counted as a miss.
+        """
+
+    @abstractmethod
+    def set(self, key: str, svg: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class MemoryChartCache(ChartCache):
+    """
+    In-memory LRU store, private to the uvicorn worker process.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 0) -> None:
+        self._cache: LRUCache[tuple[str, dict[str, bytes]]] = LRUCache(max_size=max_size, ttl=ttl)
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        entry = self._cache.get(key, count_miss=count_miss)
+
+        return entry[0] if entry is not None else None
+
+    def get_compressed(self, key: str, encoding: str) -> Optional[bytes]:
+        if encoding not in SUPPORTED_ENCODINGS:
+            return None
+
+        entry = self._cache.get(key, count_miss=False)
+        if entry is None:
+            return None
+
+        svg, compressed = entry
+        if encoding not in compressed:
+            # Concurrent first requests may both compress, the results are the same
+            compressed[encoding] = precompress(svg.encode("utf-8"), encoding)
+
+        return compressed[encoding]
+
+    def set(self, key: str, svg: str) -> None:
+        if self._cache.max_size == 0:
+            return
+
+        self._cache.set(key, (svg, {}))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class DirectoryChartCache(ChartCache):
+    """
+    On-disk store, one file per chart and content coding, that can be shared by several uvicorn workers.
+
+    Files are written atomically, the modification time is refreshed on every hit,
+    so entries unused for `ttl` seconds expire and the least recently used ones are
+    removed when the directory holds more than `max_size` charts.
+    """
+
+    PRUNE_EVERY_WRITES = 64
+
+    def __init__(self, directory: str | Path, max_size: int = 512, ttl: float = 0) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max(0, max_size)
+        self.ttl = max(0, ttl)
+
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    # File suffix of the compressed representations
+    ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+    def _get_path(self, key: str, encoding: Optional[str] = None) -> Path:
+        return self.directory / f"{key}.svg{self.ENCODING_SUFFIXES[encoding] if encoding else ''}"
+
+    def _remove(self, key: str) -> None:
+        self._get_path(key).unlink(missing_ok=True)
+        for encoding in self.ENCODING_SUFFIXES:
+            self._get_path(key, encoding).unlink(missing_ok=True)
+
+    def _check_expired(self, key: str) -> None:
+        """
+        Raises FileNotFoundError when the entry does not exist or is expired, expired entries are removed.
+        """
+
+        path = self._get_path(key)
+        if self.ttl and path.stat().st_mtime + self.ttl < time.time():
+            self._remove(key)
+            raise FileNotFoundError(path)
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        path = self._get_path(key)
+
+        try:
+            self._check_expired(key)
+            svg = path.read_text(encoding="utf-8")
+            os.utime(path)
+
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += count_miss
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return svg
+
+    def get_compressed(self, key: str, encoding: str) -> Optional[bytes]:
+        if encoding not in self.ENCODING_SUFFIXES or encoding not in SUPPORTED_ENCODINGS:
+            return None
+
+        path = self._get_path(key)
+        compressed_path = self._get_path(key, encoding)
+
+        try:
+            # A stat, the SVG is read only when it is compressed for the first time
+            self._check_expired(key)
+
+            try:
+                compressed_data = compressed_path.read_bytes()
+            except FileNotFoundError:
+                compressed_data = precompress(path.read_bytes(), encoding)
+                self._write_compressed(key, compressed_path, compressed_data)
+
+            os.utime(path)
+
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return compressed_data
+
+    def _write_compressed(self, key: str, compressed_path: Path, compressed_data: bytes) -> None:
+        try:
+            self._write(compressed_path, compressed_data)
+        except OSError as e:
+            logger.warning(f"Unable to write the chart cache entry {compressed_path.name}: {e}")
+            return
+
+        # The entry may have been removed meanwhile, its compressed files must not outlive it
+        if not self._get_path(key).exists():
+            compressed_path.unlink(missing_ok=True)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as temporary_file:
+                temporary_file.write(data)
+            os.replace(temporary_path, path)
+
+        except OSError:
+            Path(temporary_path).unlink(missing_ok=True)
+            raise
+
+    def set(self, key: str, svg: str) -> None:
+        if self.max_size == 0:
+            return
+
+        try:
+            self._write(self._get_path(key), svg.encode("utf-8"))
+
+        except OSError as e:
+            logger.warning(f"Unable to write the chart cache entry {key}: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % self.PRUNE_EVERY_WRITES == 0
+
+        if should_prune:
+            self.prune()
+
+    def prune(self) -> None:
+        """
+        Removes the expired entries and the least recently used ones above max_size.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".svg"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+
+        entries.sort(reverse=True)
+        now = time.time()
+
+        for index, (modified_at, entry_path) in enumerate(entries):
+            if index >= self.max_size or (self.ttl and modified_at + self.ttl < now):
+                self._remove(Path(entry_path).stem)
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.svg*"):
+            path.unlink(missing_ok=True)
+
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+
+        return {
+            "backend": "directory",
+            "size": sum(1 for _ in self.directory.glob("*.svg")),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_chart_cache() -> ChartCache:
+    if settings.chart_cache_backend == "directory":
+        directory = settings.chart_cache_directory or Path(__file__).parent.parent / "tmp" / "chart_cache"
+        return DirectoryChartCache(directory, max_size=settings.chart_cache_max_size, ttl=settings.chart_cache_ttl)
+
+    if settings.chart_cache_backend != "memory":
+        raise ValueError(f"Invalid chart cache backend '{settings.chart_cache_backend}'. Please use 'memory' or 'directory'.")
+
+    return MemoryChartCache(max_size=settings.chart_cache_max_size, ttl=settings.chart_cache_ttl)
+
+
+chart_cache = create_chart_cache()
@@ -0,0 +1,175 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from logging import getLogger
+from multiprocessing import get_context
+from typing import Any, AsyncIterator, Callable, Iterable, Literal, TypeVar
+
+from .request_profiler import get_current_profile, run_profiled
+from .stage_timings import add_timings, run_with_timings
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+ExecutorBackend = Literal["thread", "process", "inline"]
+
+
+class ExecutorQueueFullError(Exception):
+    """
+    Raised when the executor already has too many calculations waiting for a worker.
+    """
+
+
+class ChartExecutor:
+    """
+    Runs the CPU-bound kerykeion calculations outside of the asyncio event loop.
+
+    Backends:
+        - thread: a ThreadPoolExecutor shared by the uvicorn worker.
+        - process: a ProcessPoolExecutor, functions and arguments must be picklable.
+          Each worker process fills its own subject, chart and geocoding caches, left out of /metrics.
+        - inline: the function is called directly on the event loop (useful for debugging).
+
+    At most `max_workers` calculations run at the same time, and at most `max_queue`
+    wait for a free worker. Further calls are rejected with ExecutorQueueFullError,
+    so that the event loop is never flooded by pending work.
+    """
+
+    def __init__(self, backend: ExecutorBackend = "thread", max_workers: int = 4, max_queue: int = 64) -> None:
+        if backend not in ("thread", "process", "inline"):
+            raise ValueError(f"Invalid executor backend '{backend}'. Please use 'thread', 'process' or 'inline'.")
+
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+
+        self._pool: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calculations currently running on a worker."""
+        return min(self._pending, self.max_workers)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calculations waiting for a free worker."""
+        return max(0, self._pending - self.max_workers)
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.backend == "process":
+                    # Spawn instead of fork: the parent process already runs the event loop and other threads.
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context("spawn"))
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chart-worker")
+
+                logger.info(f"Started {self.backend} chart executor with {self.max_workers} workers")
+
+            return self._pool
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Runs func(*args, **kwargs) on the configured backend and returns its result.
+        Exceptions raised by func are propagated to the caller.
+        The stage timings collected by func are added to the ones of the caller.
+        When the caller is profiled, func runs under the profiler and its profile is added to the caller's one.
+        """
+
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise ExecutorQueueFullError(f"Too many pending calculations ({self._pending}).")
+            self._pending += 1
+
+        profile = get_current_profile()
+        if profile is None:
+            call = partial(run_with_timings, func, *args, **kwargs)
+        else:
+            call = partial(run_profiled, profile.mode, settings.profiling_sampling_interval, func, *args, **kwargs)
+
+        if self.backend == "inline":
+            try:
+                output = call()
+            finally:
+                self._release()
+        else:
+            try:
+                future = self._get_pool().submit(call)
+            except BaseException:
+                self._release()
+                raise
+
+            # The slot is freed when the calculation ends, not when the caller stops waiting for it:
+            # a cancelled caller (e.g. a client that disconnected) can not free a worker that is still busy.
+            future.add_done_callback(self._release)
+            output = await asyncio.wrap_future(future)
+
+        if profile is not None:
+            profile.profiles.append(output[2])
+
+        add_timings(output[1])
+        return output[0]
+
+    def _release(self, future: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def as_completed(self, func: Callable[..., T], arguments: Iterable[Any], concurrency: int | None = None) -> AsyncIterator[tuple[int, T]]:
+        """
+        Runs func(argument) for every argument and yields (position, result) pairs as soon as they are ready.
+
+        At most `concurrency` calls (default: max_workers) are submitted at the same time,
+        so that a large batch neither fills the queue nor starves the other requests.
+        If a call fails, or the consumer stops iterating, the calls not yet started are cancelled.
+        """
+
+        concurrency = max(1, concurrency or self.max_workers)
+        pending: set[asyncio.Future] = set()
+
+        async def run_at(position: int, argument: Any) -> tuple[int, T]:
+            return position, await self.run(func, argument)
+
+        try:
+            for position, argument in enumerate(arguments):
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+
+                pending.add(asyncio.ensure_future(run_at(position, argument)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def shutdown(self) -> None:
+        """
+        Stops the worker pool, it will be recreated on the next call to run().
+        """
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+chart_executor = ChartExecutor(
+    backend=settings.executor_backend,  # type: ignore
+    max_workers=settings.executor_max_workers,
+    max_queue=settings.executor_max_queue,
+)
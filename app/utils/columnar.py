@@ -0,0 +1,279 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Columnar encoding of the batch and time-series responses, opt-in with the
+    format query parameter or the Accept header:
+
+        - columnar (application/vnd.astrologer.columnar+json): one array per
+          field instead of one object per record. Nested objects become dotted
+          columns ("sun.abs_pos"), strings (signs, elements, names...) become
+          integer codes into a lookup table, and lists of objects (the aspects
+          of a subject) become child tables with a "parent" column.
+
+        - columnar-binary (application/vnd.astrologer.columnar): the same tables
+          as packed little endian buffers, aligned to 8 bytes, that can be
+          memory mapped or wrapped without copies (numpy.frombuffer, JS typed
+          arrays...). Layout:
+              8 bytes magic "ASTRCOL1", uint32 header size, JSON header,
+              padding, buffers.
+          The header is the JSON document where every column is replaced by
+          {"type", "offset", "count"}: offset is relative to the start of the
+          buffers. Types: float32, float64, int32, uint8 (booleans, 255 is
+          null) and int8/int16/int32 codes (-1 is null). Floats are float32
+          unless they exceed 65536 in absolute value (julian days, timestamps),
+          null floats are NaN. Columns that can not be packed are kept in the
+          header as {"type": "json", "values": [...]}.
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+from typing import Any, Iterator, Literal, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .fast_json_response import dumps_json
+from .stage_timings import time_stage
+
+
+ColumnarFormat = Literal["json", "binary"]
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.astrologer.columnar+json"
+BINARY_COLUMNAR_MEDIA_TYPE = "application/vnd.astrologer.columnar"
+COLUMNAR_MEDIA_TYPES: dict[ColumnarFormat, str] = {"json": COLUMNAR_MEDIA_TYPE, "binary": BINARY_COLUMNAR_MEDIA_TYPE}
+
+BINARY_MAGIC = b"ASTRCOL1"
+BINARY_HEADER_SIZE = struct.Struct("<I")
+BINARY_ALIGNMENT = 8
+
+# Floats above this absolute value lose too much precision in float32
+FLOAT32_LIMIT = 65536
+NULL_BOOL = 255
+NULL_CODE = -1
+
+# array typecodes of the binary types
+TYPECODES = {"float32": "f", "float64": "d", "int32": "i", "uint8": "B", "int8": "b", "int16": "h"}
+
+
+def get_columnar_format(request: Request) -> Optional[ColumnarFormat]:
+    """
+    The columnar format asked by the client, with the format=columnar / columnar-binary query parameter or the Accept header.
+    """
+
+    requested_format = request.query_params.get("format")
+    if requested_format == "columnar":
+        return "json"
+    if requested_format == "columnar-binary":
+        return "binary"
+
+    accept = request.headers.get("accept", "")
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return "json"
+    if BINARY_COLUMNAR_MEDIA_TYPE in accept:
+        return "binary"
+
+    return None
+
+
+def _flatten(record: dict, prefix: str = "") -> Iterator[tuple[str, Any]]:
+    for key, value in record.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        else:
+            yield prefix + key, value
+
+
+def _is_record_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def columns_to_table(columns: dict[str, list]) -> dict:
+    """
+    A table from columns of the same length, the string columns are replaced by codes into a lookup table.
+    """
+
+    length = len(next(iter(columns.values()), []))
+    table: dict[str, Any] = {"length": length, "columns": {}, "lookups": {}, "tables": {}}
+
+    for key, values in columns.items():
+        if any(isinstance(value, str) for value in values) and all(value is None or isinstance(value, str) for value in values):
+            codes: dict[str, int] = {}
+            table["columns"][key] = [None if value is None else codes.setdefault(value, len(codes)) for value in values]
+            table["lookups"][key] = list(codes)
+        else:
+            table["columns"][key] = values
+
+    return table
+
+
+def rows_to_table(rows: list[dict]) -> dict:
+    """
+    A table from a list of records, the lists of records they contain become child tables.
+    """
+
+    flat_rows = [dict(_flatten(row)) for row in rows]
+
+    keys: dict[str, None] = {}
+    child_rows: dict[str, list[dict]] = {}
+    for position, flat_row in enumerate(flat_rows):
+        for key, value in flat_row.items():
+            if _is_record_list(value):
+                child_rows.setdefault(key, []).extend({"parent": position, **child} for child in value)
+            elif key not in child_rows:
+                keys[key] = None
+
+    table = columns_to_table({key: [flat_row.get(key) for flat_row in flat_rows] for key in keys if key not in child_rows})
+    table["length"] = len(rows)
+    table["tables"] = {key: rows_to_table(children) for key, children in child_rows.items()}
+
+    return table
+
+
+def _get_column_type(key: str, values: list, lookups: dict[str, list]) -> str:
+    present = [value for value in values if value is not None]
+
+    if key in lookups:
+        size = len(lookups[key])
+        return "int8" if size < 2**7 else "int16" if size < 2**15 else "int32"
+    if not present:
+        return "json"
+    if all(isinstance(value, bool) for value in present):
+        return "uint8"
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return "json"
+    if len(present) == len(values) and all(isinstance(value, int) for value in present) and all(-2**31 <= value < 2**31 for value in present):
+        return "int32"
+    return "float32" if all(abs(value) < FLOAT32_LIMIT for value in present) else "float64"
+
+
+def _pack_column(column_type: str, values: list) -> bytes:
+    if column_type == "uint8":
+        packed = array("B", (NULL_BOOL if value is None else int(value) for value in values))
+    elif column_type in ("float32", "float64"):
+        packed = array(TYPECODES[column_type], (math.nan if value is None else value for value in values))
+    else:
+        packed = array(TYPECODES[column_type], (NULL_CODE if value is None else value for value in values))
+
+    if sys.byteorder == "big":
+        packed.byteswap()
+
+    return packed.tobytes()
+
+
+def _pack_table(table: dict, buffers: bytearray) -> dict:
+    """
+    The header of the table, its columns are appended to buffers.
+    """
+
+    header = {**table, "columns": {}, "tables": {}}
+
+    for key, values in table["columns"].items():
+        column_type = _get_column_type(key, values, table["lookups"])
+        if column_type == "json":
+            header["columns"][key] = {"type": "json", "values": values}
+            continue
+
+        buffers.extend(b"\0" * (-len(buffers) % BINARY_ALIGNMENT))
+        header["columns"][key] = {"type": column_type, "offset": len(buffers), "count": len(values)}
+        buffers.extend(_pack_column(column_type, values))
+
+    for key, child_table in table["tables"].items():
+        header["tables"][key] = _pack_table(child_table, buffers)
+
+    return header
+
+
+def encode_binary(document: dict, table_key: str) -> bytes:
+    """
+    The binary encoding of a document whose table is at table_key.
+    """
+
+    buffers = bytearray()
+    header = {**document, table_key: _pack_table(document[table_key], buffers)}
+
+    encoded_header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    start = len(BINARY_MAGIC) + BINARY_HEADER_SIZE.size + len(encoded_header)
+    padding = b" " * (-start % BINARY_ALIGNMENT)
+
+    return BINARY_MAGIC + BINARY_HEADER_SIZE.pack(len(encoded_header) + len(padding)) + encoded_header + padding + bytes(buffers)
+
+
+def _unpack_table(header: dict, buffers: memoryview) -> dict:
+    table = {**header, "columns": {}, "tables": {}}
+
+    for key, column in header["columns"].items():
+        if column["type"] == "json":
+            table["columns"][key] = column["values"]
+            continue
+
+        packed = array(TYPECODES[column["type"]])
+        packed.frombytes(buffers[column["offset"]:column["offset"] + column["count"] * packed.itemsize])
+        if sys.byteorder == "big":
+            packed.byteswap()
+
+        if column["type"] == "uint8":
+            table["columns"][key] = [None if value == NULL_BOOL else bool(value) for value in packed]
+        elif column["type"] in ("float32", "float64"):
+            table["columns"][key] = [None if math.isnan(value) else value for value in packed]
+        elif key in header["lookups"]:
+            table["columns"][key] = [None if value == NULL_CODE else value for value in packed]
+        else:
+            table["columns"][key] = packed.tolist()
+
+    for key, child_header in header["tables"].items():
+        table["tables"][key] = _unpack_table(child_header, buffers)
+
+    return table
+
+
+def decode_binary(data: bytes, table_key: str) -> dict:
+    """
+    The document encoded by encode_binary, with the columns as lists. Reference implementation for the clients.
+    """
+
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("Not a binary columnar document.")
+
+    (header_size,) = BINARY_HEADER_SIZE.unpack_from(data, len(BINARY_MAGIC))
+    start = len(BINARY_MAGIC) + BINARY_HEADER_SIZE.size
+    document = json.loads(data[start:start + header_size])
+    buffers = memoryview(data)[start + header_size:]
+
+    return {**document, table_key: _unpack_table(document[table_key], buffers)}
+
+
+def decode_table(table: dict) -> list[dict]:
+    """
+    The flat records of a table, with the codes replaced by their strings. Reference implementation for the clients.
+    """
+
+    columns = {
+        key: [None if code is None else table["lookups"][key][code] for code in values] if key in table["lookups"] else values
+        for key, values in table["columns"].items()
+    }
+
+    return [{key: values[position] for key, values in columns.items()} for position in range(table["length"])]
+
+
+def encode_columnar(document: dict, table_key: str, columnar_format: ColumnarFormat) -> bytes:
+    """
+    The body of a columnar response, document[table_key] is a table.
+    """
+
+    with time_stage("serialization"):
+        if columnar_format == "binary":
+            return encode_binary(document, table_key)
+
+        return dumps_json(document)
+
+
+class ColumnarResponse(Response):
+    """
+    A body encoded by encode_columnar, with the media type of its format.
+    """
+
+    def __init__(self, content: bytes, columnar_format: ColumnarFormat, **kwargs: Any) -> None:
+        super().__init__(content=content, media_type=COLUMNAR_MEDIA_TYPES[columnar_format], **kwargs)
@@ -0,0 +1,106 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import gzip
+import zlib
+from logging import getLogger
+from typing import Optional
+
+logger = getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # type: ignore
+    logger.warning("brotli is not installed, the responses are compressed with gzip only. Install the packages of the Pipfile.")
+
+
+# Content codings in order of preference, brotli only when it is installed
+SUPPORTED_ENCODINGS: tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Levels used for the responses compressed on the fly and for the cached entries, compressed once on their first request
+RESPONSE_LEVELS = {"br": 4, "gzip": 6}
+PRECOMPRESSION_LEVELS = {"br": 9, "gzip": 9}
+
+COMPRESSIBLE_MEDIA_TYPES = ("application/json", "application/x-ndjson", "application/vnd.astrologer.columnar", "image/svg+xml", "application/javascript", "text/")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Returns the preferred supported coding of an Accept-Encoding header, None for the identity.
+    """
+
+    qualities: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, parameters = item.strip().partition(";")
+        if not coding:
+            continue
+
+        quality = 1.0
+        parameter_name, _, value = parameters.strip().partition("=")
+        if parameter_name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+
+        qualities[coding.strip()] = quality
+
+    best_encoding, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+
+    return best_encoding
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_MEDIA_TYPES)
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=RESPONSE_LEVELS["br"] if level is None else level)
+
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=RESPONSE_LEVELS["gzip"] if level is None else level, mtime=0)
+
+    raise ValueError(f"Unsupported content coding '{encoding}'.")
+
+
+def precompress(data: bytes, encoding: str) -> bytes:
+    """
+    Returns the data compressed with the coding at the highest level worth caching.
+    """
+
+    return compress(data, encoding, PRECOMPRESSION_LEVELS[encoding])
+
+
+class StreamCompressor:
+    """
+    Incremental compressor for streamed responses: every chunk is flushed, so that it reaches the client immediately.
+    """
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+
+        if encoding == "br" and brotli is not None:
+            self._brotli = brotli.Compressor(quality=RESPONSE_LEVELS["br"])
+        elif encoding == "gzip":
+            self._zlib = zlib.compressobj(RESPONSE_LEVELS["gzip"], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError(f"Unsupported content coding '{encoding}'.")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(chunk) + self._brotli.flush()
+
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+
+        return self._zlib.flush()
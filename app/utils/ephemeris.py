@@ -0,0 +1,178 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Positions of the points over a range of dates, calculated with the Swiss
+    Ephemeris directly, in one pass per point: no AstrologicalSubject (houses,
+    lunar phase, models...) is built for the samples. The flags and the
+    ephemeris files are the same used by kerykeion, so the positions are the
+    ones of the subject endpoints.
+"""
+
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import ContextManager, Optional
+
+import swisseph as swe
+import kerykeion
+from kerykeion.utilities import get_number_from_name
+
+from .stage_timings import time_stage
+
+
+EPHEMERIS_PATH = Path(kerykeion.__file__).parent / "sweph"
+DEFAULT_SIDEREAL_MODE = "FAGAN_BRADLEY"
+
+# Julian day of 1970-01-01T00:00:00 UTC
+EPOCH_JULIAN_DAY = 2440587.5
+SECONDS_PER_DAY = 86400
+
+# Points calculated from the opposite one: same speed, 180 degrees away
+OPPOSITE_POINTS = {
+    "Mean_South_Node": "Mean_Node",
+    "True_South_Node": "True_Node",
+    "Descendant": "Ascendant",
+    "Imum_Coeli": "Medium_Coeli",
+}
+AXES = ("Ascendant", "Medium_Coeli")
+
+# The Swiss Ephemeris keeps the sidereal mode and the topocentric position as global state,
+# so calculations depending on them must not run concurrently on the thread executor.
+SWISSEPH_GLOBAL_STATE_LOCK = threading.Lock()
+
+
+def get_julian_day(timestamp: float) -> float:
+    return timestamp / SECONDS_PER_DAY + EPOCH_JULIAN_DAY
+
+
+def get_sample_timestamps(start: datetime, end: datetime, step: timedelta) -> list[float]:
+    """
+    UTC timestamps from start to end (included when it falls on a step), every step.
+    Naive datetimes are UTC.
+    """
+
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+
+    first_timestamp = start.timestamp()
+    step_seconds = step.total_seconds()
+    samples = int((end.timestamp() - first_timestamp) // step_seconds) + 1
+
+    return [first_timestamp + sample * step_seconds for sample in range(samples)]
+
+
+def swisseph_global_state(zodiac_type: Optional[str], perspective_type: Optional[str]) -> ContextManager:
+    """
+    The lock to hold from setting the Swiss Ephemeris global state to the last calculation using it,
+    a no-op context when the calculation does not depend on it.
+    """
+
+    if zodiac_type == "Sidereal" or perspective_type == "Topocentric":
+        return SWISSEPH_GLOBAL_STATE_LOCK
+
+    return nullcontext()
+
+
+def get_flags(zodiac_type: str, sidereal_mode: Optional[str], perspective_type: str, latitude: float, longitude: float) -> int:
+    """
+    The Swiss Ephemeris flags of AstrologicalSubject, sets the sidereal mode and the topocentric position too:
+    call it, and calculate with the flags, within swisseph_global_state.
+    """
+
+    swe.set_ephe_path(str(EPHEMERIS_PATH))
+    flags = swe.FLG_SWIEPH + swe.FLG_SPEED
+
+    if perspective_type == "True Geocentric":
+        flags += swe.FLG_TRUEPOS
+    elif perspective_type == "Heliocentric":
+        flags += swe.FLG_HELCTR
+    elif perspective_type == "Topocentric":
+        flags += swe.FLG_TOPOCTR
+        swe.set_topo(longitude, latitude, 0)
+
+    if zodiac_type == "Sidereal":
+        flags += swe.FLG_SIDEREAL
+        swe.set_sid_mode(getattr(swe, "SIDM_" + (sidereal_mode or DEFAULT_SIDEREAL_MODE)))
+
+    return flags
+
+
+def calculate_planet_series(julian_days: list[float], planet_number: int, flags: int) -> tuple[list[float], list[float]]:
+    calc_ut = swe.calc_ut
+    longitudes = []
+    speeds = []
+
+    for julian_day in julian_days:
+        position = calc_ut(julian_day, planet_number, flags)[0]
+        longitudes.append(position[0])
+        speeds.append(position[3])
+
+    return longitudes, speeds
+
+
+def calculate_axes_series(julian_days: list[float], latitude: float, longitude: float, sidereal: bool) -> dict[str, tuple[list[float], list[float]]]:
+    """
+    Ascendant and Medium Coeli, they do not depend on the house system (Porphyry never fails at high latitudes).
+    """
+
+    houses_ex2 = swe.houses_ex2
+    flags = swe.FLG_SIDEREAL if sidereal else 0
+    series: dict[str, tuple[list[float], list[float]]] = {axis: ([], []) for axis in AXES}
+
+    for julian_day in julian_days:
+        _, ascmc, _, ascmc_speeds = houses_ex2(julian_day, latitude, longitude, b"O", flags)
+        for index, axis in enumerate(AXES):
+            series[axis][0].append(ascmc[index])
+            series[axis][1].append(ascmc_speeds[index])
+
+    return series
+
+
+def calculate_ephemeris(
+    timestamps: list[float],
+    active_points: list[str],
+    latitude: float,
+    longitude: float,
+    zodiac_type: str = "Tropic",
+    sidereal_mode: Optional[str] = None,
+    perspective_type: str = "Apparent Geocentric",
+) -> dict[str, dict[str, list]]:
+    """
+    Returns the longitude, speed (degrees per day) and retrograde columns of every active point at the given UTC timestamps.
+    The axes are never retrograde, like in AstrologicalSubject.
+    """
+
+    with time_stage("ephemeris"):
+        julian_days = [get_julian_day(timestamp) for timestamp in timestamps]
+
+        calculated: dict[str, tuple[list[float], list[float]]] = {}
+        with swisseph_global_state(zodiac_type, perspective_type):
+            flags = get_flags(zodiac_type, sidereal_mode, perspective_type, latitude, longitude)
+
+            for point in active_points:
+                calculated_point = OPPOSITE_POINTS.get(point, point)
+                if calculated_point in calculated:
+                    continue
+
+                if calculated_point in AXES:
+                    calculated.update(calculate_axes_series(julian_days, latitude, longitude, zodiac_type == "Sidereal"))
+                else:
+                    calculated[calculated_point] = calculate_planet_series(julian_days, get_number_from_name(calculated_point), flags)  # type: ignore
+
+        series = {}
+        for point in active_points:
+            longitudes, speeds = calculated[OPPOSITE_POINTS.get(point, point)]
+            if point in OPPOSITE_POINTS:
+                longitudes = [(point_longitude + 180) % 360 for point_longitude in longitudes]
+
+            is_axis = OPPOSITE_POINTS.get(point, point) in AXES
+            series[point] = {
+                "longitude": longitudes,
+                "speed": speeds,
+                "retrograde": [False] * len(speeds) if is_axis else [speed < 0 for speed in speeds],
+            }
+
+    return series
@@ -0,0 +1,210 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from logging import getLogger
+from pathlib import Path
+from typing import Optional, Union
+
+from .geocoding_index import CityLocation, normalize_city_name, normalize_nation
+from .lru_cache import LRUCache
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+
+class CityNotFound:
+    """
+    Negative cache entry: GeoNames returned no data for the city.
+    """
+
+
+CITY_NOT_FOUND = CityNotFound()
+
+GeocodingCacheEntry = Union[CityLocation, CityNotFound]
+
+
+def get_geocoding_cache_key(city: str, nation: Optional[str], geonames_username: Optional[str] = None) -> str:
+    """
+    Positive results do not depend on the GeoNames username, negative ones do:
+    a wrong username must not hide a valid city from the other users.
+    """
+
+    key = f"{normalize_city_name(city)}|{normalize_nation(nation)}"
+    if geonames_username is not None:
+        key += f"|{geonames_username}"
+
+    return key
+
+
+class GeocodingCache(ABC):
+    """
+    Cache of the GeoNames results, with separate TTLs for found and not found cities.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[GeocodingCacheEntry]:
+        ...
+
+    @abstractmethod
+    def _set(self, key: str, entry: GeocodingCacheEntry, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    def get(self, city: str, nation: Optional[str], geonames_username: Optional[str]) -> Optional[GeocodingCacheEntry]:
+        entry = self._get(get_geocoding_cache_key(city, nation))
+        if entry is None:
+            entry = self._get(get_geocoding_cache_key(city, nation, geonames_username))
+
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+            elif isinstance(entry, CityNotFound):
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+
+        return entry
+
+    def set_found(self, city: str, nation: Optional[str], location: CityLocation) -> None:
+        self._set(get_geocoding_cache_key(city, nation), location, self.ttl)
+
+    def set_not_found(self, city: str, nation: Optional[str], geonames_username: Optional[str]) -> None:
+        self._set(get_geocoding_cache_key(city, nation, geonames_username), CITY_NOT_FOUND, self.negative_ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+class MemoryGeocodingCache(GeocodingCache):
+    """
+    In-memory store, private to the uvicorn worker process.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float) -> None:
+        super().__init__(ttl, negative_ttl)
+        self._cache: LRUCache[GeocodingCacheEntry] = LRUCache(max_size=max_size)
+
+    def _get(self, key: str) -> Optional[GeocodingCacheEntry]:
+        return self._cache.get(key)
+
+    def _set(self, key: str, entry: GeocodingCacheEntry, ttl: float) -> None:
+        self._cache.set(key, entry, ttl=ttl)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "size": len(self._cache), **super().stats()}
+
+
+class SqliteGeocodingCache(GeocodingCache):
+    """
+    SQLite store, shared by every uvicorn worker using the same database file.
+    """
+
+    def __init__(self, database_path: str | Path, ttl: float, negative_ttl: float) -> None:
+        super().__init__(ttl, negative_ttl)
+        self.database_path = Path(database_path)
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocoding ("
+                "key TEXT PRIMARY KEY, found INTEGER NOT NULL, name TEXT, nation TEXT, "
+                "lat REAL, lng REAL, tz_str TEXT, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.database_path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+
+        return connection
+
+    def _get(self, key: str) -> Optional[GeocodingCacheEntry]:
+        try:
+            row = self._connect().execute(
+                "SELECT found, name, nation, lat, lng, tz_str FROM geocoding WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Unable to read the geocoding cache: {e}")
+            return None
+
+        if row is None:
+            return None
+
+        found, name, nation, lat, lng, tz_str = row
+        if not found:
+            return CITY_NOT_FOUND
+
+        return CityLocation(name=name, nation=nation, lat=lat, lng=lng, tz_str=tz_str, population=0)
+
+    def _set(self, key: str, entry: GeocodingCacheEntry, ttl: float) -> None:
+        expires_at = time.time() + ttl if ttl else float("inf")
+
+        if isinstance(entry, CityLocation):
+            row = (key, 1, entry.name, entry.nation, entry.lat, entry.lng, entry.tz_str, expires_at)
+        else:
+            row = (key, 0, None, None, None, None, None, expires_at)
+
+        try:
+            with self._connect() as connection:
+                connection.execute("INSERT OR REPLACE INTO geocoding VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+                connection.execute("DELETE FROM geocoding WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.warning(f"Unable to write the geocoding cache: {e}")
+
+    def clear(self) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM geocoding")
+
+    def stats(self) -> dict:
+        size = self._connect().execute("SELECT COUNT(*) FROM geocoding").fetchone()[0]
+
+        return {"backend": "sqlite", "size": size, **super().stats()}
+
+
+def create_geocoding_cache() -> GeocodingCache:
+    if settings.geocoding_cache_backend == "sqlite":
+        database_path = settings.geocoding_cache_path or Path(__file__).parent.parent / "tmp" / "geocoding_cache.sqlite"
+        return SqliteGeocodingCache(database_path, ttl=settings.geocoding_cache_ttl, negative_ttl=settings.geocoding_cache_negative_ttl)
+
+    if settings.geocoding_cache_backend != "memory":
+        raise ValueError(f"Invalid geocoding cache backend '{settings.geocoding_cache_backend}'. Please use 'memory' or 'sqlite'.")
+
+    return MemoryGeocodingCache(
+        max_size=settings.geocoding_cache_max_size,
+        ttl=settings.geocoding_cache_ttl,
+        negative_ttl=settings.geocoding_cache_negative_ttl,
+    )
+
+
+geocoding_cache = create_geocoding_cache()
@@ -0,0 +1,296 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Offline city index built from a GeoNames dump (for example cities15000.txt
+    from https://download.geonames.org/export/dump/), used to resolve the city
+    and nation of a subject without calling the GeoNames web service.
+
+    Build the index with:
+        python -m app.utils.geocoding_index cities15000.txt app/tmp/cities.idx
+
+    Index file layout (little endian):
+        - 8 bytes magic, 4 bytes number of records
+        - one uint32 offset per record
+        - the records, sorted by key, as UTF-8 lines:
+          "<normalized city>\\x1f<country code>\\t<lat>\\t<lng>\\t<timezone>\\t<population>\\t<name>\\n"
+"""
+
+import mmap
+import re
+import struct
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from logging import getLogger
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+INDEX_MAGIC = b"AGEOIDX1"
+HEADER = struct.Struct("<8sI")
+OFFSET = struct.Struct("<I")
+KEY_SEPARATOR = "\x1f"
+
+# Columns of the GeoNames "geoname" table dump
+GEONAMES_NAME = 1
+GEONAMES_ASCII_NAME = 2
+GEONAMES_ALTERNATE_NAMES = 3
+GEONAMES_LATITUDE = 4
+GEONAMES_LONGITUDE = 5
+GEONAMES_COUNTRY_CODE = 8
+GEONAMES_POPULATION = 14
+GEONAMES_TIMEZONE = 17
+
+_NON_ALPHANUMERIC = re.compile(r"[^\w]+")
+
+
+def normalize_city_name(name: str) -> str:
+    """
+    Lowercases the name and removes accents and punctuation: "Bogotá, D.C." -> "bogota d c".
+    """
+
+    decomposed = unicodedata.normalize("NFKD", name)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+
+    return _NON_ALPHANUMERIC.sub(" ", without_accents.casefold()).replace("_", " ").strip()
+
+
+def normalize_nation(nation: Optional[str]) -> str:
+    if not nation or nation == "null":
+        return ""
+
+    return nation.upper()
+
+
+@dataclass(frozen=True)
+class CityLocation:
+    name: str
+    nation: str
+    lat: float
+    lng: float
+    tz_str: str
+    population: int
+
+
+class GeocodingIndex:
+    """
+    Memory mapped, read only view of an index file created by build_geocoding_index.
+    Lookups are binary searches on the sorted keys, nothing is loaded in memory.
+    """
+
+    # Maximum number of records examined by a prefix search
+    MAX_PREFIX_SCAN = 1000
+
+    def __init__(self, index_path: str | Path) -> None:
+        start = time.perf_counter()
+
+        self.index_path = Path(index_path)
+        with open(self.index_path, "rb") as index_file:
+            self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.size = HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{self.index_path} is not a geocoding index file.")
+
+        self.load_time = time.perf_counter() - start
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_time = 0.0
+        self._stats_lock = threading.Lock()
+
+        logger.info(f"Loaded geocoding index {self.index_path} with {self.size} cities in {self.load_time * 1000:.2f} ms")
+
+    def _get_record(self, position: int) -> bytes:
+        (offset,) = OFFSET.unpack_from(self._mmap, HEADER.size + position * OFFSET.size)
+        end = self._mmap.find(b"\n", offset)
+
+        return self._mmap[offset:end]
+
+    def _get_key(self, position: int) -> bytes:
+        record = self._get_record(position)
+
+        return record[: record.index(b"\t")]
+
+    def _lower_bound(self, key: bytes) -> int:
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _iter_prefix(self, prefix: str) -> Iterator[tuple[str, CityLocation]]:
+        encoded_prefix = prefix.encode("utf-8")
+        position = self._lower_bound(encoded_prefix)
+
+        for position in range(position, min(position + self.MAX_PREFIX_SCAN, self.size)):
+            key, lat, lng, tz_str, population, name = self._get_record(position).decode("utf-8").split("\t")
+            if not key.startswith(prefix):
+                break
+
+            city, nation = key.split(KEY_SEPARATOR)
+            yield city, CityLocation(name=name, nation=nation, lat=float(lat), lng=float(lng), tz_str=tz_str, population=int(population))
+
+    def search(self, city: str, nation: Optional[str] = None, limit: int = 10) -> list[CityLocation]:
+        """
+        Returns the cities whose normalized name starts with the given one, the most populated first.
+        Useful for autocompletion.
+        """
+
+        normalized_city = normalize_city_name(city)
+        normalized_nation = normalize_nation(nation)
+        if not normalized_city:
+            return []
+
+        # The same city can match several times through its alternate names
+        matches: dict[tuple, CityLocation] = {}
+        for _, location in self._iter_prefix(normalized_city):
+            if not normalized_nation or location.nation == normalized_nation:
+                matches[(location.nation, location.lat, location.lng)] = location
+
+        return sorted(matches.values(), key=lambda location: location.population, reverse=True)[:limit]
+
+    def lookup(self, city: str, nation: Optional[str] = None) -> Optional[CityLocation]:
+        """
+        Resolves a city, optionally restricted to an ISO 3166-1 alpha-2 nation.
+        An exact (accent and case insensitive) name is preferred, then the most
+        populated city of the nation whose name starts with the given one.
+        """
+
+        start = time.perf_counter()
+        normalized_city = normalize_city_name(city)
+        normalized_nation = normalize_nation(nation)
+
+        location = None
+        if normalized_city:
+            exact_prefix = normalized_city + KEY_SEPARATOR + normalized_nation
+            location = max((match for _, match in self._iter_prefix(exact_prefix)), key=lambda match: match.population, default=None)
+
+            if location is None and normalized_nation:
+                prefix_matches = self.search(city, normalized_nation, limit=1)
+                location = prefix_matches[0] if prefix_matches else None
+
+        with self._stats_lock:
+            self.lookups += 1
+            self.hits += 1 if location else 0
+            self.lookup_time += time.perf_counter() - start
+
+        return location
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "load_time_ms": self.load_time * 1000,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "average_lookup_time_us": self.lookup_time / self.lookups * 1_000_000 if self.lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def build_geocoding_index(dump_path: str | Path, index_path: str | Path, alternate_names: bool = False) -> int:
+    """
+    Creates the index file from a GeoNames dump and returns the number of records.
+    With alternate_names every alternate name of a city is indexed too, which makes the file much larger.
+    """
+
+    records: dict[bytes, bytes] = {}
+    populations: dict[bytes, int] = {}
+
+    with open(dump_path, encoding="utf-8") as dump_file:
+        for line in dump_file:
+            columns = line.rstrip("\n").split("\t")
+            if len(columns) <= GEONAMES_TIMEZONE or not columns[GEONAMES_TIMEZONE]:
+                continue
+
+            nation = columns[GEONAMES_COUNTRY_CODE].upper()
+            population = int(columns[GEONAMES_POPULATION] or 0)
+            value = "\t".join([
+                columns[GEONAMES_LATITUDE],
+                columns[GEONAMES_LONGITUDE],
+                columns[GEONAMES_TIMEZONE],
+                str(population),
+                columns[GEONAMES_NAME],
+            ])
+
+            names = {columns[GEONAMES_NAME], columns[GEONAMES_ASCII_NAME]}
+            if alternate_names:
+                names.update(columns[GEONAMES_ALTERNATE_NAMES].split(","))
+
+            for name in names:
+                normalized_name = normalize_city_name(name)
+                if not normalized_name:
+                    continue
+
+                # Homonyms in the same nation: keep the most populated one
+                key = (normalized_name + KEY_SEPARATOR + nation).encode("utf-8")
+                if populations.get(key, -1) < population:
+                    records[key] = key + b"\t" + value.encode("utf-8") + b"\n"
+                    populations[key] = population
+
+    sorted_records = [records[key] for key in sorted(records)]
+
+    offset = HEADER.size + OFFSET.size * len(sorted_records)
+    offsets = []
+    for record in sorted_records:
+        offsets.append(offset)
+        offset += len(record)
+
+    with open(index_path, "wb") as index_file:
+        index_file.write(HEADER.pack(INDEX_MAGIC, len(sorted_records)))
+        index_file.write(b"".join(OFFSET.pack(record_offset) for record_offset in offsets))
+        index_file.writelines(sorted_records)
+
+    return len(sorted_records)
+
+
+_geocoding_index: Optional[GeocodingIndex] = None
+_geocoding_index_failed = False
+_geocoding_index_lock = threading.Lock()
+
+
+def get_geocoding_index() -> Optional[GeocodingIndex]:
+    """
+    Returns the index configured with geocoding_index_path, loading it on first use.
+    Returns None when no index is configured or the file can not be loaded.
+    """
+
+    global _geocoding_index, _geocoding_index_failed
+
+    if not settings.geocoding_index_path or _geocoding_index_failed:
+        return None
+
+    with _geocoding_index_lock:
+        if _geocoding_index is None:
+            try:
+                _geocoding_index = GeocodingIndex(settings.geocoding_index_path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Unable to load the geocoding index, falling back to GeoNames: {e}")
+                _geocoding_index_failed = True
+                return None
+
+        return _geocoding_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Builds the offline geocoding index from a GeoNames dump.")
+    parser.add_argument("dump_path", help="GeoNames dump, e.g. cities15000.txt")
+    parser.add_argument("index_path", help="Output index file")
+    parser.add_argument("--alternate-names", action="store_true", help="Index the alternate names too")
+    arguments = parser.parse_args()
+
+    build_start = time.perf_counter()
+    records_count = build_geocoding_index(arguments.dump_path, arguments.index_path, alternate_names=arguments.alternate_names)
+    print(f"Indexed {records_count} names in {time.perf_counter() - build_start:.2f} s: {arguments.index_path}")
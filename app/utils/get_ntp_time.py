@@ -8,7 +8,7 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_ntp_time(server: str = "time.google.com", timeout: int = 5) -> Union[datetime, Exception]:
+def get_ntp_time(server: str = "time.google.com", timeout: float = 5) -> Union[datetime, Exception]:
     """
     Gets the current time from an NTP server.
     
@@ -33,8 +33,8 @@ def get_ntp_time(server: str = "time.google.com", timeout: int = 5) -> Union[dat
             # RFC 4330: bytes 40-47 contain the Transmit Timestamp
             transmit_time = struct.unpack('!II', data[40:48])
             
-            # The first value represents seconds since 1900-01-01
-            ntp_seconds = transmit_time[0]
+            # The first value represents seconds since 1900-01-01, the second the fraction of second
+            ntp_seconds = transmit_time[0] + transmit_time[1] / 2**32
             
             # Convert from NTP epoch (1900) to Unix epoch (1970)
             unix_time = ntp_seconds - 2208988800
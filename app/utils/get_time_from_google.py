@@ -1,8 +1,8 @@
 import requests
 from datetime import datetime
 
-def get_time_from_google():
-    response = requests.head("https://www.google.com")
+def get_time_from_google(timeout: float = 5):
+    response = requests.head("https://www.google.com", timeout=timeout)
     date_header = response.headers.get("Date")
     
     if date_header:
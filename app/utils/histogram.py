@@ -0,0 +1,83 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import bisect
+import threading
+from typing import Hashable, Iterator
+
+
+# Upper bounds in seconds, the same of the Prometheus client defaults plus a few slower ones
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Histogram of durations: counts[i] is the number of values in (buckets[i - 1], buckets[i]],
+    the last count is for the values above the last bucket.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        """
+        Number of values <= every bucket, and finally the total, as in the Prometheus "le" buckets.
+        """
+
+        total, cumulative = 0, []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+
+        return cumulative
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Upper bound of the bucket containing the quantile, an estimate good enough for dashboards.
+        """
+
+        if not self.count:
+            return 0.0
+
+        rank = quantile * self.count
+        for bucket, cumulative in zip(self.buckets + (float("inf"),), self.cumulative_counts()):
+            if cumulative >= rank:
+                return bucket
+
+        return float("inf")
+
+
+class HistogramFamily:
+    """
+    Thread safe set of histograms indexed by their labels, for example (endpoint, stage).
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._histograms: dict[Hashable, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Hashable, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = Histogram(self.buckets)
+
+            histogram.observe(value)
+
+    def items(self) -> Iterator[tuple[Hashable, Histogram]]:
+        with self._lock:
+            return iter(list(self._histograms.items()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
@@ -0,0 +1,100 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[T]):
+    """
+    Thread safe in-memory LRU cache with an optional time to live.
+
+    Args:
+        max_size: The maximum number of entries, the least recently used entry is evicted first.
+        ttl: Seconds after which an entry expires. 0 means that entries never expire.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 0) -> None:
+        self.max_size = max(0, max_size)
+        self.ttl = max(0, ttl)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None, count_miss: bool = True) -> T | Any:
+        """
+        Returns the value of the key, or default. count_miss=False for lookups that are followed by a counted one on a miss.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+
+            if entry is _MISSING:
+                self.misses += count_miss
+                return default
+
+            expires_at, value = entry  # type: ignore
+            if expires_at and expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += count_miss
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: T, ttl: float | None = None) -> None:
+        """
+        Stores the value, ttl overrides the time to live of the cache for this entry.
+        """
+
+        if self.max_size == 0:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the size and the counters of the cache.
+        """
+
+        lookups = self.hits + self.misses
+
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
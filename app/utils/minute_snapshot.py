@@ -0,0 +1,94 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import asyncio
+import threading
+from logging import getLogger
+from typing import Callable, Optional
+
+from .chart_executor import chart_executor
+from .time_sync import time_sync
+
+
+logger = getLogger(__name__)
+
+
+class MinuteSnapshot:
+    """
+    Serialized response of a calculation that only depends on the current minute.
+
+    The background task calculates the snapshot of the current minute and of the
+    next one before it starts, so requests are answered with the stored bytes.
+    When a snapshot is missing (no background task, or a late tick) it is calculated
+    on the chart executor by the first request of the minute, the concurrent requests
+    of the same minute wait for that calculation instead of starting their own.
+
+    Args:
+        render: Picklable function returning the serialized response for a minute (UNIX timestamp, multiple of 60).
+        clock: Function returning the current UNIX timestamp.
+    """
+
+    def __init__(self, render: Callable[[int], bytes], clock: Callable[[], float] = time_sync.timestamp) -> None:
+        self.render = render
+        self.clock = clock
+        self._snapshots: dict[int, bytes] = {}
+        # Calculations in progress, only used on the event loop
+        self._renders: dict[int, asyncio.Future[bytes]] = {}
+        self._lock = threading.Lock()
+
+    def current_minute(self) -> int:
+        return int(self.clock() // 60 * 60)
+
+    def get(self, minute: int) -> Optional[bytes]:
+        return self._snapshots.get(minute)
+
+    async def refresh(self, minute: int) -> bytes:
+        """
+        Returns the snapshot of the minute, calculating it if missing. Older snapshots are discarded.
+        """
+
+        snapshot = self._snapshots.get(minute)
+        if snapshot is not None:
+            return snapshot
+
+        render = self._renders.get(minute)
+        if render is None:
+            render = self._renders[minute] = asyncio.ensure_future(self._render(minute))
+
+        # A request that gives up does not cancel the calculation the others are waiting for
+        return await asyncio.shield(render)
+
+    async def _render(self, minute: int) -> bytes:
+        try:
+            snapshot = await chart_executor.run(self.render, minute)
+
+            with self._lock:
+                self._snapshots[minute] = snapshot
+                current_minute = self.current_minute()
+                for stored_minute in [stored for stored in self._snapshots if stored < current_minute]:
+                    del self._snapshots[stored_minute]
+
+            return snapshot
+
+        finally:
+            del self._renders[minute]
+
+    async def get_current(self) -> bytes:
+        return await self.refresh(self.current_minute())
+
+    async def run(self) -> None:
+        """
+        Keeps the current and the next minute calculated until cancelled.
+        """
+
+        while True:
+            current_minute = self.current_minute()
+
+            try:
+                await self.refresh(current_minute)
+                await self.refresh(current_minute + 60)
+            except Exception as e:
+                logger.error(f"Unable to precompute the snapshot of {current_minute}: {e}")
+
+            await asyncio.sleep(max(1.0, current_minute + 60 - self.clock()))
@@ -0,0 +1,53 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Natal subjects calculated once and referenced by ID in the transit
+    requests, which then only calculate the transit subject and the aspects
+    against the stored natal points.
+
+    The ID is the content hash of the subject, so creating the same session
+    again (after it expired, or on another uvicorn worker) returns the same ID.
+    Sessions are kept in memory by the worker that created them.
+"""
+
+from dataclasses import dataclass
+
+from kerykeion import AstrologicalSubject
+
+from .lru_cache import LRUCache
+from .subject_cache import get_subject_cache_key
+from ..config.settings import settings
+from ..types.request_models import SubjectModel
+
+
+class NatalSessionNotFoundError(KeyError):
+    """
+    The natal ID is unknown or expired, the session must be created again.
+    """
+
+
+@dataclass(frozen=True)
+class NatalSession:
+    natal_id: str
+    subject: SubjectModel
+    astrological_subject: AstrologicalSubject
+    # The serialized natal subject, returned as it is by every transit request
+    data: dict
+
+
+def get_natal_id(subject: SubjectModel) -> str:
+    return get_subject_cache_key(subject.model_dump(mode="json"))
+
+
+def get_natal_session(natal_id: str) -> NatalSession:
+    natal_session = natal_sessions.get(natal_id)
+    if natal_session is None:
+        raise NatalSessionNotFoundError(natal_id)
+
+    return natal_session
+
+
+natal_sessions: LRUCache[NatalSession] = LRUCache(
+    max_size=settings.natal_session_max_size,
+    ttl=settings.natal_session_ttl,
+)
@@ -0,0 +1,46 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from logging import getLogger
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from .fast_json_response import dumps_json
+
+
+logger = getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def accepts_ndjson(request: Request) -> bool:
+    """
+    True when the client asked for newline delimited JSON with the Accept header.
+    """
+
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _encode_ndjson(items: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    try:
+        async for item in items:
+            yield dumps_json(item) + b"\n"
+
+    except Exception as e:
+        # The status code is already sent, the error can only be reported as the last line
+        logger.error(f"Streaming interrupted: {e}")
+        yield dumps_json({"status": "KO", "message": "Internal Server Error"}) + b"\n"
+
+
+class NDJsonStreamingResponse(StreamingResponse):
+    """
+    Streams every dict produced by the iterator as one JSON line, as soon as it is available.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(self, items: AsyncIterator[dict], status_code: int = 200, headers: dict | None = None) -> None:
+        super().__init__(_encode_ndjson(items), status_code=status_code, headers=headers, media_type=self.media_type)
@@ -0,0 +1,77 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import math
+from typing import Iterable, Sequence
+
+from .histogram import HistogramFamily
+
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Sample = tuple[dict[str, object], float]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    if math.isnan(value):
+        return "NaN"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape_label_value(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, object]) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+class PrometheusWriter:
+    """
+    Builds a metrics page in the Prometheus text exposition format.
+    """
+
+    def __init__(self, namespace: str = "astrologer") -> None:
+        self.namespace = namespace
+        self._lines: list[str] = []
+
+    def add(self, name: str, metric_type: str, help_text: str, samples: Iterable[Sample]) -> None:
+        """
+        Adds a counter or a gauge, counters names should end with _total.
+        """
+
+        name = f"{self.namespace}_{name}"
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {metric_type}")
+
+        for labels, value in samples:
+            self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def add_histogram(self, name: str, help_text: str, family: HistogramFamily, label_names: Sequence[str]) -> None:
+        """
+        Adds every histogram of the family, its labels are the values for label_names.
+        """
+
+        name = f"{self.namespace}_{name}"
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} histogram")
+
+        for labels_values, histogram in family.items():
+            labels = dict(zip(label_names, labels_values if isinstance(labels_values, tuple) else (labels_values,)))
+
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.cumulative_counts()):
+                self._lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {count}")
+
+            self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+            self._lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,244 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Optional
+
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+
+class RateLimiter(ABC):
+    """
+    Per key token bucket and in-flight requests limit.
+
+    Every key has a bucket of `burst` tokens, refilled at `rate` tokens per second.
+    A request takes `cost` tokens and one of the `max_in_flight` slots of its key
+    (0 means no concurrency limit), and gives the slot back when it is completed.
+
+    Args:
+        rate: Tokens added to every bucket per second.
+        burst: Size of the buckets, costs above it are capped to it.
+        max_in_flight: Maximum concurrent requests per key, 0 for no limit.
+    """
+
+    # Seconds a client should wait when all its slots are in use
+    IN_FLIGHT_RETRY_AFTER = 1.0
+
+    # acquire and release can wait on I/O or on other workers, the middleware calls them in a thread
+    blocking = False
+
+    def __init__(self, rate: float, burst: float, max_in_flight: int = 0) -> None:
+        self.rate = max(rate, 1e-9)
+        self.burst = max(burst, 1.0)
+        self.max_in_flight = max(0, max_in_flight)
+
+        self.admitted = 0
+        self.rejected: Counter[str] = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, admitted: bool, reason: str = "") -> None:
+        with self._stats_lock:
+            if admitted:
+                self.admitted += 1
+            else:
+                self.rejected[reason] += 1
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    @abstractmethod
+    def acquire(self, key: str, cost: float) -> tuple[Optional[Any], float]:
+        """
+        Takes the tokens and a slot of the key.
+        Returns (slot, 0) when the request is admitted, otherwise (None, seconds to wait before retrying).
+        """
+
+    @abstractmethod
+    def release(self, slot: Any) -> None:
+        """
+        Gives back the slot returned by acquire.
+        """
+
+    def stats(self) -> dict:
+        return {"admitted": self.admitted, "rejected": dict(self.rejected)}
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    In-process buckets, each uvicorn worker enforces its own limits.
+    """
+
+    # Above this number of keys, the full and idle buckets are dropped
+    MAX_IDLE_BUCKETS = 10000
+
+    def __init__(self, rate: float, burst: float, max_in_flight: int = 0) -> None:
+        super().__init__(rate, burst, max_in_flight)
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._in_flight: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float) -> tuple[Optional[Any], float]:
+        cost = min(cost, self.burst)
+
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = self._refill(tokens, updated_at, now)
+
+            if self.max_in_flight and self._in_flight[key] >= self.max_in_flight:
+                self._buckets[key] = (tokens, now)
+                self._count(False, "in_flight")
+                return None, self.IN_FLIGHT_RETRY_AFTER
+
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                self._count(False, "rate")
+                return None, (cost - tokens) / self.rate
+
+            self._buckets[key] = (tokens - cost, now)
+            self._in_flight[key] += 1
+
+            if len(self._buckets) > self.MAX_IDLE_BUCKETS:
+                self._prune(now)
+
+        self._count(True)
+        return key, 0.0
+
+    def _prune(self, now: float) -> None:
+        for key, (tokens, updated_at) in list(self._buckets.items()):
+            if not self._in_flight[key] and self._refill(tokens, updated_at, now) >= self.burst:
+                del self._buckets[key]
+                del self._in_flight[key]
+
+    def release(self, slot: Any) -> None:
+        with self._lock:
+            self._in_flight[slot] -= 1
+            if self._in_flight[slot] <= 0:
+                del self._in_flight[slot]
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "keys": len(self._buckets), "in_flight": sum(self._in_flight.values()), **super().stats()}
+
+
+class SqliteRateLimiter(RateLimiter):
+    """
+    Buckets and slots in a local SQLite database, shared by every uvicorn worker using the same file.
+
+    Slots are rows with an expiration, so the slots of a worker that crashed
+    are freed after `slot_timeout` seconds.
+    """
+
+    # The transactions wait up to 5 seconds for the other workers
+    blocking = True
+
+    def __init__(self, database_path: str | Path, rate: float, burst: float, max_in_flight: int = 0, slot_timeout: float = 300) -> None:
+        super().__init__(rate, burst, max_in_flight)
+        self.database_path = Path(database_path)
+        self.database_path.parent.mkdir(parents=True, exist_ok=True)
+        self.slot_timeout = slot_timeout
+        self._local = threading.local()
+
+        connection = self._connect()
+        connection.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS slots (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, expires_at REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS slots_key ON slots (key)")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode, the transactions are explicit
+            connection = sqlite3.connect(self.database_path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+
+        return connection
+
+    def acquire(self, key: str, cost: float) -> tuple[Optional[Any], float]:
+        cost = min(cost, self.burst)
+        connection = self._connect()
+
+        try:
+            # IMMEDIATE: the other workers wait until the bucket is updated
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = self._refill(*row, now) if row else self.burst
+
+                slot, retry_after, reason = None, 0.0, ""
+                if self.max_in_flight:
+                    connection.execute("DELETE FROM slots WHERE key = ? AND expires_at <= ?", (key, now))
+                    (in_flight,) = connection.execute("SELECT COUNT(*) FROM slots WHERE key = ?", (key,)).fetchone()
+                    if in_flight >= self.max_in_flight:
+                        retry_after, reason = self.IN_FLIGHT_RETRY_AFTER, "in_flight"
+
+                if not reason and tokens < cost:
+                    retry_after, reason = (cost - tokens) / self.rate, "rate"
+
+                if not reason:
+                    tokens -= cost
+                    slot = connection.execute("INSERT INTO slots (key, expires_at) VALUES (?, ?)", (key, now + self.slot_timeout)).lastrowid
+
+                connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (key, tokens, now))
+                connection.execute("COMMIT")
+
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+        except sqlite3.Error as e:
+            # The limits are not enforced rather than failing the request
+            logger.warning(f"Unable to use the rate limiter database: {e}")
+            return -1, 0.0
+
+        self._count(slot is not None, reason)
+        return slot, retry_after
+
+    def release(self, slot: Any) -> None:
+        if slot == -1:
+            return
+
+        try:
+            self._connect().execute("DELETE FROM slots WHERE id = ?", (slot,))
+        except sqlite3.Error as e:
+            logger.warning(f"Unable to release the rate limiter slot {slot}: {e}")
+
+    def stats(self) -> dict:
+        connection = self._connect()
+        (keys,) = connection.execute("SELECT COUNT(*) FROM buckets").fetchone()
+        (in_flight,) = connection.execute("SELECT COUNT(*) FROM slots WHERE expires_at > ?", (time.time(),)).fetchone()
+
+        return {"backend": "sqlite", "keys": keys, "in_flight": in_flight, **super().stats()}
+
+
+def get_retry_after(seconds: float) -> str:
+    """
+    Value of the Retry-After header, in whole seconds.
+    """
+
+    return str(max(1, math.ceil(seconds)))
+
+
+def create_rate_limiter() -> RateLimiter:
+    if settings.rate_limit_backend == "sqlite":
+        database_path = settings.rate_limit_path or Path(__file__).parent.parent / "tmp" / "rate_limit.sqlite"
+        return SqliteRateLimiter(database_path, rate=settings.rate_limit_rate, burst=settings.rate_limit_burst, max_in_flight=settings.rate_limit_max_in_flight)
+
+    if settings.rate_limit_backend != "memory":
+        raise ValueError(f"Invalid rate limit backend '{settings.rate_limit_backend}'. Please use 'memory' or 'sqlite'.")
+
+    return MemoryRateLimiter(rate=settings.rate_limit_rate, burst=settings.rate_limit_burst, max_in_flight=settings.rate_limit_max_in_flight)
+
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,45 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import threading
+from collections import Counter
+
+from .histogram import HistogramFamily
+
+
+class RequestMetrics:
+    """
+    Requests and errors counters and latency histograms, by endpoint.
+    Endpoints are route paths, "unmatched" for the requests not routed (404s and rejected requests).
+    """
+
+    def __init__(self) -> None:
+        self.requests: Counter[tuple[str, str, int]] = Counter()
+        self.errors: Counter[tuple[str, str]] = Counter()
+        self.durations = HistogramFamily()
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint: str, method: str, status: int, duration: float) -> None:
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+
+        self.durations.observe(endpoint, duration)
+
+    def count_error(self, endpoint: str, error_class: str) -> None:
+        """
+        error_class: "geonames" (400), "natal_session" (404), "internal" (500), "geonames_unavailable" (502) or "queue_full" (503).
+        """
+
+        with self._lock:
+            self.errors[(endpoint, error_class)] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+
+        self.durations.clear()
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,165 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Opt-in profiling of a single request. The chart executor runs the calculations
+    of a profiled request with run_profiled, in the worker thread or process, and
+    the profiles are returned with the result, so they are collected with every
+    executor backend.
+
+    Modes:
+        - cprofile: deterministic profile, saved in the pstats format
+          (python -m pstats <file>, snakeviz, ...).
+        - sampling: stack samples every `interval` seconds, saved in the collapsed
+          format of flamegraph.pl and speedscope ("frame;frame;frame count" lines).
+"""
+
+import cProfile
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Literal, Optional, TypeVar
+
+from .stage_timings import run_with_timings
+from ..config.settings import settings
+
+
+T = TypeVar("T")
+ProfileMode = Literal["cprofile", "sampling"]
+PROFILE_MODES = ("cprofile", "sampling")
+
+
+class RequestProfile:
+    """
+    Profiles collected for one request, one per executor call.
+    """
+
+    def __init__(self, mode: ProfileMode) -> None:
+        self.mode = mode
+        self.profiles: list[Any] = []
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def get_current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def start_profile(mode: ProfileMode) -> RequestProfile:
+    profile = RequestProfile(mode)
+    _current_profile.set(profile)
+
+    return profile
+
+
+class StackSampler:
+    """
+    Samples the stack of a thread from a background thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001, root: Optional[Callable] = None) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_code = getattr(root, "__code__", None)
+        self.samples: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @staticmethod
+    def _get_frame_name(frame: Any) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(self._get_frame_name(frame))
+                frame = frame.f_back
+
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stopped.set()
+        self._thread.join()
+
+        return self.samples
+
+
+def run_profiled(mode: ProfileMode, interval: float, func: Callable[..., T], *args: Any, **kwargs: Any) -> tuple[T, dict[str, float], Any]:
+    """
+    run_with_timings under the profiler, returns the result, the timings and a picklable profile:
+    the pstats dict for cprofile, the stack samples for sampling.
+    """
+
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        (result, timings) = profiler.runcall(run_with_timings, func, *args, **kwargs)
+        profiler.create_stats()
+
+        return result, timings, profiler.stats  # type: ignore
+
+    sampler = StackSampler(threading.get_ident(), interval, root=run_profiled)
+    sampler.start()
+    try:
+        result, timings = run_with_timings(func, *args, **kwargs)
+    finally:
+        samples = sampler.stop()
+
+    return result, timings, samples
+
+
+class _StatsHolder:
+    """
+    Loads a pstats dict returned by a worker in pstats.Stats.
+    """
+
+    def __init__(self, stats: dict) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def save_profile(profile: RequestProfile, directory: str | Path) -> Optional[Path]:
+    """
+    Writes the profiles of the request in one file and returns its path, None when nothing was profiled.
+    """
+
+    if not profile.profiles:
+        return None
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    if profile.mode == "cprofile":
+        path = directory / f"{name}.pstats"
+        stats = pstats.Stats(_StatsHolder(profile.profiles[0]))
+        for worker_stats in profile.profiles[1:]:
+            stats.add(_StatsHolder(worker_stats))
+        stats.dump_stats(path)
+
+    else:
+        path = directory / f"{name}.collapsed"
+        samples: Counter[str] = Counter()
+        for worker_samples in profile.profiles:
+            samples.update(worker_samples)
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in samples.most_common()), encoding="utf-8")
+
+    return path
+
+
+def get_profiles_directory() -> Path:
+    return Path(settings.profiling_directory) if settings.profiling_directory else Path(__file__).parent.parent / "tmp" / "profiles"
@@ -0,0 +1,112 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from logging import getLogger
+from typing import Optional
+
+import requests
+from kerykeion import KerykeionException
+
+from .geocoding_cache import geocoding_cache, CityNotFound
+from .geocoding_index import CityLocation, get_geocoding_index
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+# Same message raised by kerykeion, the routers turn it into the GeoNames error response
+CITY_NOT_FOUND_MESSAGE = "No data found for this city, try again! Maybe check your connection?"
+
+GEONAMES_SEARCH_URL = "https://secure.geonames.org/searchJSON"
+GEONAMES_TIMEZONE_URL = "https://secure.geonames.org/timezoneJSON"
+
+# One session for every GeoNames request, so the connections are reused
+geonames_session = requests.Session()
+
+
+class GeonamesUnavailableError(Exception):
+    """
+    GeoNames did not answer, or answered with an error (invalid username, exhausted credits...): the city may exist.
+    """
+
+
+def _get_geonames_json(url: str, params: dict) -> dict:
+    try:
+        response = geonames_session.get(url, params=params, timeout=settings.geonames_timeout)
+        response.raise_for_status()
+        response_json = response.json()
+    except (requests.RequestException, ValueError) as e:
+        raise GeonamesUnavailableError(f"GeoNames request failed: {e}") from e
+
+    # Errors are returned with a 200 status, e.g. {"status": {"message": "user account not enabled...", "value": 10}}
+    if not isinstance(response_json, dict) or "status" in response_json:
+        raise GeonamesUnavailableError(f"GeoNames error: {response_json}")
+
+    return response_json
+
+
+def fetch_geonames_location(city: str, nation: Optional[str], geonames_username: Optional[str]) -> Optional[CityLocation]:
+    """
+    The same requests of the kerykeion FetchGeonames: returns None only when the search has no results.
+    Raises GeonamesUnavailableError when GeoNames can not be reached or returns an error.
+
+    FetchGeonames is not used because it returns an empty dict both for a city that does not exist and
+    for a failure, has no timeout, and keeps GeoNames error responses in its own requests_cache database.
+    """
+
+    search_json = _get_geonames_json(
+        GEONAMES_SEARCH_URL,
+        {"q": city, "country": nation, "username": geonames_username, "maxRows": 1, "style": "SHORT", "featureClass": ["A", "P"]},
+    )
+    if "geonames" not in search_json:
+        raise GeonamesUnavailableError(f"Unexpected GeoNames search response: {search_json}")
+    if not search_json["geonames"]:
+        return None
+
+    city_data = search_json["geonames"][0]
+    timezone_json = _get_geonames_json(GEONAMES_TIMEZONE_URL, {"lat": city_data["lat"], "lng": city_data["lng"], "username": geonames_username})
+    if "timezoneId" not in timezone_json:
+        raise GeonamesUnavailableError(f"Unexpected GeoNames timezone response: {timezone_json}")
+
+    return CityLocation(
+        name=city_data.get("name", city),
+        nation=city_data["countryCode"],
+        lat=float(city_data["lat"]),
+        lng=float(city_data["lng"]),
+        tz_str=timezone_json["timezoneId"],
+        population=0,
+    )
+
+
+def resolve_city_location(city: str, nation: Optional[str], geonames_username: Optional[str]) -> CityLocation:
+    """
+    Returns the coordinates and the timezone of a city, looking in order at:
+    the offline geocoding index, the geocoding cache and the GeoNames web service.
+
+    Raises a KerykeionException when GeoNames finds no city, that result is cached too.
+    Raises GeonamesUnavailableError when GeoNames fails, that is not cached.
+    """
+
+    geocoding_index = get_geocoding_index()
+    if geocoding_index is not None:
+        location = geocoding_index.lookup(city, nation)
+        if location is not None:
+            return location
+
+    cached_location = geocoding_cache.get(city, nation, geonames_username)
+    if isinstance(cached_location, CityNotFound):
+        raise KerykeionException(CITY_NOT_FOUND_MESSAGE)
+    if cached_location is not None:
+        return cached_location
+
+    logger.debug(f"Fetching {city}, {nation} from GeoNames")
+    location = fetch_geonames_location(city, nation, geonames_username)
+
+    if location is None:
+        geocoding_cache.set_not_found(city, nation, geonames_username)
+        raise KerykeionException(CITY_NOT_FOUND_MESSAGE)
+
+    geocoding_cache.set_found(city, nation, location)
+
+    return location
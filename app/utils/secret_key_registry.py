@@ -0,0 +1,168 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import hmac
+import os
+import threading
+import time
+from collections import Counter
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from typing import Iterable, Optional
+
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+
+# Bytes of the digest used as index, the full digest is then compared in constant time
+INDEX_SIZE = 8
+
+KeyIndex = dict[bytes, list[tuple[bytes, str]]]
+
+
+def get_key_digest(key: str) -> bytes:
+    return sha256(key.encode("utf-8")).digest()
+
+
+def build_key_index(labeled_keys: Iterable[tuple[str, str]]) -> KeyIndex:
+    """
+    Indexes the (key, label) pairs by the first bytes of the key digest.
+    """
+
+    index: KeyIndex = {}
+    for key, label in labeled_keys:
+        digest = get_key_digest(key)
+        index.setdefault(digest[:INDEX_SIZE], []).append((digest, label))
+
+    return index
+
+
+def get_key_label(key: str) -> str:
+    """
+    Default label of a key: a short fingerprint, safe to log and export.
+    """
+
+    return "key-" + sha256(key.encode("utf-8")).hexdigest()[:8]
+
+
+class SecretKeyRegistry:
+    """
+    Set of the valid secret keys, indexed by their SHA-256 digest.
+
+    Keys come from the settings and, optionally, from a file with one key per line,
+    followed by an optional label ("<key> <label>"). Empty lines and lines starting
+    with # are ignored. The file is reloaded, without restarting the workers, when it
+    changes: its modification time is checked at most every `reload_interval` seconds.
+
+    Lookups hash the candidate key, find the keys with the same digest prefix in a
+    dict and compare the full digests in constant time, so the time taken does not
+    depend on how much of a valid key the candidate matches.
+    Requests are counted per key label.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), keys_file: Optional[str | Path] = None, reload_interval: float = 5) -> None:
+        self.static_keys = [(key, get_key_label(key)) for key in keys if key]
+        self.keys_file = Path(keys_file) if keys_file else None
+        self.reload_interval = reload_interval
+
+        self._index: KeyIndex = build_key_index(self.static_keys)
+        self._size = len(self.static_keys)
+        self._keys_file_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self._lock = threading.Lock()
+
+        self.request_counts: Counter[str] = Counter()
+        self.rejected_count = 0
+
+        self.reload()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _read_keys_file(self) -> list[tuple[str, str]]:
+        keys = []
+        for line in self.keys_file.read_text(encoding="utf-8").splitlines():  # type: ignore
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            key, _, label = line.partition(" ")
+            keys.append((key, label.strip() or get_key_label(key)))
+
+        return keys
+
+    def reload(self) -> bool:
+        """
+        Reads the keys file again if it changed since the last load. Returns True when the keys were reloaded.
+        A file that can not be read or decoded, or that has no keys (e.g. truncated while it is rewritten),
+        keeps the previous keys and is read again at the next check: keys are revoked by replacing them, not by emptying the file.
+        """
+
+        if self.keys_file is None:
+            return False
+
+        with self._lock:
+            self._next_reload_check = time.monotonic() + self.reload_interval
+
+            try:
+                mtime = os.stat(self.keys_file).st_mtime
+                if mtime == self._keys_file_mtime:
+                    return False
+
+                file_keys = self._read_keys_file()
+
+            except (OSError, ValueError) as e:
+                logger.error(f"Unable to read the secret keys file {self.keys_file}: {e}")
+                return False
+
+            if not file_keys:
+                logger.error(f"No secret keys in {self.keys_file}, keeping the previous keys")
+                return False
+
+            # Swapped in one assignment, lookups always see a complete set of keys
+            self._index = build_key_index(file_keys + self.static_keys)
+            self._size = len(file_keys) + len(self.static_keys)
+            self._keys_file_mtime = mtime
+
+        logger.info(f"Loaded {len(file_keys)} secret keys from {self.keys_file}")
+        return True
+
+    def check(self, key: str) -> Optional[str]:
+        """
+        Returns the label of the key if it is valid, None otherwise, and counts the request.
+        """
+
+        if self.keys_file is not None and time.monotonic() >= self._next_reload_check:
+            self.reload()
+
+        digest = get_key_digest(key)
+
+        label = None
+        for stored_digest, stored_label in self._index.get(digest[:INDEX_SIZE], ()):
+            if hmac.compare_digest(stored_digest, digest):
+                label = stored_label
+
+        if label is None:
+            self.rejected_count += 1
+            return None
+
+        self.request_counts[label] += 1
+        return label
+
+    def stats(self) -> dict:
+        return {
+            "keys": self._size,
+            "rejected": self.rejected_count,
+            "requests": dict(self.request_counts),
+        }
+
+
+secret_key_registry = SecretKeyRegistry(
+    keys=[settings.rapid_api_secret_key],
+    keys_file=settings.secret_keys_file,
+    reload_interval=settings.secret_keys_reload_interval,
+)
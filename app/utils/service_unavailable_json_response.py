@@ -0,0 +1,14 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from fastapi.responses import JSONResponse
+
+ServiceUnavailableJsonResponse = JSONResponse(
+    status_code=503,
+    content={
+        "message": "Service Unavailable, too many requests are being processed. Please try again later.",
+        "status": "KO",
+    },
+    headers={"Retry-After": "1"},
+)
@@ -0,0 +1,86 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Durations of the stages of a request (geocoding, subject, ephemeris, aspects,
+    svg, serialization), collected in a context variable. The chart executor runs the
+    calculations with run_with_timings and merges the worker timings back into
+    the request ones, so stages are timed with every executor backend.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from .histogram import HistogramFamily
+
+
+T = TypeVar("T")
+
+_current_timings: ContextVar[Optional[dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+# Seconds spent in every stage, by endpoint and stage
+stage_histograms = HistogramFamily()
+
+
+def get_current_timings() -> Optional[dict[str, float]]:
+    return _current_timings.get()
+
+
+def start_timings() -> dict[str, float]:
+    """
+    Starts collecting the timings of the current context (the request) and returns them.
+    """
+
+    timings: dict[str, float] = {}
+    _current_timings.set(timings)
+
+    return timings
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """
+    Adds the duration of the block to the stage, when the timings are collected.
+    """
+
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def add_timings(timings: dict[str, float]) -> None:
+    current_timings = _current_timings.get()
+    if current_timings is None:
+        return
+
+    for stage, duration in timings.items():
+        current_timings[stage] = current_timings.get(stage, 0.0) + duration
+
+
+def run_with_timings(func: Callable[..., T], *args: Any, **kwargs: Any) -> tuple[T, dict[str, float]]:
+    """
+    Calls func collecting the timings of its stages, returns the result and the timings.
+    """
+
+    timings: dict[str, float] = {}
+    token = _current_timings.set(timings)
+    try:
+        return func(*args, **kwargs), timings
+    finally:
+        _current_timings.reset(token)
+
+
+def get_server_timing_header(timings: dict[str, float]) -> str:
+    """
+    Server-Timing header value, durations in milliseconds: "subject;dur=3.1, svg;dur=230.4".
+    """
+
+    return ", ".join(f"{stage};dur={duration * 1000:.1f}" for stage, duration in timings.items())
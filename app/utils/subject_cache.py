@@ -0,0 +1,28 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+import json
+from hashlib import sha256
+
+from kerykeion import AstrologicalSubject
+
+from .lru_cache import LRUCache
+from ..config.settings import settings
+
+
+def get_subject_cache_key(subject_kwargs: dict) -> str:
+    """
+    Returns a content hash of the AstrologicalSubject arguments.
+    Equal arguments always give the same key, regardless of their order.
+    """
+
+    canonical_json = json.dumps(subject_kwargs, sort_keys=True, separators=(",", ":"), default=str)
+
+    return sha256(canonical_json.encode("utf-8")).hexdigest()
+
+
+subject_cache: LRUCache[AstrologicalSubject] = LRUCache(
+    max_size=settings.subject_cache_max_size,
+    ttl=settings.subject_cache_ttl,
+)
@@ -0,0 +1,21 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+SVG_MEDIA_TYPE = "image/svg+xml"
+
+
+def accepts_svg(request: Request) -> bool:
+    """
+    True when the client asked for the raw SVG, with the Accept header or the format=svg query parameter.
+    """
+
+    return request.query_params.get("format") == "svg" or SVG_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+class SvgResponse(Response):
+    media_type = SVG_MEDIA_TYPE
@@ -0,0 +1,136 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    On some Cloud providers the system clock is not set correctly, so the current
+    UTC time is periodically read from a time source (NTP, then the Date header of
+    google.com) in a background task. Requests never wait for the network: they
+    extrapolate the last synchronized time with time.monotonic().
+
+    Fallback: until the first successful synchronization, or when every source is
+    unreachable, the local system clock is used. A successful synchronization
+    keeps being used (monotonic clocks drift by a few ppm) until a new one succeeds.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from logging import getLogger
+from typing import Callable, Optional
+
+from .get_ntp_time import get_ntp_time
+from .get_time_from_google import get_time_from_google
+from ..config.settings import settings
+
+
+logger = getLogger(__name__)
+
+TimeSource = Callable[[], datetime]
+
+
+class TimeSync:
+    """
+    Keeps the offset between a time source and the monotonic clock.
+
+    Args:
+        sources: Functions returning the current time, tried in order until one succeeds.
+        interval: Seconds between two synchronizations of the background task.
+    """
+
+    def __init__(self, sources: list[tuple[str, TimeSource]], interval: float = 600) -> None:
+        self.sources = sources
+        self.interval = interval
+
+        # Source time (UNIX timestamp) and time.monotonic() of the last successful synchronization
+        self._reference: Optional[tuple[float, float]] = None
+        self.source = "local"
+        self.synced_at: Optional[datetime] = None
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def sync(self) -> bool:
+        """
+        Reads the time from the first available source. Blocking, returns True on success.
+        """
+
+        for name, source in self.sources:
+            try:
+                start = time.monotonic()
+                source_time = source()
+                end = time.monotonic()
+
+            except Exception as e:
+                logger.warning(f"Unable to read the time from {name}: {e}")
+                continue
+
+            if source_time.tzinfo is None:
+                source_time = source_time.replace(tzinfo=timezone.utc)
+
+            # The source answered, on average, half way through the request
+            with self._lock:
+                self._reference = (source_time.timestamp(), (start + end) / 2)
+                self.source = name
+                self.synced_at = source_time
+
+            logger.info(f"Time synchronized with {name}, offset from the local clock: {self.offset:.3f} s")
+            return True
+
+        with self._lock:
+            self.failures += 1
+
+        logger.warning("Unable to synchronize the time, using the local clock")
+        return False
+
+    @property
+    def offset(self) -> float:
+        """
+        Seconds to add to the local clock to get the synchronized time.
+        """
+
+        if self._reference is None:
+            return 0.0
+
+        return self.timestamp() - time.time()
+
+    def timestamp(self) -> float:
+        """
+        Current UNIX timestamp, synchronized if possible, otherwise from the local clock.
+        """
+
+        reference = self._reference
+        if reference is None:
+            return time.time()
+
+        source_timestamp, monotonic_at_sync = reference
+        return source_timestamp + (time.monotonic() - monotonic_at_sync)
+
+    def utcnow(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp(), tz=timezone.utc)
+
+    async def run(self) -> None:
+        """
+        Synchronizes every `interval` seconds until cancelled, off the event loop.
+        """
+
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self.sync)
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "source": self.source,
+            "offset": self.offset,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "failures": self.failures,
+        }
+
+
+time_sync = TimeSync(
+    sources=[
+        ("ntp", partial(get_ntp_time, server=settings.time_sync_ntp_server, timeout=settings.time_sync_timeout)),
+        ("google", partial(get_time_from_google, timeout=settings.time_sync_timeout)),
+    ],
+    interval=settings.time_sync_interval,
+)
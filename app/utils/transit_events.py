@@ -0,0 +1,274 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Exact times of the transit events in a range of dates: the aspects of the
+    transiting points to the natal points, the sign ingresses and the stations.
+
+    Every transiting point is sampled with a step that fits its motion (short
+    enough to never hide a retrograde period), then the intervals where the
+    longitude crosses a target, or the speed changes sign, are refined with
+    Brent's method. A year of events costs a few hundred positions per point.
+"""
+
+import math
+import sys
+from datetime import datetime, timezone
+from typing import Callable, Optional, get_args
+
+import swisseph as swe
+from kerykeion.kr_types.kr_literals import Sign
+from kerykeion.utilities import get_number_from_name
+
+from .aspects import ASPECT_DEGREES
+from .ephemeris import AXES, EPOCH_JULIAN_DAY, OPPOSITE_POINTS, SECONDS_PER_DAY, get_flags, get_julian_day, swisseph_global_state
+from .stage_timings import time_stage
+
+
+EVENT_TYPES = ("aspect", "ingress", "station")
+SIGNS: tuple[Sign, ...] = get_args(Sign)
+
+# Sampling step of every point, in days: shorter than its motion between two stations
+SEARCH_STEPS = {
+    "Sun": 10,
+    "Moon": 1,
+    "Mercury": 4,
+    "Venus": 8,
+    "Mars": 10,
+    "Jupiter": 15,
+    "Saturn": 15,
+    "Uranus": 15,
+    "Neptune": 15,
+    "Pluto": 15,
+    "Chiron": 15,
+    "Mean_Node": 15,
+    "Mean_Lilith": 15,
+    "True_Node": 1,
+}
+DEFAULT_SEARCH_STEP = 1
+
+# The true nodes oscillate every few hours, their "stations" are not reported
+STATION_POINTS = ("Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto", "Chiron")
+
+# One second, in days
+TIME_TOLERANCE = 1 / SECONDS_PER_DAY
+MAX_ITERATIONS = 100
+
+
+def normalize_degrees(angle: float) -> float:
+    """
+    The angle in [-180, 180).
+    """
+
+    return (angle + 180) % 360 - 180
+
+
+def find_root(func: Callable[[float], float], start: float, end: float, start_value: float, end_value: float, tolerance: float) -> float:
+    """
+    Brent's method: the root of func between start and end, where its values have opposite signs (or one of them is zero).
+    """
+
+    if start_value == 0:
+        return start
+    if end_value == 0:
+        return end
+
+    a, b, fa, fb = start, end, start_value, end_value
+    c, fc = a, fa
+    d = e = b - a
+
+    for _ in range(MAX_ITERATIONS):
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+
+        step_tolerance = 2 * sys.float_info.epsilon * abs(b) + tolerance / 2
+        middle = (c - b) / 2
+        if abs(middle) <= step_tolerance or fb == 0:
+            return b
+
+        if abs(e) >= step_tolerance and abs(fa) > abs(fb):
+            # Secant or inverse quadratic interpolation
+            s = fb / fa
+            if a == c:
+                p, q = 2 * middle * s, 1 - s
+            else:
+                q, r = fa / fc, fb / fc
+                p = s * (2 * middle * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+
+            if p > 0:
+                q = -q
+            p = abs(p)
+
+            if 2 * p < min(3 * middle * q - abs(step_tolerance * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                e = d = middle
+        else:
+            e = d = middle
+
+        a, fa = b, fb
+        b += d if abs(d) > step_tolerance else math.copysign(step_tolerance, middle)
+        fb = func(b)
+
+    return b
+
+
+class PointMotion:
+    """
+    Longitude and speed of a transiting point, calculated once per julian day.
+    """
+
+    def __init__(self, point: str, flags: int) -> None:
+        calculated_point = OPPOSITE_POINTS.get(point, point)
+
+        self.point = point
+        self.offset = 180 if point in OPPOSITE_POINTS else 0
+        self.planet_number: int = get_number_from_name(calculated_point)  # type: ignore
+        self.flags = flags
+        self.positions: dict[float, tuple[float, float]] = {}
+
+    def get_position(self, julian_day: float) -> tuple[float, float]:
+        position = self.positions.get(julian_day)
+        if position is None:
+            calculated = swe.calc_ut(julian_day, self.planet_number, self.flags)[0]
+            position = self.positions[julian_day] = ((calculated[0] + self.offset) % 360, calculated[3])
+
+        return position
+
+    def get_longitude(self, julian_day: float) -> float:
+        return self.get_position(julian_day)[0]
+
+    def get_speed(self, julian_day: float) -> float:
+        return self.get_position(julian_day)[1]
+
+
+def get_search_julian_days(start: float, end: float, step: float) -> list[float]:
+    samples = max(1, math.ceil((end - start) / step))
+    return [start + (end - start) * sample / samples for sample in range(samples + 1)]
+
+
+def find_stations(motion: PointMotion, julian_days: list[float]) -> list[float]:
+    """
+    Julian days where the speed of the point changes sign.
+    """
+
+    stations = []
+    for start, end in zip(julian_days, julian_days[1:]):
+        start_speed, end_speed = motion.get_speed(start), motion.get_speed(end)
+        if (start_speed < 0) != (end_speed < 0):
+            stations.append(find_root(motion.get_speed, start, end, start_speed, end_speed, TIME_TOLERANCE))
+
+    return stations
+
+
+def find_crossings(motion: PointMotion, julian_days: list[float], targets: list[float]) -> list[tuple[float, int]]:
+    """
+    Julian days where the longitude of the point reaches one of the targets, with the index of the target.
+    The point must not change direction between two consecutive julian days.
+    """
+
+    crossings = []
+    for start, end in zip(julian_days, julian_days[1:]):
+        start_longitude, end_longitude = motion.get_longitude(start), motion.get_longitude(end)
+        arc = normalize_degrees(end_longitude - start_longitude)
+
+        for target_index, target in enumerate(targets):
+            offset = normalize_degrees(target - start_longitude)
+            if not (0 < offset <= arc or arc <= offset < 0):
+                continue
+
+            def distance(julian_day: float) -> float:
+                return normalize_degrees(motion.get_longitude(julian_day) - target)
+
+            crossings.append((find_root(distance, start, end, -offset, normalize_degrees(end_longitude - target), TIME_TOLERANCE), target_index))
+
+    return crossings
+
+
+def get_event(motion: PointMotion, julian_day: float, event_type: str, **details) -> dict:
+    timestamp = (julian_day - EPOCH_JULIAN_DAY) * SECONDS_PER_DAY
+    longitude, speed = motion.get_position(julian_day)
+
+    return {
+        "date": datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds"),
+        "timestamp": timestamp,
+        "type": event_type,
+        "point": motion.point,
+        "longitude": longitude,
+        "retrograde": speed < 0,
+        **details,
+    }
+
+
+def find_transit_events(
+    start_timestamp: float,
+    end_timestamp: float,
+    transit_points: list[str],
+    natal_positions: dict[str, float],
+    aspects: list[str],
+    event_types: list[str],
+    latitude: float,
+    longitude: float,
+    zodiac_type: str = "Tropic",
+    sidereal_mode: Optional[str] = None,
+    perspective_type: str = "Apparent Geocentric",
+) -> dict:
+    """
+    Returns the events of the transit points between the two UTC timestamps, sorted by date, and the number of positions calculated.
+    natal_positions are the longitudes of the natal points, aspects the names of the aspects to search.
+    The axes can only be natal points: they move too fast to be transit points.
+    """
+
+    with time_stage("ephemeris"):
+        # The Brent searches call calc_ut with the global state set by get_flags until the last event
+        with swisseph_global_state(zodiac_type, perspective_type):
+            flags = get_flags(zodiac_type, sidereal_mode, perspective_type, latitude, longitude)
+            start, end = get_julian_day(start_timestamp), get_julian_day(end_timestamp)
+
+            aspect_targets = [
+                (natal_point, aspect, (natal_longitude + sign * ASPECT_DEGREES[aspect]) % 360)
+                for natal_point, natal_longitude in natal_positions.items()
+                for aspect in aspects
+                for sign in ((1,) if ASPECT_DEGREES[aspect] in (0, 180) else (1, -1))
+            ]
+
+            events = []
+            evaluations = 0
+            for point in transit_points:
+                if OPPOSITE_POINTS.get(point, point) in AXES:
+                    continue
+
+                motion = PointMotion(point, flags)
+                julian_days = get_search_julian_days(start, end, SEARCH_STEPS.get(OPPOSITE_POINTS.get(point, point), DEFAULT_SEARCH_STEP))
+
+                stations = find_stations(motion, julian_days) if point in STATION_POINTS else []
+                if "station" in event_types:
+                    for station in stations:
+                        # The speed after the station
+                        direction = "retrograde" if motion.get_speed(station + TIME_TOLERANCE) < 0 else "direct"
+                        events.append(get_event(motion, station, "station", retrograde=direction == "retrograde", direction=direction))
+
+                # Between the stations the longitude is monotonic, every target is crossed at most once per interval
+                monotonic_julian_days = sorted(julian_days + stations)
+
+                if "ingress" in event_types:
+                    for julian_day, boundary in find_crossings(motion, monotonic_julian_days, [sign_num * 30 for sign_num in range(12)]):
+                        # Moving backwards the point enters the previous sign
+                        sign_num = boundary if motion.get_speed(julian_day) >= 0 else (boundary - 1) % 12
+                        events.append(get_event(motion, julian_day, "ingress", sign=SIGNS[sign_num], sign_num=sign_num))
+
+                if "aspect" in event_types and aspect_targets:
+                    for julian_day, target_index in find_crossings(motion, monotonic_julian_days, [target for _, _, target in aspect_targets]):
+                        natal_point, aspect, _ = aspect_targets[target_index]
+                        events.append(get_event(motion, julian_day, "aspect", natal_point=natal_point, aspect=aspect, aspect_degrees=ASPECT_DEGREES[aspect]))
+
+                evaluations += len(motion.positions)
+
+        events.sort(key=lambda event: event["timestamp"])
+
+    return {"events": events, "evaluations": evaluations}
@@ -0,0 +1,251 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Latency, throughput and memory of every v4 endpoint, called in process
+    through the whole middleware stack with fixed offline subjects (latitude,
+    longitude and timezone, GeoNames is never called).
+
+    By default the subject and chart caches are cleared before every request,
+    so that the calculations are measured; use --warm to measure the cached path.
+    /now is always served by its minute snapshot, as in production.
+
+    Usage:
+        python -m benchmarks.endpoints_benchmark [--requests 50] [--warmup 3] [--concurrency 1]
+            [--warm] [--only birth-chart] [--output results.json] [--compare previous.json]
+
+    The results are written as JSON (--output), with the commit and the
+    environment, so that two runs can be compared with --compare.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from importlib.metadata import version
+from sys import path
+from pathlib import Path
+from typing import Optional
+
+path.append(str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.main import app
+from app.utils.chart_cache import chart_cache
+from app.utils.subject_cache import subject_cache
+
+
+FIRST_SUBJECT = {
+    "name": "Benchmark First",
+    "year": 1980,
+    "month": 12,
+    "day": 12,
+    "hour": 12,
+    "minute": 12,
+    "longitude": 0,
+    "latitude": 51.4825766,
+    "city": "London",
+    "nation": "GB",
+    "timezone": "Europe/London",
+}
+
+SECOND_SUBJECT = {
+    "name": "Benchmark Second",
+    "year": 1985,
+    "month": 6,
+    "day": 21,
+    "hour": 6,
+    "minute": 30,
+    "longitude": -74.0817,
+    "latitude": 4.6097,
+    "city": "Bogota",
+    "nation": "CO",
+    "timezone": "America/Bogota",
+}
+
+TRANSIT_SUBJECT = {
+    "year": 2024,
+    "month": 1,
+    "day": 1,
+    "hour": 0,
+    "minute": 0,
+    "longitude": 12.4964,
+    "latitude": 41.9028,
+    "city": "Rome",
+    "nation": "IT",
+    "timezone": "Europe/Rome",
+}
+
+TWO_SUBJECTS = {"first_subject": FIRST_SUBJECT, "second_subject": SECOND_SUBJECT}
+TRANSIT = {"first_subject": FIRST_SUBJECT, "transit_subject": TRANSIT_SUBJECT}
+EPHEMERIS = {"start": "2024-01-01T00:00:00", "end": "2024-12-31T00:00:00", "step": "P1D", "timezone": "Europe/Rome", "latitude": 41.9028, "longitude": 12.4964}
+BATCH_SUBJECTS = [{**FIRST_SUBJECT, "name": f"Benchmark {hour}", "hour": hour} for hour in range(24)]
+
+# name: (method, path, payload)
+SCENARIOS: dict[str, tuple[str, str, Optional[dict]]] = {
+    "now": ("GET", "/api/v4/now", None),
+    "birth-data": ("POST", "/api/v4/birth-data", {"subject": FIRST_SUBJECT}),
+    "birth-chart": ("POST", "/api/v4/birth-chart", {"subject": FIRST_SUBJECT}),
+    "birth-chart (wheel_only)": ("POST", "/api/v4/birth-chart", {"subject": FIRST_SUBJECT, "wheel_only": True}),
+    "natal-bundle": ("POST", "/api/v4/natal-bundle", {"subject": FIRST_SUBJECT}),
+    "synastry-chart": ("POST", "/api/v4/synastry-chart", TWO_SUBJECTS),
+    "transit-chart": ("POST", "/api/v4/transit-chart", TRANSIT),
+    "composite-chart": ("POST", "/api/v4/composite-chart", TWO_SUBJECTS),
+    "natal-aspects-data": ("POST", "/api/v4/natal-aspects-data", {"subject": FIRST_SUBJECT}),
+    "synastry-aspects-data": ("POST", "/api/v4/synastry-aspects-data", TWO_SUBJECTS),
+    "transit-aspects-data": ("POST", "/api/v4/transit-aspects-data", TRANSIT),
+    "composite-aspects-data": ("POST", "/api/v4/composite-aspects-data", TWO_SUBJECTS),
+    "relationship-score": ("POST", "/api/v4/relationship-score", TWO_SUBJECTS),
+    "ephemeris (366 days)": ("POST", "/api/v4/ephemeris", EPHEMERIS),
+    "ephemeris (366 days, binary)": ("POST", "/api/v4/ephemeris?format=columnar-binary", EPHEMERIS),
+    "transit-events (1 year)": ("POST", "/api/v4/transit-events", {"subject": FIRST_SUBJECT, "start": "2024-01-01T00:00:00", "end": "2025-01-01T00:00:00"}),
+    "batch/birth-data (24)": ("POST", "/api/v4/batch/birth-data", {"subjects": BATCH_SUBJECTS}),
+    "batch/natal-aspects-data (24)": ("POST", "/api/v4/batch/natal-aspects-data", {"subjects": BATCH_SUBJECTS}),
+    "batch/natal-aspects-data (24, columnar)": ("POST", "/api/v4/batch/natal-aspects-data?format=columnar", {"subjects": BATCH_SUBJECTS}),
+}
+
+HEADERS = {settings.secret_key_name: settings.rapid_api_secret_key, "Accept-Encoding": "identity"}
+
+
+def get_peak_rss() -> int:
+    """
+    Peak resident set size of the process, in bytes.
+    """
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def get_percentile(sorted_values: list[float], percentile: float) -> float:
+    """
+    Nearest rank percentile.
+    """
+
+    rank = max(1, round(percentile / 100 * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def call(client: TestClient, method: str, url: str, payload: Optional[dict], warm: bool) -> tuple[float, int]:
+    """
+    Sends one request and returns its latency in seconds and the size of the response body.
+    """
+
+    if not warm:
+        subject_cache.clear()
+        chart_cache.clear()
+
+    start = time.perf_counter()
+    response = client.request(method, url, json=payload, headers=HEADERS)
+    latency = time.perf_counter() - start
+
+    if response.status_code != 200:
+        raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+
+    return latency, len(response.content)
+
+
+def run_scenario(client: TestClient, name: str, requests: int, warmup: int, concurrency: int, warm: bool) -> dict:
+    method, url, payload = SCENARIOS[name]
+
+    for _ in range(warmup):
+        call(client, method, url, payload, warm)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: call(client, method, url, payload, warm), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+
+    return {
+        "method": method,
+        "path": url,
+        "requests": requests,
+        "response_bytes": results[-1][1],
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": get_percentile(latencies, 50) * 1000,
+        "p95_ms": get_percentile(latencies, 95) * 1000,
+        "p99_ms": get_percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "throughput_rps": requests / elapsed,
+        "peak_rss_bytes": get_peak_rss(),
+    }
+
+
+def print_comparison(results: dict, previous_results: dict) -> None:
+    print(f"\nCompared with {previous_results['commit'] or 'unknown commit'} ({previous_results['date']}):")
+    print(f"{'Endpoint':<40}{'p50':>10}{'p95':>10}{'p99':>10}{'req/s':>10}")
+
+    for name, scenario in results["scenarios"].items():
+        previous = previous_results["scenarios"].get(name)
+        if previous is None:
+            continue
+
+        changes = [
+            f"{(scenario[metric] / previous[metric] - 1) * 100:>+9.1f}%"
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+        ]
+        print(f"{name:<40}{''.join(changes)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the latency, throughput and memory of the v4 endpoints.")
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3, help="Requests per endpoint before the measure")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests sent at the same time")
+    parser.add_argument("--warm", action="store_true", help="Keep the subject and chart caches between the requests")
+    parser.add_argument("--only", action="append", choices=list(SCENARIOS), help="Endpoints to measure, repeatable (default: all)")
+    parser.add_argument("--output", type=Path, help="JSON file for the results")
+    parser.add_argument("--compare", type=Path, help="JSON results of a previous run")
+    arguments = parser.parse_args()
+
+    results = {
+        "commit": get_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "kerykeion": version("kerykeion"),
+        "platform": platform.platform(),
+        "executor": {"backend": settings.executor_backend, "max_workers": settings.executor_max_workers},
+        "parameters": {
+            "requests": arguments.requests,
+            "warmup": arguments.warmup,
+            "concurrency": arguments.concurrency,
+            "warm": arguments.warm,
+        },
+        "scenarios": {},
+    }
+
+    client = TestClient(app)
+
+    print(f"{'Endpoint':<40}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'req/s':>10}{'KB':>10}{'RSS (MB)':>10}")
+    for name in arguments.only or SCENARIOS:
+        scenario = run_scenario(client, name, arguments.requests, arguments.warmup, arguments.concurrency, arguments.warm)
+        results["scenarios"][name] = scenario
+
+        print(
+            f"{name:<40}{scenario['p50_ms']:>10.2f}{scenario['p95_ms']:>10.2f}{scenario['p99_ms']:>10.2f}"
+            f"{scenario['throughput_rps']:>10.1f}{scenario['response_bytes'] / 1024:>10.1f}{scenario['peak_rss_bytes'] / 2**20:>10.1f}"
+        )
+
+    if arguments.output:
+        arguments.output.parent.mkdir(parents=True, exist_ok=True)
+        arguments.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\nResults written to {arguments.output}")
+
+    if arguments.compare:
+        print_comparison(results, json.loads(arguments.compare.read_text(encoding="utf-8")))
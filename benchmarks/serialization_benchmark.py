@@ -0,0 +1,80 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Serialization cost of the responses, stdlib JSONResponse vs FastJsonResponse.
+
+    Usage:
+        python -m benchmarks.serialization_benchmark [--repeat 200]
+"""
+
+import argparse
+import time
+from sys import path
+from pathlib import Path
+from typing import Callable
+
+path.append(str(Path(__file__).parent.parent))
+
+from fastapi.responses import JSONResponse
+
+from app.routers.main_router import calculate_birth_chart, calculate_birth_data, calculate_natal_aspects_data
+from app.types.request_models import BirthChartRequestModel, BirthDataRequestModel, NatalAspectsRequestModel
+from app.utils.fast_json_response import FastJsonResponse, orjson
+
+
+SUBJECT = {
+    "name": "Benchmark",
+    "year": 1980,
+    "month": 12,
+    "day": 12,
+    "hour": 12,
+    "minute": 12,
+    "longitude": 0,
+    "latitude": 51.4825766,
+    "city": "London",
+    "nation": "GB",
+    "timezone": "Europe/London",
+}
+
+
+def get_payloads() -> dict[str, dict]:
+    birth_data = calculate_birth_data(BirthDataRequestModel(subject=SUBJECT))
+
+    return {
+        "birth-data": birth_data,
+        "birth-chart": calculate_birth_chart(BirthChartRequestModel(subject=SUBJECT)),
+        "natal-aspects-data": calculate_natal_aspects_data(NatalAspectsRequestModel(subject=SUBJECT)),
+        "batch/birth-data (1000)": {"status": "OK", "results": [{"index": index, **birth_data} for index in range(1000)]},
+    }
+
+
+def measure(render: Callable[[dict], bytes], payload: dict, repeat: int) -> float:
+    """
+    Returns the best time of `repeat` renderings, in milliseconds.
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(payload)
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the serialization time of the JSON responses.")
+    parser.add_argument("--repeat", type=int, default=200, help="Renderings per payload")
+    arguments = parser.parse_args()
+
+    print(f"FastJsonResponse encoder: {'orjson ' + orjson.__version__ if orjson else 'json (orjson not installed)'}")
+    print(f"{'Payload':<26}{'Size (KB)':>10}{'JSONResponse (ms)':>20}{'FastJsonResponse (ms)':>24}{'Speedup':>10}")
+
+    for name, payload in get_payloads().items():
+        standard_body = JSONResponse(payload).body
+        assert FastJsonResponse(payload).body == standard_body
+
+        standard_time = measure(lambda content: JSONResponse(content).body, payload, arguments.repeat)
+        fast_time = measure(lambda content: FastJsonResponse(content).body, payload, arguments.repeat)
+
+        print(f"{name:<26}{len(standard_body) / 1024:>10.1f}{standard_time:>20.3f}{fast_time:>24.3f}{standard_time / fast_time:>9.1f}x")
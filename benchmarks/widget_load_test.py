@@ -0,0 +1,421 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+
+    Load test replaying the requests of the /widget page (app/main.py) for one
+    "Generar carta" click, with the same endpoints, order and retries: one
+    natal-bundle call through callWithFallbacks, which retries up to six
+    payload variants while the API answers 422 or 500.
+
+    With --legacy, the requests of the widget before the natal-bundle endpoint:
+        1. birth-chart and natal-aspects-data, through callWithFallbacks;
+        2. fetchPlanetPositionsAndHouses, fetchCusps and fetchAsc, which probe
+           their lists of endpoints (most of them do not exist) until one
+           returns the expected data.
+
+    Every virtual user clicks `--clicks` times, one click after the other, and
+    `--users` users run at the same time. The report gives the latency of a
+    click as seen by the browser and its server cost: requests, status codes,
+    bytes and server time (the "total" of the Server-Timing header, or the
+    latency when the header is missing), per click and per endpoint.
+
+    The widget sends geonames_username, so the server resolves the city with
+    the offline index or GeoNames, then from the geocoding cache. Use
+    --coordinates to send latitude, longitude and timezone instead.
+
+    Usage:
+        python -m benchmarks.widget_load_test [--url http://127.0.0.1:8000 | --spawn 8000]
+            [--users 4] [--clicks 5] [--legacy] [--coordinates] [--header Name:Value] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import httpx
+
+
+API_BASE = "/api/v4"
+
+WIDGET_ACTIVE_POINTS = [
+    "Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto",
+    "Ascendant", "Medium_Coeli", "Mean_Node", "Mean_South_Node", "Chiron", "Mean_Lilith",
+]
+POSITION_POINTS = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto", "Ascendant", "Medium_Coeli"]
+
+POSITIONS_ENDPOINTS = ["/natal-positions", "/positions", "/natal-points", "/points", "/chart-data"]
+CUSPS_ENDPOINTS = ["/natal-houses", "/houses", "/natal-chart-data", "/natal-positions", "/chart-data", "/natal-aspects-data"]
+ASC_ENDPOINTS = ["/natal-positions", "/positions", "/natal-points", "/points", "/chart-data", "/natal-aspects-data"]
+
+# Default values of the widget form and of its query parameters
+WIDGET_LANGUAGE = "ES"
+WIDGET_THEME = "light"
+WIDGET_GEONAMES_USERNAME = "mofeto"
+WIDGET_SUBJECT = {
+    "year": 1990,
+    "month": 5,
+    "day": 17,
+    "hour": 14,
+    "minute": 30,
+    "city": "Bogotá",
+    "name": "Consulta",
+    "zodiac_type": "Tropic",
+    "house_system": "P",
+    "geonames_username": WIDGET_GEONAMES_USERNAME,
+    "nation": "CO",
+}
+WIDGET_COORDINATES = {"latitude": 4.60971, "longitude": -74.08175, "timezone": "America/Bogota"}
+
+
+def _without_points(payload: dict, points: list[str]) -> dict:
+    if payload.get("active_points"):
+        payload["active_points"] = [point for point in payload["active_points"] if point not in points]
+    return payload
+
+
+def _without_key(payload: dict, key: str) -> dict:
+    payload.pop(key, None)
+    return payload
+
+
+def _without_subject_key(payload: dict, key: str) -> dict:
+    if payload.get("subject"):
+        payload["subject"].pop(key, None)
+    return payload
+
+
+# The payload variants of callWithFallbacks, in order
+FALLBACK_VARIANTS: list[Callable[[dict], dict]] = [
+    lambda payload: payload,
+    lambda payload: _without_points(payload, ["Mean_South_Node"]),
+    lambda payload: _without_points(payload, ["Chiron", "Mean_Lilith"]),
+    lambda payload: _without_key(payload, "active_points"),
+    lambda payload: _without_subject_key(payload, "house_system"),
+    lambda payload: _without_subject_key(payload, "geonames_username"),
+]
+
+
+class WidgetCallError(Exception):
+    """
+    A failed call of the widget, retried by callWithFallbacks when `retryable` (HTTP 422 and 500).
+    """
+
+    def __init__(self, message: str, retryable: bool = False) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass
+class RequestRecord:
+    path: str
+    status: int
+    latency: float
+    server_time: float
+    size: int
+
+
+@dataclass
+class ClickRecord:
+    latency: float
+    requests: list[RequestRecord] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def get_server_time(response: httpx.Response, latency: float) -> float:
+    """
+    Returns the "total" metric of the Server-Timing header in seconds, the latency when it is missing.
+    """
+
+    for metric in response.headers.get("server-timing", "").split(","):
+        name, _, parameters = metric.strip().partition(";")
+        if name == "total" and parameters.startswith("dur="):
+            return float(parameters[4:]) / 1000
+
+    return latency
+
+
+def _get_list(content: Any, *paths: tuple[str, ...]) -> list:
+    """
+    The first non empty list found at one of the paths, like the `lists` of the widget.
+    """
+
+    if isinstance(content, list):
+        return content
+
+    for keys in paths:
+        value = content
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, list) and value:
+            return value
+
+    return []
+
+
+def _get_point_name(point: dict) -> Any:
+    return next((point[key] for key in ("name", "point", "id", "code", "label") if point.get(key) is not None), None)
+
+
+class WidgetSession:
+    """
+    The requests of the widget for one click, recorded with their cost.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, headers: dict[str, str]) -> None:
+        self.client = client
+        self.headers = headers
+        self.requests: list[RequestRecord] = []
+
+    async def call(self, path: str, payload: dict, expect_svg: bool = False) -> Any:
+        start = time.perf_counter()
+        response = await self.client.post(API_BASE + path, json=payload, headers=self.headers)
+        latency = time.perf_counter() - start
+
+        self.requests.append(RequestRecord(path, response.status_code, latency, get_server_time(response, latency), len(response.content)))
+
+        if not response.is_success:
+            raise WidgetCallError(f"HTTP {response.status_code}", retryable=response.status_code in (422, 500))
+
+        if expect_svg:
+            if response.text.lstrip().startswith("{"):
+                content = response.json()
+                return content.get("svg") or content.get("chart") or ""
+            return response.text
+
+        if "application/json" in response.headers.get("content-type", ""):
+            return response.json()
+
+        return response.text
+
+    async def call_with_fallbacks(self, path: str, base_payload: dict, expect_svg: bool = False) -> Any:
+        last_error: Optional[WidgetCallError] = None
+
+        for variant in FALLBACK_VARIANTS:
+            try:
+                content = await self.call(path, variant(copy.deepcopy(base_payload)), expect_svg)
+            except WidgetCallError as e:
+                if not e.retryable:
+                    raise
+                last_error = e
+                continue
+
+            if isinstance(content, dict) and (content.get("status") == "KO" or content.get("error")):
+                raise WidgetCallError(json.dumps(content))
+
+            return content
+
+        raise last_error or WidgetCallError("No se pudo recuperar tras varios intentos.")
+
+    async def fetch_planet_positions_and_houses(self, subject: dict) -> None:
+        for path in POSITIONS_ENDPOINTS:
+            try:
+                await self.call_with_fallbacks(path, {"subject": subject, "language": WIDGET_LANGUAGE, "active_points": POSITION_POINTS})
+                return
+            except WidgetCallError:
+                pass
+
+    async def fetch_cusps(self, subject: dict) -> None:
+        for path in CUSPS_ENDPOINTS:
+            try:
+                content = await self.call_with_fallbacks(path, {"subject": subject, "language": WIDGET_LANGUAGE, "active_points": ["Ascendant", "Medium_Coeli"]})
+            except WidgetCallError:
+                continue
+
+            for container in ("data", "chart", None):
+                parent = content.get(container) if container else content
+                if not isinstance(parent, dict):
+                    continue
+                for key in ("house_cusps", "houses", "cusps", "houses_cusps"):
+                    if isinstance(parent.get(key), (list, dict)) and len(parent[key]) >= 12:
+                        return
+
+    async def fetch_asc(self, subject: dict) -> None:
+        for path in ASC_ENDPOINTS:
+            try:
+                content = await self.call_with_fallbacks(path, {"subject": subject, "language": WIDGET_LANGUAGE, "active_points": ["Ascendant"]})
+            except WidgetCallError:
+                continue
+
+            points = _get_list(content, ("points",), ("planets",), ("data", "points"), ("data", "planets"))
+            if any(isinstance(point, dict) and _get_point_name(point) == "Ascendant" for point in points):
+                return
+
+    async def generate(self, subject: dict) -> None:
+        """
+        The generar() function of the widget.
+        """
+
+        await self.call_with_fallbacks("/natal-bundle", {"subject": subject, "language": WIDGET_LANGUAGE, "theme": WIDGET_THEME, "active_points": WIDGET_ACTIVE_POINTS})
+
+    async def generate_legacy(self, subject: dict) -> None:
+        """
+        The generar() function of the widget before the natal-bundle endpoint.
+        """
+
+        await self.call_with_fallbacks(
+            "/birth-chart",
+            {"subject": subject, "language": WIDGET_LANGUAGE, "theme": WIDGET_THEME, "style": WIDGET_THEME, "chart_theme": WIDGET_THEME, "active_points": WIDGET_ACTIVE_POINTS},
+            expect_svg=True,
+        )
+        await self.call_with_fallbacks("/natal-aspects-data", {"subject": subject, "language": WIDGET_LANGUAGE, "active_points": WIDGET_ACTIVE_POINTS})
+
+        # The API never returns the houses of the planets, so the widget always asks for the cusps
+        await self.fetch_planet_positions_and_houses(subject)
+        await self.fetch_cusps(subject)
+        await self.fetch_asc(subject)
+
+
+async def run_user(client: httpx.AsyncClient, headers: dict[str, str], subject: dict, clicks: int, legacy: bool) -> list[ClickRecord]:
+    records = []
+
+    for _ in range(clicks):
+        session = WidgetSession(client, headers)
+        start = time.perf_counter()
+        error = None
+        try:
+            await (session.generate_legacy(subject) if legacy else session.generate(subject))
+        except (WidgetCallError, httpx.HTTPError) as e:
+            error = str(e) or type(e).__name__
+
+        records.append(ClickRecord(time.perf_counter() - start, session.requests, error))
+
+    return records
+
+
+def get_percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) < 2:
+        return {"p50": values[0], "p95": values[0], "p99": values[0]} if values else {}
+
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98]}
+
+
+def get_report(clicks: list[ClickRecord], elapsed: float) -> dict:
+    requests = [request for click in clicks for request in click.requests]
+    endpoints: dict[str, list[RequestRecord]] = defaultdict(list)
+    for request in requests:
+        endpoints[request.path].append(request)
+
+    return {
+        "clicks": len(clicks),
+        "failed_clicks": sum(1 for click in clicks if click.error),
+        "errors": dict(Counter(click.error for click in clicks if click.error)),
+        "clicks_per_second": len(clicks) / elapsed,
+        "click_latency_ms": {name: value * 1000 for name, value in get_percentiles([click.latency for click in clicks]).items()},
+        "per_click": {
+            "requests": len(requests) / len(clicks),
+            "failed_requests": sum(1 for request in requests if request.status >= 400) / len(clicks),
+            "bytes": sum(request.size for request in requests) / len(clicks),
+            "server_time_ms": sum(request.server_time for request in requests) / len(clicks) * 1000,
+        },
+        "endpoints": {
+            path: {
+                "requests_per_click": len(records) / len(clicks),
+                "statuses": dict(Counter(str(record.status) for record in records)),
+                "mean_latency_ms": statistics.fmean(record.latency for record in records) * 1000,
+                "server_time_per_click_ms": sum(record.server_time for record in records) / len(clicks) * 1000,
+            }
+            for path, records in sorted(endpoints.items(), key=lambda item: -sum(record.server_time for record in item[1]))
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    latency = report["click_latency_ms"]
+    per_click = report["per_click"]
+
+    print(f"Clicks: {report['clicks']} ({report['failed_clicks']} failed), {report['clicks_per_second']:.2f} clicks/s")
+    print(f"Click latency: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, p99 {latency['p99']:.1f} ms")
+    print(
+        f"Per click: {per_click['requests']:.1f} requests ({per_click['failed_requests']:.1f} failed), "
+        f"{per_click['bytes'] / 1024:.1f} KB, {per_click['server_time_ms']:.1f} ms of server time"
+    )
+    for error, count in report["errors"].items():
+        print(f"  {count} x {error[:120]}")
+
+    print(f"\n{'Endpoint':<24}{'Req/click':>10}{'Latency (ms)':>14}{'Server ms/click':>17}  Statuses")
+    for path, endpoint in report["endpoints"].items():
+        statuses = ", ".join(f"{status}: {count}" for status, count in endpoint["statuses"].items())
+        print(f"{path:<24}{endpoint['requests_per_click']:>10.1f}{endpoint['mean_latency_ms']:>14.1f}{endpoint['server_time_per_click_ms']:>17.1f}  {statuses}")
+
+
+def spawn_server(port: int, workers: int) -> subprocess.Popen:
+    """
+    Starts uvicorn with the app of this repository and waits until it answers.
+    """
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=Path(__file__).parent.parent,
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/v4/health").is_success:
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError(f"uvicorn did not start on port {port}")
+
+
+async def main(arguments: argparse.Namespace) -> dict:
+    subject = dict(WIDGET_SUBJECT)
+    if arguments.coordinates:
+        subject.pop("geonames_username")
+        subject.update(WIDGET_COORDINATES)
+
+    headers = dict(header.split(":", 1) for header in arguments.header)
+    limits = httpx.Limits(max_connections=arguments.users, max_keepalive_connections=arguments.users)
+
+    async with httpx.AsyncClient(base_url=arguments.url, timeout=arguments.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        users = await asyncio.gather(*(run_user(client, headers, subject, arguments.clicks, arguments.legacy) for _ in range(arguments.users)))
+        elapsed = time.perf_counter() - start
+
+    return get_report([click for user in users for click in user], elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replays the widget requests of a chart generation against a running API.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the API")
+    parser.add_argument("--spawn", type=int, metavar="PORT", help="Start uvicorn on this port and test it")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--users", type=int, default=4, help="Concurrent virtual users")
+    parser.add_argument("--clicks", type=int, default=5, help="Clicks per user")
+    parser.add_argument("--legacy", action="store_true", help="Replay the requests of the widget before the natal-bundle endpoint")
+    parser.add_argument("--coordinates", action="store_true", help="Send the coordinates of the city instead of geonames_username")
+    parser.add_argument("--header", action="append", default=[], help="Extra request header as Name:Value, e.g. the secret key")
+    parser.add_argument("--timeout", type=float, default=60, help="Request timeout in seconds")
+    parser.add_argument("--output", type=Path, help="JSON file for the report")
+    arguments = parser.parse_args()
+
+    server = None
+    if arguments.spawn:
+        server = spawn_server(arguments.spawn, arguments.workers)
+        arguments.url = f"http://127.0.0.1:{arguments.spawn}"
+
+    try:
+        report = asyncio.run(main(arguments))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_report(report)
+
+    if arguments.output:
+        arguments.output.parent.mkdir(parents=True, exist_ok=True)
+        arguments.output.write_text(json.dumps({"parameters": vars(arguments) | {"output": str(arguments.output)}, **report}, indent=2) + "\n", encoding="utf-8")
+        print(f"\nReport written to {arguments.output}")
@@ -0,0 +1,96 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+from kerykeion import AstrologicalSubject, NatalAspects, RelationshipScoreFactory, SynastryAspects
+from kerykeion.settings.config_constants import DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS
+from app.utils import aspects as aspects_module
+from app.utils.aspects import AspectMatrixRelationshipScoreFactory, calculate_cross_aspects, calculate_natal_aspects
+
+
+FIRST_SUBJECT = AstrologicalSubject("First", 1980, 12, 12, 12, 12, lng=0, lat=51.4825766, tz_str="Europe/London", city="London", nation="GB", online=False)
+SECOND_SUBJECT = AstrologicalSubject("Second", 1985, 6, 21, 6, 30, lng=-74.0817, lat=4.6097, tz_str="America/Bogota", city="Bogota", nation="CO", online=False)
+
+SCORE_SUBJECTS = [
+    FIRST_SUBJECT,
+    SECOND_SUBJECT,
+    AstrologicalSubject("Third", 1993, 6, 10, 12, 15, lng=10.4, lat=45.4, tz_str="Europe/Rome", city="Montichiari", nation="IT", online=False),
+    AstrologicalSubject("Fourth", 1949, 6, 17, 9, 40, lng=-110.9265, lat=32.2217, tz_str="America/Phoenix", city="Tucson", nation="US", online=False),
+    AstrologicalSubject("Fifth", 2001, 3, 2, 23, 5, lng=139.6917, lat=35.6895, tz_str="Asia/Tokyo", city="Tokyo", nation="JP", online=False),
+]
+
+ACTIVE_ASPECTS_SETS = [
+    DEFAULT_ACTIVE_ASPECTS,
+    [{"name": "square", "orb": 8}, {"name": "conjunction", "orb": 3}, {"name": "quincunx", "orb": 2}],
+]
+ACTIVE_POINTS_SETS = [DEFAULT_ACTIVE_POINTS, ["Sun", "Moon", "Ascendant", "Descendant", "Imum_Coeli", "True_Node", "True_South_Node", "Mean_Lilith"]]
+
+
+def test_cross_aspects_match_kerykeion():
+    """
+    Tests if the cross aspects are the relevant aspects of kerykeion SynastryAspects, in the same order.
+    """
+
+    for active_points in ACTIVE_POINTS_SETS:
+        for active_aspects in ACTIVE_ASPECTS_SETS:
+            expected = SynastryAspects(FIRST_SUBJECT, SECOND_SUBJECT, active_points=active_points, active_aspects=active_aspects).relevant_aspects
+            aspects = calculate_cross_aspects(FIRST_SUBJECT, SECOND_SUBJECT, active_points, active_aspects)
+
+            assert [aspect.model_dump() for aspect in aspects] == [aspect.model_dump() for aspect in expected]
+
+
+def test_natal_aspects_match_kerykeion():
+    """
+    Tests if the natal aspects are the relevant aspects of kerykeion NatalAspects, in the same order.
+    """
+
+    for active_points in ACTIVE_POINTS_SETS:
+        for active_aspects in ACTIVE_ASPECTS_SETS:
+            expected = NatalAspects(FIRST_SUBJECT, active_points=active_points, active_aspects=[dict(aspect) for aspect in active_aspects]).relevant_aspects
+            aspects = calculate_natal_aspects(FIRST_SUBJECT, active_points, active_aspects)
+
+            assert [aspect.model_dump() for aspect in aspects] == [aspect.model_dump() for aspect in expected]
+
+
+def test_relationship_score_matches_kerykeion():
+    """
+    Tests if the relationship score calculated with the cross aspects is the one of kerykeion RelationshipScoreFactory.
+    """
+
+    expected = RelationshipScoreFactory(FIRST_SUBJECT, SECOND_SUBJECT).get_relationship_score()
+    score = AspectMatrixRelationshipScoreFactory(FIRST_SUBJECT, SECOND_SUBJECT).get_relationship_score()
+
+    assert score.model_dump() == expected.model_dump()
+
+
+def test_relationship_score_value_matches_kerykeion():
+    """
+    Tests if the score value and description are the ones of kerykeion RelationshipScoreFactory, for every pair of subjects.
+    """
+
+    for first_subject in SCORE_SUBJECTS:
+        for second_subject in SCORE_SUBJECTS:
+            for use_only_major_aspects in (True, False):
+                expected = RelationshipScoreFactory(first_subject, second_subject, use_only_major_aspects).get_relationship_score()
+                score = AspectMatrixRelationshipScoreFactory(first_subject, second_subject, use_only_major_aspects).get_relationship_score()
+
+                assert (score.score_value, score.score_description) == (expected.score_value, expected.score_description)
+
+
+def test_aspects_without_numpy(monkeypatch):
+    """
+    Tests if the aspects calculated without NumPy are the same.
+    """
+
+    expected_cross = calculate_cross_aspects(FIRST_SUBJECT, SECOND_SUBJECT, DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS, relevant_only=False)
+    expected_natal = calculate_natal_aspects(FIRST_SUBJECT, DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS)
+
+    monkeypatch.setattr(aspects_module, "np", None)
+
+    assert calculate_cross_aspects(FIRST_SUBJECT, SECOND_SUBJECT, DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS, relevant_only=False) == expected_cross
+    assert calculate_natal_aspects(FIRST_SUBJECT, DEFAULT_ACTIVE_POINTS, DEFAULT_ACTIVE_ASPECTS) == expected_natal
@@ -0,0 +1,143 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import gzip
+import os
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers.main_router import get_chart_request_cache_key
+from app.types.request_models import BirthChartRequestModel
+from app.utils.chart_cache import chart_cache, DirectoryChartCache, MemoryChartCache
+
+client = TestClient(app)
+
+BIRTH_CHART_REQUEST = {
+    "subject": {
+        "name": "Chart Cache Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    },
+    "theme": "dark",
+}
+
+
+def test_birth_chart_svg_is_cached():
+    """
+    Tests if an identical birth chart request reuses the rendered SVG.
+    """
+
+    chart_cache.clear()
+
+    first_response = client.post("/api/v4/birth-chart", json=BIRTH_CHART_REQUEST)
+    second_response = client.post("/api/v4/birth-chart", json=BIRTH_CHART_REQUEST)
+    wheel_response = client.post("/api/v4/birth-chart", json={**BIRTH_CHART_REQUEST, "wheel_only": True})
+
+    assert first_response.status_code == 200
+    assert first_response.json() == second_response.json()
+    assert wheel_response.json()["chart"] != first_response.json()["chart"]
+
+    stats = chart_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_birth_chart_raw_svg():
+    """
+    Tests if the raw SVG mode returns the same chart of the JSON response, precompressed when cached.
+    """
+
+    chart_cache.clear()
+
+    json_response = client.post("/api/v4/birth-chart", json=BIRTH_CHART_REQUEST)
+    svg_response = client.post("/api/v4/birth-chart?format=svg", json=BIRTH_CHART_REQUEST, headers={"Accept-Encoding": "identity"})
+
+    assert svg_response.status_code == 200
+    assert svg_response.headers["content-type"] == "image/svg+xml"
+    assert svg_response.text == json_response.json()["chart"]
+
+    compressed_response = client.post("/api/v4/birth-chart", json=BIRTH_CHART_REQUEST, headers={"Accept": "image/svg+xml", "Accept-Encoding": "gzip"})
+
+    request_model = BirthChartRequestModel(**BIRTH_CHART_REQUEST)
+    cache_key = get_chart_request_cache_key("Natal", [request_model.subject], request_model)
+
+    assert compressed_response.headers["content-encoding"] == "gzip"
+    assert int(compressed_response.headers["content-length"]) == len(chart_cache.get_compressed(cache_key, "gzip"))
+    assert compressed_response.text == svg_response.text
+
+    # One miss for the first render, every other lookup is a hit
+    stats = chart_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 3
+
+    # A raw SVG request of a chart that is not cached is counted once
+    client.post("/api/v4/birth-chart?format=svg", json={**BIRTH_CHART_REQUEST, "theme": "light"}, headers={"Accept-Encoding": "gzip"})
+    assert chart_cache.stats()["misses"] == 2
+
+
+def test_memory_chart_cache():
+    """
+    Tests the in-memory chart store.
+    """
+
+    cache = MemoryChartCache(max_size=1)
+    cache.set("a", "<svg>a</svg>")
+    cache.set("b", "<svg>b</svg>")
+
+    assert cache.get("a") is None
+    assert cache.get("b") == "<svg>b</svg>"
+    assert gzip.decompress(cache.get_compressed("b", "gzip")) == b"<svg>b</svg>"
+
+    # Missing entries are counted once, by get
+    assert cache.get_compressed("a", "gzip") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_directory_chart_cache(tmp_path):
+    """
+    Tests the on-disk chart store, shared by every cache pointing to the same directory.
+    """
+
+    writer = DirectoryChartCache(tmp_path, max_size=2, ttl=60)
+    reader = DirectoryChartCache(tmp_path, max_size=2, ttl=60)
+
+    writer.set("a", "<svg>a</svg>")
+
+    assert reader.get("a") == "<svg>a</svg>"
+    assert reader.get("missing") is None
+    assert reader.stats()["hits"] == 1
+
+    # Compressed on the first request asking for it, then read from its file
+    assert not (tmp_path / "a.svg.gz").exists()
+    assert gzip.decompress(reader.get_compressed("a", "gzip")) == b"<svg>a</svg>"
+    assert (tmp_path / "a.svg.gz").exists()
+    assert writer.get_compressed("a", "gzip") == reader.get_compressed("a", "gzip")
+
+    assert reader.get_compressed("missing", "gzip") is None
+    assert reader.stats()["misses"] == 1
+
+    # Expired entries are not returned, and their compressed files are removed too
+    os.utime(tmp_path / "a.svg", (0, 0))
+    assert reader.get("a") is None
+    assert not (tmp_path / "a.svg.gz").exists()
+
+    # The least recently used entries are pruned above max_size
+    for key in ["b", "c", "d"]:
+        writer.set(key, f"<svg>{key}</svg>")
+    writer.prune()
+
+    assert reader.stats()["size"] == 2
@@ -0,0 +1,123 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import asyncio
+import threading
+
+import pytest
+
+from app.utils.chart_executor import ChartExecutor, ExecutorQueueFullError
+
+
+def test_chart_executor_runs_off_the_event_loop():
+    """
+    Tests if the thread backend runs the function on a worker thread.
+    """
+
+    executor = ChartExecutor(backend="thread", max_workers=1, max_queue=0)
+
+    async def main():
+        return await executor.run(threading.get_ident)
+
+    try:
+        assert asyncio.run(main()) != threading.get_ident()
+    finally:
+        executor.shutdown()
+
+
+def test_chart_executor_rejects_when_queue_is_full():
+    """
+    Tests if the executor rejects new calculations when every worker is busy and the queue is full,
+    while the event loop stays free to serve other coroutines.
+    """
+
+    executor = ChartExecutor(backend="thread", max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        slow_calculation = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+
+        assert executor.in_flight == 1
+
+        with pytest.raises(ExecutorQueueFullError):
+            await executor.run(sum, [1, 2])
+
+        release.set()
+        assert await slow_calculation is True
+        assert await executor.run(sum, [1, 2]) == 3
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+
+def test_chart_executor_invalid_backend():
+    """
+    Tests if an unknown backend is refused.
+    """
+
+    with pytest.raises(ValueError):
+        ChartExecutor(backend="gpu")  # type: ignore
+
+
+def test_chart_executor_as_completed():
+    """
+    Tests if every argument is calculated once, with at most `concurrency` calculations in flight.
+    """
+
+    executor = ChartExecutor(backend="thread", max_workers=4, max_queue=0)
+    in_flight = []
+
+    def square(value):
+        in_flight.append(executor.in_flight)
+        return value * value
+
+    async def main():
+        return [result async for result in executor.as_completed(square, range(10), concurrency=2)]
+
+    try:
+        results = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert sorted(results) == [(position, position * position) for position in range(10)]
+    assert max(in_flight) <= 2
+
+
+def test_chart_executor_keeps_the_slot_of_cancelled_calls():
+    """
+    Tests if a cancelled caller (a client that disconnected) keeps its slot until the worker really finishes the calculation.
+    """
+
+    executor = ChartExecutor(backend="thread", max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def main():
+        slow_calculation = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+
+        slow_calculation.cancel()
+        await asyncio.sleep(0.05)
+
+        assert executor.in_flight == 1
+        with pytest.raises(ExecutorQueueFullError):
+            await executor.run(sum, [1, 2])
+
+        release.set()
+        await asyncio.sleep(0.05)
+
+        assert executor.in_flight == 0
+        assert await executor.run(sum, [1, 2]) == 3
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
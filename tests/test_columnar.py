@@ -0,0 +1,65 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import math
+
+from app.utils.columnar import BINARY_ALIGNMENT, BINARY_MAGIC, decode_binary, decode_table, encode_binary, rows_to_table
+
+
+ROWS = [
+    {"index": 0, "status": "OK", "data": {"sign": "Ari", "abs_pos": 12.5, "retrograde": False}, "aspects": [{"aspect": "trine", "orbit": 1.25}]},
+    {"index": 1, "status": "ERROR", "message": "Internal Server Error"},
+    {"index": 2, "status": "OK", "data": {"sign": "Ari", "abs_pos": 359.75, "retrograde": True}, "aspects": [{"aspect": "square", "orbit": 0.5}, {"aspect": "trine", "orbit": 2.0}]},
+]
+
+
+def test_rows_to_table():
+    """
+    Tests if nested objects become dotted columns, strings become codes and lists of records become child tables.
+    """
+
+    table = rows_to_table(ROWS)
+
+    assert table["length"] == 3
+    assert table["columns"]["index"] == [0, 1, 2]
+    assert table["columns"]["status"] == [0, 1, 0]
+    assert table["lookups"]["status"] == ["OK", "ERROR"]
+    assert table["columns"]["data.sign"] == [0, None, 0]
+    assert table["columns"]["data.abs_pos"] == [12.5, None, 359.75]
+    assert table["columns"]["message"] == [None, 0, None]
+
+    aspects = table["tables"]["aspects"]
+    assert aspects["columns"]["parent"] == [0, 2, 2]
+    assert decode_table(aspects)[1] == {"parent": 2, "aspect": "square", "orbit": 0.5}
+    assert decode_table(table)[1]["message"] == "Internal Server Error"
+
+
+def test_binary_round_trip():
+    """
+    Tests if the binary encoding is aligned and decodes to the same table, with nulls and float64 for large values.
+    """
+
+    table = rows_to_table(ROWS)
+    table["columns"]["julian_day"] = [2460000.123456, None, 2460001.5]
+    table["columns"]["mixed"] = [1, "a", None]
+
+    data = encode_binary({"status": "OK", "results": table}, "results")
+    decoded = decode_binary(data, "results")["results"]
+
+    assert data.startswith(BINARY_MAGIC)
+    assert (len(BINARY_MAGIC) + 4 + int.from_bytes(data[len(BINARY_MAGIC):len(BINARY_MAGIC) + 4], "little")) % BINARY_ALIGNMENT == 0
+    assert decoded["columns"]["index"] == [0, 1, 2]
+    assert decoded["columns"]["status"] == [0, 1, 0]
+    assert decoded["columns"]["data.sign"] == [0, None, 0]
+    assert decoded["columns"]["data.abs_pos"] == [12.5, None, 359.75]
+    assert decoded["columns"]["data.retrograde"] == [False, None, True]
+    assert decoded["columns"]["julian_day"] == [2460000.123456, None, 2460001.5]
+    assert decoded["columns"]["mixed"] == [1, "a", None]
+    assert decode_table(decoded["tables"]["aspects"]) == decode_table(table["tables"]["aspects"])
+    assert not any(math.isnan(value) for value in decoded["tables"]["aspects"]["columns"]["orbit"])
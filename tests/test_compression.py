@@ -0,0 +1,82 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.compression import SUPPORTED_ENCODINGS, StreamCompressor, compress, negotiate_encoding
+
+client = TestClient(app)
+
+BIRTH_CHART_REQUEST = {
+    "subject": {
+        "name": "Compression Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    },
+}
+
+
+def test_negotiate_encoding():
+    """
+    Tests the Accept-Encoding negotiation, with quality values and wildcards.
+    """
+
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("*") == SUPPORTED_ENCODINGS[0]
+
+    if "br" in SUPPORTED_ENCODINGS:
+        assert negotiate_encoding("gzip, br") == "br"
+        assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+
+
+def test_stream_compressor():
+    """
+    Tests if the chunks compressed one by one decompress to the whole stream.
+    """
+
+    import zlib
+
+    compressor = StreamCompressor("gzip")
+    chunks = [b'{"index":0}\n', b'{"index":1}\n']
+    compressed = b"".join(compressor.compress(chunk) for chunk in chunks) + compressor.finish()
+
+    assert zlib.decompress(compressed, 16 + zlib.MAX_WBITS) == b"".join(chunks)
+    assert zlib.decompress(compress(b"astrology", "gzip"), 16 + zlib.MAX_WBITS) == b"astrology"
+
+
+def test_responses_are_compressed():
+    """
+    Tests if the large responses are compressed as negotiated and the small ones are not.
+    """
+
+    response = client.post("/api/v4/birth-chart", json=BIRTH_CHART_REQUEST, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["chart"].endswith("</svg>")
+
+    identity_response = client.post("/api/v4/birth-chart", json=BIRTH_CHART_REQUEST, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity_response.headers
+    assert identity_response.content == response.content
+
+    health_response = client.get("/api/v4/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in health_response.headers
@@ -0,0 +1,39 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.ephemeris import calculate_ephemeris
+
+
+TIMESTAMPS = [946684800 + day * 86400 for day in range(500)]
+CALCULATIONS = [
+    dict(zodiac_type="Sidereal", sidereal_mode="LAHIRI"),
+    dict(zodiac_type="Sidereal", sidereal_mode="FAGAN_BRADLEY"),
+    dict(zodiac_type="Sidereal", sidereal_mode="RAMAN"),
+    dict(perspective_type="Topocentric"),
+    dict(),
+]
+
+
+def calculate(index: int) -> dict:
+    latitude, longitude = -60 + index * 25, -150 + index * 70
+    return calculate_ephemeris(TIMESTAMPS, ["Moon", "Mars", "Ascendant"], latitude, longitude, **CALCULATIONS[index % len(CALCULATIONS)])
+
+
+def test_concurrent_ephemeris_keep_their_global_state():
+    """
+    Tests if sidereal and topocentric series calculated by concurrent threads get their own ayanamsa and observer position.
+    """
+
+    expected = [calculate(index) for index in range(len(CALCULATIONS))]
+
+    with ThreadPoolExecutor(max_workers=len(CALCULATIONS)) as executor:
+        for _ in range(3):
+            assert list(executor.map(calculate, range(len(CALCULATIONS)))) == expected
@@ -0,0 +1,151 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+from kerykeion import KerykeionException
+
+import app.utils.resolve_city_location as resolve_city_location_module
+from app.main import app
+from app.utils.geocoding_cache import CITY_NOT_FOUND, MemoryGeocodingCache, SqliteGeocodingCache
+from app.utils.geocoding_index import CityLocation
+
+ROME = CityLocation(name="Rome", nation="IT", lat=41.89193, lng=12.51133, tz_str="Europe/Rome", population=0)
+
+
+class FakeGeonamesResponse:
+    def __init__(self, response_json):
+        self.response_json = response_json
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.response_json
+
+
+class FakeGeonames:
+    """
+    Stands in for the GeoNames web service, knows only Rome. When down, every request fails.
+    """
+
+    calls = 0
+    down = False
+
+    @classmethod
+    def get(cls, url, params, timeout):
+        if url == resolve_city_location_module.GEONAMES_TIMEZONE_URL:
+            return FakeGeonamesResponse({"timezoneId": "Europe/Rome"})
+
+        cls.calls += 1
+        if cls.down:
+            raise requests.ConnectionError("GeoNames is down")
+        if params["username"] == "disabled-user":
+            return FakeGeonamesResponse({"status": {"message": "user account not enabled to use the free webservice.", "value": 10}})
+        if params["q"] != "Rome":
+            return FakeGeonamesResponse({"totalResultsCount": 0, "geonames": []})
+
+        return FakeGeonamesResponse({"geonames": [{"name": "Rome", "countryCode": "IT", "lat": "41.89193", "lng": "12.51133"}]})
+
+
+@pytest.fixture
+def fake_geonames(monkeypatch):
+    FakeGeonames.calls = 0
+    FakeGeonames.down = False
+    monkeypatch.setattr(resolve_city_location_module.geonames_session, "get", FakeGeonames.get)
+    monkeypatch.setattr(resolve_city_location_module, "get_geocoding_index", lambda: None)
+    monkeypatch.setattr(resolve_city_location_module, "geocoding_cache", MemoryGeocodingCache(max_size=10, ttl=60, negative_ttl=60))
+
+    return FakeGeonames
+
+
+def test_found_and_not_found_cities_are_cached(fake_geonames):
+    """
+    Tests if GeoNames is called once for a city, found or not.
+    """
+
+    for _ in range(3):
+        assert resolve_city_location_module.resolve_city_location("Rome", "IT", "user").tz_str == "Europe/Rome"
+
+    for _ in range(3):
+        with pytest.raises(KerykeionException, match="data found for this city"):
+            resolve_city_location_module.resolve_city_location("Atlantis", "IT", "user")
+
+    assert fake_geonames.calls == 2
+
+    # The negative result of a username is not shared with the others
+    with pytest.raises(KerykeionException):
+        resolve_city_location_module.resolve_city_location("Atlantis", "IT", "other-user")
+    assert fake_geonames.calls == 3
+
+
+def test_geonames_failures_are_not_cached(fake_geonames):
+    """
+    Tests if the GeoNames outages and errors raise GeonamesUnavailableError, are not cached and are not reported as unknown cities.
+    """
+
+    fake_geonames.down = True
+    for _ in range(2):
+        with pytest.raises(resolve_city_location_module.GeonamesUnavailableError):
+            resolve_city_location_module.resolve_city_location("Rome", "IT", "user")
+    assert fake_geonames.calls == 2
+
+    with pytest.raises(resolve_city_location_module.GeonamesUnavailableError):
+        resolve_city_location_module.resolve_city_location("Paris", "FR", "user")
+
+    fake_geonames.down = False
+    assert resolve_city_location_module.resolve_city_location("Rome", "IT", "user").tz_str == "Europe/Rome"
+
+    for _ in range(2):
+        with pytest.raises(resolve_city_location_module.GeonamesUnavailableError):
+            resolve_city_location_module.resolve_city_location("Atlantis", "IT", "disabled-user")
+    assert fake_geonames.calls == 6
+
+
+def test_sqlite_geocoding_cache_is_shared(tmp_path):
+    """
+    Tests if two caches using the same database see the same entries, and the negative TTL.
+    """
+
+    writer = SqliteGeocodingCache(tmp_path / "geocoding.sqlite", ttl=60, negative_ttl=60)
+    reader = SqliteGeocodingCache(tmp_path / "geocoding.sqlite", ttl=60, negative_ttl=60)
+
+    writer.set_found("Rome", "it", ROME)
+    writer.set_not_found("Atlantis", "IT", "user")
+
+    assert reader.get("rome", "IT", "another-user") == ROME
+    assert reader.get("Atlantis", "IT", "user") is CITY_NOT_FOUND
+    assert reader.stats()["size"] == 2
+
+    # Expired entries are ignored
+    with writer._connect() as connection:
+        connection.execute("UPDATE geocoding SET expires_at = 0 WHERE found = 0")
+    assert reader.get("Atlantis", "IT", "user") is None
+
+
+def test_geonames_outage_response(fake_geonames):
+    """
+    Tests if a GeoNames outage returns a 502 error instead of the 400 of the unknown cities.
+    """
+
+    client = TestClient(app)
+    subject = {"name": "Outage", "year": 1980, "month": 12, "day": 12, "hour": 12, "minute": 12, "city": "Rome", "nation": "IT", "geonames_username": "outage-user"}
+
+    fake_geonames.down = True
+    response = client.post("/api/v4/birth-data", json={"subject": subject})
+    assert response.status_code == 502
+    assert response.json()["status"] == "ERROR"
+
+    fake_geonames.down = False
+    response = client.post("/api/v4/birth-data", json={"subject": {**subject, "city": "Atlantis"}})
+    assert response.status_code == 400
+
+    response = client.post("/api/v4/birth-data", json={"subject": subject})
+    assert response.status_code == 200
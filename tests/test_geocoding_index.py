@@ -0,0 +1,93 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import pytest
+
+import app.utils.resolve_city_location as resolve_city_location_module
+from app.types.request_models import SubjectModel
+from app.utils.build_astrological_subject import build_astrological_subject
+from app.utils.geocoding_index import GeocodingIndex, build_geocoding_index, normalize_city_name
+
+
+GEONAMES_DUMP = "\n".join(
+    "\t".join(columns)
+    for columns in [
+        ["3688689", "Bogotá", "Bogota", "Bogota,Santa Fe de Bogota", "4.60971", "-74.08175", "P", "PPLC", "CO", "", "34", "", "", "", "7674366", "", "2582", "America/Bogota", "2024-01-01"],
+        ["3688690", "Bogotá", "Bogota", "", "9.0", "-75.0", "P", "PPL", "CO", "", "34", "", "", "", "100", "", "10", "America/Bogota", "2024-01-01"],
+        ["3169070", "Roma", "Roma", "Rome,Rom", "41.89193", "12.51133", "P", "PPLC", "IT", "", "07", "", "", "", "2318895", "", "20", "Europe/Rome", "2024-01-01"],
+        ["4219762", "Rome", "Rome", "", "34.25704", "-85.16467", "P", "PPLA2", "US", "", "GA", "", "", "", "36303", "", "186", "America/New_York", "2024-01-01"],
+    ]
+)
+
+
+@pytest.fixture
+def geocoding_index(tmp_path):
+    dump_path = tmp_path / "cities.txt"
+    dump_path.write_text(GEONAMES_DUMP, encoding="utf-8")
+    index_path = tmp_path / "cities.idx"
+
+    assert build_geocoding_index(dump_path, index_path, alternate_names=True) == 6
+
+    index = GeocodingIndex(index_path)
+    yield index
+    index.close()
+
+
+def test_normalize_city_name():
+    """
+    Tests the accent, case and punctuation insensitive normalization.
+    """
+
+    assert normalize_city_name("Bogotá, D.C.") == "bogota d c"
+    assert normalize_city_name("  SÃO   Paulo ") == "sao paulo"
+
+
+def test_geocoding_index_lookup(geocoding_index):
+    """
+    Tests the exact, accent insensitive and prefix lookups.
+    """
+
+    bogota = geocoding_index.lookup("bogota", "co")
+    assert bogota is not None
+    assert bogota.tz_str == "America/Bogota"
+    assert bogota.lat == pytest.approx(4.60971)
+
+    assert geocoding_index.lookup("Rome", "US").tz_str == "America/New_York"  # type: ignore
+    assert geocoding_index.lookup("Rome", "null").nation == "IT"  # type: ignore
+    assert geocoding_index.lookup("Bogo", "CO").name == "Bogotá"  # type: ignore
+    assert geocoding_index.lookup("Atlantis", "CO") is None
+
+    assert [location.nation for location in geocoding_index.search("ro")] == ["IT", "US"]
+    assert geocoding_index.stats()["lookups"] == 5
+    assert geocoding_index.stats()["hits"] == 4
+
+
+def test_subject_is_resolved_offline(geocoding_index, monkeypatch):
+    """
+    Tests if a subject with a GeoNames username is resolved from the index, without any network request.
+    """
+
+    monkeypatch.setattr(resolve_city_location_module, "get_geocoding_index", lambda: geocoding_index)
+
+    subject = SubjectModel(
+        name="Geocoding Unit Test",
+        year=1990,
+        month=1,
+        day=1,
+        hour=12,
+        minute=0,
+        city="Bogotá",
+        nation="CO",
+        geonames_username="offline-unit-test",
+    )
+    astrological_subject = build_astrological_subject(subject)
+
+    assert astrological_subject.online is False
+    assert astrological_subject.tz_str == "America/Bogota"
+    assert astrological_subject.nation == "CO"
@@ -2,6 +2,7 @@
     This is part of Astrologer API (C) 2023 Giacomo Battaglia
 """
 
+import json
 from sys import path
 from pathlib import Path
 
@@ -9,6 +10,7 @@ path.append(str(Path(__file__).parent.parent))
 
 from fastapi.testclient import TestClient
 from app.main import app
+from app.utils.columnar import decode_binary, decode_table
 from datetime import datetime, timezone
 
 client = TestClient(app)
@@ -42,6 +44,20 @@ def test_get_now():
     assert response.json()["data"]["minute"] == now.minute
 
 
+def test_get_now_is_served_from_the_snapshot():
+    """
+    Tests if the requests of the same minute get the same precomputed response.
+    """
+
+    first = client.get("/api/v4/now")
+    second = client.get("/api/v4/now")
+
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/json"
+    if first.json()["data"]["minute"] == second.json()["data"]["minute"]:
+        assert first.content == second.content
+
+
 def test_birth_data():
     """Test if the birth data is returned correctly"""
 
@@ -203,3 +219,358 @@ def test_birth_chart():
     assert round(response.json()["aspects"][0]["diff"]) == 58
     assert response.json()["aspects"][0]["p1"] == 0
     assert response.json()["aspects"][0]["p2"] == 1
+
+
+def test_natal_bundle():
+    """
+    Tests if the natal bundle returns the chart, the points with their house, the cusps and the aspects of the birth chart.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    }
+
+    response = client.post("/api/v4/natal-bundle", json={"subject": subject, "active_points": ["Sun", "Moon", "Ascendant", "Medium_Coeli"]})
+    birth_chart_response = client.post("/api/v4/birth-chart", json={"subject": subject, "active_points": ["Sun", "Moon", "Ascendant", "Medium_Coeli"]})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "OK"
+    assert response.json()["chart"] == birth_chart_response.json()["chart"]
+    assert response.json()["aspects"] == birth_chart_response.json()["aspects"]
+
+    points = response.json()["points"]
+    assert [point["name"] for point in points] == ["Sun", "Moon", "Ascendant", "Medium_Coeli"]
+    assert points[0]["house"] == "Ninth_House"
+    assert points[0]["house_number"] == 9
+    assert round(points[0]["abs_pos"]) == 261
+
+    house_cusps = response.json()["house_cusps"]
+    assert len(house_cusps) == 12
+    assert house_cusps[0] == response.json()["ascendant"] == response.json()["data"]["first_house"]["abs_pos"]
+    assert response.json()["medium_coeli"] == points[3]["abs_pos"]
+
+
+def test_batch_birth_data():
+    """
+    Tests if the batch birth data returns one result per subject, with per subject errors.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1946,
+        "month": 6,
+        "day": 16,
+        "hour": 10,
+        "minute": 10,
+        "longitude": 12.4963655,
+        "latitude": 41.9027835,
+        "city": "Roma",
+        "nation": "IT",
+        "timezone": "Europe/Rome",
+    }
+    # Ambiguous local time, the clocks went back from 03:00 to 02:00
+    ambiguous_subject = {**subject, "year": 2023, "month": 10, "day": 29, "hour": 2, "minute": 30}
+
+    response = client.post("/api/v4/batch/birth-data", json={"subjects": [subject, ambiguous_subject, subject]})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "OK"
+
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert [result["status"] for result in results] == ["OK", "ERROR", "OK"]
+    assert results[0]["data"]["sun"]["sign"] == "Gem"
+    assert results[0]["data"] == results[2]["data"]
+    assert results[1]["message"] == "Internal Server Error"
+
+
+def test_batch_birth_data_ndjson():
+    """
+    Tests if the batch birth data streams one JSON line per subject with the NDJSON Accept header.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1946,
+        "month": 6,
+        "day": 16,
+        "hour": 10,
+        "minute": 10,
+        "longitude": 12.4963655,
+        "latitude": 41.9027835,
+        "city": "Roma",
+        "nation": "IT",
+        "timezone": "Europe/Rome",
+    }
+
+    response = client.post(
+        "/api/v4/batch/birth-data",
+        json={"subjects": [subject, {**subject, "hour": 22}]},
+        headers={"Accept": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1]
+    assert all(line["status"] == "OK" for line in lines)
+
+    json_results = client.post("/api/v4/batch/birth-data", json={"subjects": [subject, {**subject, "hour": 22}]}).json()["results"]
+    assert sorted(lines, key=lambda line: line["index"]) == json_results
+
+
+def test_batch_natal_aspects_data():
+    """
+    Tests if the batch natal aspects data returns the same aspects of the single subject endpoint.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    }
+
+    single_response = client.post("/api/v4/natal-aspects-data", json={"subject": subject})
+    batch_response = client.post("/api/v4/batch/natal-aspects-data", json={"subjects": [subject]})
+
+    assert batch_response.status_code == 200
+    assert batch_response.json()["results"][0]["aspects"] == single_response.json()["aspects"]
+
+    empty_response = client.post("/api/v4/batch/natal-aspects-data", json={"subjects": []})
+    assert empty_response.status_code == 422
+
+
+def test_batch_natal_aspects_data_columnar():
+    """
+    Tests if the columnar formats of the batch natal aspects data hold the results of the JSON response.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    }
+    payload = {"subjects": [subject, {**subject, "hour": 22}]}
+
+    json_results = client.post("/api/v4/batch/natal-aspects-data", json=payload).json()["results"]
+    columnar_response = client.post("/api/v4/batch/natal-aspects-data?format=columnar", json=payload)
+    binary_response = client.post("/api/v4/batch/natal-aspects-data", json=payload, headers={"Accept": "application/vnd.astrologer.columnar"})
+
+    assert columnar_response.status_code == 200
+    assert columnar_response.headers["content-type"] == "application/vnd.astrologer.columnar+json"
+    assert binary_response.headers["content-type"] == "application/vnd.astrologer.columnar"
+
+    table = columnar_response.json()["results"]
+    rows = decode_table(table)
+    assert [row["data.subject.sun.sign"] for row in rows] == [result["data"]["subject"]["sun"]["sign"] for result in json_results]
+    assert len(table["tables"]["aspects"]["columns"]["parent"]) == sum(len(result["aspects"]) for result in json_results)
+
+    binary_table = decode_binary(binary_response.content, "results")["results"]
+    assert binary_table["lookups"] == table["lookups"]
+    assert binary_table["columns"]["data.subject.hour"] == [12, 22]
+    for binary_position, position in zip(binary_table["columns"]["data.subject.sun.abs_pos"], table["columns"]["data.subject.sun.abs_pos"]):
+        assert abs(binary_position - position) < 1e-4
+
+
+def test_ephemeris():
+    """
+    Tests if the ephemeris series has one sample per step and the positions of the birth data.
+    """
+
+    response = client.post(
+        "/api/v4/ephemeris",
+        json={
+            "start": "1980-12-10T12:12:00",
+            "end": "1980-12-12T12:12:00",
+            "step": "P1D",
+            "timezone": "Europe/London",
+            "latitude": 51.4825766,
+            "longitude": 0,
+            "active_points": ["Sun", "Mercury", "Mean_South_Node", "Ascendant"],
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "OK"
+
+    data = response.json()["data"]
+    assert data["timestamps"] == [345298320, 345384720, 345471120]
+    assert list(data["points"]) == ["Sun", "Mercury", "Mean_South_Node", "Ascendant"]
+
+    birth_data = client.post(
+        "/api/v4/birth-data",
+        json={
+            "subject": {
+                "name": "Ephemeris Unit Test",
+                "year": 1980,
+                "month": 12,
+                "day": 12,
+                "hour": 12,
+                "minute": 12,
+                "longitude": 0,
+                "latitude": 51.4825766,
+                "city": "London",
+                "nation": "GB",
+                "timezone": "Europe/London",
+            }
+        },
+    ).json()["data"]
+
+    for point, key in [("Sun", "sun"), ("Mercury", "mercury"), ("Mean_South_Node", "mean_south_node"), ("Ascendant", "ascendant")]:
+        assert len(data["points"][point]["longitude"]) == 3
+        assert abs(data["points"][point]["longitude"][-1] - birth_data[key]["abs_pos"]) < 1e-6
+        assert data["points"][point]["retrograde"][-1] == birth_data[key]["retrograde"]
+
+
+def test_ephemeris_range_validation():
+    """
+    Tests if reversed ranges and too many samples are rejected.
+    """
+
+    reversed_response = client.post("/api/v4/ephemeris", json={"start": "2024-01-02T00:00:00", "end": "2024-01-01T00:00:00"})
+    too_long_response = client.post("/api/v4/ephemeris", json={"start": "1900-01-01T00:00:00", "end": "2024-01-01T00:00:00", "step": "PT1M"})
+
+    assert reversed_response.status_code == 422
+    assert too_long_response.status_code == 422
+
+
+def test_transit_events():
+    """
+    Tests if the transit events have the known ingresses and stations, and exact aspects to the natal points.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    }
+
+    response = client.post(
+        "/api/v4/transit-events",
+        json={
+            "subject": subject,
+            "start": "2024-01-01T00:00:00",
+            "end": "2024-02-01T00:00:00",
+            "active_points": ["Sun", "Mercury"],
+            "active_aspects": [{"name": "conjunction", "orb": 10}, {"name": "semi-sextile", "orb": 2}],
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "OK"
+
+    events = response.json()["events"]
+    assert [event["timestamp"] for event in events] == sorted(event["timestamp"] for event in events)
+
+    sun_ingress = next(event for event in events if event["type"] == "ingress" and event["point"] == "Sun")
+    assert sun_ingress["sign"] == "Aqu"
+    assert sun_ingress["date"].startswith("2024-01-20T14:0")
+
+    mercury_station = next(event for event in events if event["type"] == "station")
+    assert mercury_station["point"] == "Mercury"
+    assert mercury_station["direction"] == "direct"
+    assert mercury_station["date"].startswith("2024-01-02T03:0")
+
+    natal_positions = client.post("/api/v4/birth-data", json={"subject": subject}).json()["data"]
+    aspect_events = [event for event in events if event["type"] == "aspect"]
+    assert aspect_events
+    for event in aspect_events:
+        natal_position = natal_positions[event["natal_point"].lower()]["abs_pos"]
+        distance = abs((event["longitude"] - natal_position + 180) % 360 - 180)
+        assert abs(distance - event["aspect_degrees"]) < 1e-4
+
+
+def test_natal_session_transits():
+    """
+    Tests if the transit requests with a natal_id return the same data and aspects of the requests with the natal subject.
+    """
+
+    subject = {
+        "name": "FastAPI Unit Test",
+        "year": 1980,
+        "month": 12,
+        "day": 12,
+        "hour": 12,
+        "minute": 12,
+        "longitude": 0,
+        "latitude": 51.4825766,
+        "city": "London",
+        "nation": "GB",
+        "timezone": "Europe/London",
+    }
+    transit_subject = {**subject, "year": 2024, "month": 1, "day": 1, "hour": 0, "minute": 0}
+
+    session_response = client.post("/api/v4/natal-sessions", json={"subject": subject})
+    assert session_response.status_code == 200
+    assert session_response.json()["data"]["subject"]["sun"]["sign"] == "Sag"
+
+    natal_id = session_response.json()["natal_id"]
+    assert client.post("/api/v4/natal-sessions", json={"subject": subject}).json()["natal_id"] == natal_id
+
+    subject_response = client.post("/api/v4/transit-aspects-data", json={"first_subject": subject, "transit_subject": transit_subject})
+    natal_id_response = client.post("/api/v4/transit-aspects-data", json={"natal_id": natal_id, "transit_subject": transit_subject})
+
+    assert natal_id_response.status_code == 200
+    assert natal_id_response.json() == subject_response.json()
+
+    unknown_response = client.post("/api/v4/transit-aspects-data", json={"natal_id": "unknown", "transit_subject": transit_subject})
+    missing_response = client.post("/api/v4/transit-aspects-data", json={"transit_subject": transit_subject})
+
+    assert unknown_response.status_code == 404
+    assert unknown_response.json()["status"] == "ERROR"
+    assert missing_response.status_code == 422
+
+
+def test_ephemeris_columnar():
+    """
+    Tests if the columnar binary ephemeris has a column per point and field, with the values of the JSON response.
+    """
+
+    payload = {"start": "2024-01-01T00:00:00", "end": "2024-01-31T00:00:00", "step": "P1D", "active_points": ["Sun", "Mercury"]}
+
+    data = client.post("/api/v4/ephemeris", json=payload).json()["data"]
+    response = client.post("/api/v4/ephemeris?format=columnar-binary", json=payload)
+
+    assert response.status_code == 200
+
+    table = decode_binary(response.content, "data")["data"]
+    assert table["length"] == 31
+    assert table["columns"]["timestamp"] == data["timestamps"]
+    assert table["columns"]["Mercury.retrograde"] == data["points"]["Mercury"]["retrograde"]
+    for binary_longitude, longitude in zip(table["columns"]["Sun.longitude"], data["points"]["Sun"]["longitude"]):
+        assert abs(binary_longitude - longitude) < 1e-4
@@ -0,0 +1,131 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routers import metrics_router as metrics_router_module
+from app.middleware.secret_key_checker_middleware import SecretKeyCheckerMiddleware
+from app.utils.prometheus_writer import PrometheusWriter
+from app.utils.request_metrics import request_metrics
+from app.utils.secret_key_registry import SecretKeyRegistry, get_key_label
+
+client = TestClient(app)
+
+
+def test_metrics():
+    """
+    Tests if the metrics count the requests and the errors by endpoint and expose the executor and the caches.
+    """
+
+    request_metrics.clear()
+
+    subject = {
+        "name": "Metrics Unit Test",
+        "year": 2023,
+        "month": 10,
+        "day": 29,
+        "hour": 2,
+        "minute": 30,
+        "longitude": 12.4963655,
+        "latitude": 41.9027835,
+        "city": "Roma",
+        "nation": "IT",
+        "timezone": "Europe/Rome",
+    }
+
+    client.get("/api/v4/health")
+    # Ambiguous local time, the item fails with an internal error
+    client.post("/api/v4/batch/birth-data", json={"subjects": [subject]})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    lines = response.text.splitlines()
+    assert 'astrologer_requests_total{endpoint="/api/v4/health",method="GET",status="200"} 1' in lines
+    assert 'astrologer_errors_total{endpoint="/api/v4/batch/birth-data",class="internal"} 1' in lines
+    assert 'astrologer_request_duration_seconds_count{endpoint="/api/v4/health"} 1' in lines
+    assert "astrologer_executor_queue_depth 0" in lines
+    assert any(line.startswith('astrologer_cache_hit_ratio{cache="chart"}') for line in lines)
+
+    assert "/metrics" not in app.openapi()["paths"]
+
+
+def test_metrics_path_is_excluded_from_the_secret_key_check():
+    """
+    Tests if the excluded paths do not need the secret key.
+    """
+
+    test_app = FastAPI()
+    test_app.add_middleware(SecretKeyCheckerMiddleware, secret_key_name="X-Test-Secret", registry=SecretKeyRegistry(keys=["valid-key"]), excluded_paths=["/metrics"])
+
+    @test_app.get("/metrics")
+    async def metrics() -> dict:
+        return {}
+
+    @test_app.get("/api/v4/health")
+    async def health() -> dict:
+        return {}
+
+    test_client = TestClient(test_app)
+
+    assert test_client.get("/metrics").status_code == 200
+    assert test_client.get("/api/v4/health").status_code == 400
+
+
+def test_metrics_do_not_expose_the_secret_key_labels(monkeypatch):
+    """
+    Tests if a request without a secret key gets the accepted requests, but not the labels of the keys.
+    """
+
+    registry = SecretKeyRegistry(keys=["customer-key"])
+    registry.check("customer-key")
+    registry.check("customer-key")
+    monkeypatch.setattr(metrics_router_module, "secret_key_registry", registry)
+
+    test_app = FastAPI()
+    test_app.add_middleware(SecretKeyCheckerMiddleware, secret_key_name="X-Test-Secret", registry=registry, excluded_paths=["/metrics"])
+    test_app.include_router(metrics_router_module.router)
+
+    response = TestClient(test_app).get("/metrics")
+
+    assert response.status_code == 200
+    assert "astrologer_secret_key_accepted_total 2" in response.text.splitlines()
+    assert "key=" not in response.text
+    assert get_key_label("customer-key") not in response.text
+
+
+def test_metrics_leave_out_the_caches_of_the_process_executor(monkeypatch):
+    """
+    Tests if the caches, filled in the worker processes, are not exported with the process executor.
+    """
+
+    monkeypatch.setattr(metrics_router_module.chart_executor, "backend", "process")
+
+    lines = metrics_router_module.get_metrics().splitlines()
+
+    assert "astrologer_executor_queue_depth 0" in lines
+    assert not any(line.startswith("astrologer_cache_") for line in lines)
+
+
+def test_prometheus_writer_escapes_labels():
+    """
+    Tests the exposition format of the samples.
+    """
+
+    writer = PrometheusWriter()
+    writer.add("example_total", "counter", "Example.", [({"path": 'a"b'}, 2), ({}, 0.5)])
+
+    assert writer.render().splitlines() == [
+        "# HELP astrologer_example_total Example.",
+        "# TYPE astrologer_example_total counter",
+        'astrologer_example_total{path="a\\"b"} 2',
+        "astrologer_example_total 0.5",
+    ]
@@ -0,0 +1,63 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import asyncio
+import time
+
+from app.utils.minute_snapshot import MinuteSnapshot
+
+
+def test_minute_snapshot_is_calculated_once_per_minute():
+    """
+    Tests if the snapshot is calculated once per minute and the past minutes are discarded.
+    """
+
+    now = [120.5]
+    rendered = []
+
+    def render(minute: int) -> bytes:
+        rendered.append(minute)
+        return str(minute).encode()
+
+    snapshot = MinuteSnapshot(render, clock=lambda: now[0])
+
+    async def scenario() -> list[bytes]:
+        first = await snapshot.get_current()
+        now[0] = 150
+        second = await snapshot.get_current()
+        precomputed = await snapshot.refresh(180)
+        now[0] = 185
+        third = await snapshot.get_current()
+        await snapshot.refresh(240)
+        return [first, second, precomputed, third]
+
+    assert asyncio.run(scenario()) == [b"120", b"120", b"180", b"180"]
+    assert rendered == [120, 180, 240]
+    assert snapshot.get(120) is None
+
+
+def test_minute_snapshot_concurrent_requests_share_the_calculation():
+    """
+    Tests if the concurrent requests of a new minute wait for a single calculation.
+    """
+
+    rendered = []
+
+    def render(minute: int) -> bytes:
+        rendered.append(minute)
+        time.sleep(0.05)
+        return str(minute).encode()
+
+    snapshot = MinuteSnapshot(render, clock=lambda: 120.5)
+
+    async def scenario() -> list[bytes]:
+        return await asyncio.gather(*(snapshot.get_current() for _ in range(10)))
+
+    assert asyncio.run(scenario()) == [b"120"] * 10
+    assert rendered == [120]
@@ -0,0 +1,82 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import pstats
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware.profiling_middleware import ProfilingMiddleware
+from app.utils.chart_executor import ChartExecutor
+
+
+def busy_calculation(duration: float) -> str:
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+
+    return "done"
+
+
+def create_client(directory: Path, always_allowed: bool, key_label: str | None = None) -> TestClient:
+    executor = ChartExecutor(backend="thread", max_workers=1)
+    app = FastAPI()
+
+    @app.get("/calculation")
+    async def calculation():
+        return {"result": await executor.run(busy_calculation, 0.05)}
+
+    profiled_app = ProfilingMiddleware(app, directory=directory, admin_keys=["key-admin"], always_allowed=always_allowed)
+
+    async def labelled_app(scope, receive, send):
+        # Stands for SecretKeyCheckerMiddleware
+        scope.setdefault("state", {})["secret_key_label"] = key_label
+        await profiled_app(scope, receive, send)
+
+    return TestClient(labelled_app)
+
+
+def test_cprofile(tmp_path):
+    """
+    Tests if the executor calls of a profiled request are saved in the pstats format.
+    """
+
+    response = create_client(tmp_path, always_allowed=True).get("/calculation", headers={"X-Debug-Profile": "cprofile"})
+
+    assert response.json() == {"result": "done"}
+    profile_path = tmp_path / response.headers["x-debug-profile-file"]
+    functions = {name for _, _, name in pstats.Stats(str(profile_path)).stats}  # type: ignore
+    assert "busy_calculation" in functions
+
+
+def test_sampling(tmp_path):
+    """
+    Tests if the stack samples are saved in the collapsed format, without the profiler frames.
+    """
+
+    response = create_client(tmp_path, always_allowed=True).get("/calculation", headers={"X-Debug-Profile": "sampling"})
+
+    lines = (tmp_path / response.headers["x-debug-profile-file"]).read_text().splitlines()
+    assert lines
+    assert any("busy_calculation (test_profiling.py" in line for line in lines)
+    assert not any("run_profiled" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profiling_admin_keys(tmp_path):
+    """
+    Tests if the profile header is ignored outside of debug mode, unless the key is an admin one.
+    """
+
+    response = create_client(tmp_path, always_allowed=False, key_label="key-other").get("/calculation", headers={"X-Debug-Profile": "cprofile"})
+    assert "x-debug-profile-file" not in response.headers
+    assert not any(tmp_path.iterdir())
+
+    response = create_client(tmp_path, always_allowed=False, key_label="key-admin").get("/calculation", headers={"X-Debug-Profile": "cprofile"})
+    assert (tmp_path / response.headers["x-debug-profile-file"]).exists()
@@ -0,0 +1,121 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import asyncio
+import sqlite3
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from app.middleware.rate_limit_middleware import RateLimitMiddleware
+from app.utils.rate_limiter import MemoryRateLimiter, SqliteRateLimiter
+
+
+def test_memory_rate_limiter():
+    """
+    Tests the token bucket and the in-flight limit of every key.
+    """
+
+    limiter = MemoryRateLimiter(rate=0.001, burst=10, max_in_flight=2)
+
+    first_slot, _ = limiter.acquire("customer", 4)
+    second_slot, _ = limiter.acquire("customer", 4)
+    assert first_slot is not None and second_slot is not None
+
+    # Both slots are in use
+    slot, retry_after = limiter.acquire("customer", 1)
+    assert slot is None and retry_after == limiter.IN_FLIGHT_RETRY_AFTER
+
+    # 2 tokens left
+    limiter.release(first_slot)
+    slot, retry_after = limiter.acquire("customer", 4)
+    assert slot is None and retry_after > 1000
+
+    # The other keys have their own bucket
+    assert limiter.acquire("other-customer", 10)[0] is not None
+    assert limiter.stats()["rejected"] == {"in_flight": 1, "rate": 1}
+
+
+def test_sqlite_rate_limiter_is_shared(tmp_path):
+    """
+    Tests if the limiters using the same database share buckets and slots.
+    """
+
+    first_worker = SqliteRateLimiter(tmp_path / "rate_limit.sqlite", rate=0.001, burst=5, max_in_flight=1)
+    second_worker = SqliteRateLimiter(tmp_path / "rate_limit.sqlite", rate=0.001, burst=5, max_in_flight=1)
+
+    slot, _ = first_worker.acquire("customer", 3)
+    assert slot is not None
+    assert second_worker.acquire("customer", 1)[0] is None
+
+    first_worker.release(slot)
+    assert second_worker.acquire("customer", 3)[0] is None
+    assert second_worker.acquire("customer", 2)[0] is not None
+
+
+def test_rate_limit_middleware():
+    """
+    Tests if the requests above the limit get a 429 with Retry-After, and the free paths are not limited.
+    """
+
+    test_app = FastAPI()
+    test_app.add_middleware(
+        RateLimitMiddleware,
+        limiter=MemoryRateLimiter(rate=0.001, burst=5),
+        costs={"/api/v4/health": 0, "/api/v4/birth-chart": 3},
+    )
+
+    @test_app.get("/api/v4/birth-chart")
+    async def birth_chart() -> dict:
+        return {"status": "OK"}
+
+    @test_app.get("/api/v4/health")
+    async def health() -> dict:
+        return {"status": "OK"}
+
+    client = TestClient(test_app)
+
+    assert client.get("/api/v4/birth-chart").status_code == 200
+
+    response = client.get("/api/v4/birth-chart")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+    assert all(client.get("/api/v4/health").status_code == 200 for _ in range(10))
+
+
+def test_sqlite_rate_limiter_does_not_block_the_event_loop(tmp_path):
+    """
+    Tests if the middleware keeps serving the event loop while the SQLite database is locked by another worker.
+    """
+
+    database_path = tmp_path / "rate_limit.sqlite"
+    middleware = RateLimitMiddleware(PlainTextResponse("OK"), limiter=SqliteRateLimiter(database_path, rate=1, burst=5))
+    messages = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    async def request_while_locked() -> None:
+        other_worker = sqlite3.connect(database_path, isolation_level=None)
+        other_worker.execute("BEGIN IMMEDIATE")
+
+        request = asyncio.create_task(middleware({"type": "http", "path": "/api/v4/birth-chart", "headers": [], "client": ("127.0.0.1", 1)}, receive, send))
+        await asyncio.sleep(0.2)
+        assert not request.done()
+
+        other_worker.execute("COMMIT")
+        await request
+
+    asyncio.run(request_while_locked())
+
+    assert messages[0]["status"] == 200
@@ -0,0 +1,108 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.middleware.secret_key_checker_middleware import SecretKeyCheckerMiddleware
+from app.utils.secret_key_registry import SecretKeyRegistry, get_key_label
+
+
+def test_secret_key_registry_reloads_the_keys_file(tmp_path):
+    """
+    Tests the lookup of the keys and the reload of the keys file when it changes.
+    """
+
+    keys_file = tmp_path / "keys.txt"
+    keys_file.write_text("# customers\nfirst-key first-customer\nsecond-key\n")
+
+    registry = SecretKeyRegistry(keys=["static-key", ""], keys_file=keys_file, reload_interval=0)
+
+    assert len(registry) == 3
+    assert registry.check("first-key") == "first-customer"
+    assert registry.check("second-key") == get_key_label("second-key")
+    assert registry.check("static-key") == get_key_label("static-key")
+    assert registry.check("first-ke") is None
+    assert registry.check("") is None
+
+    keys_file.write_text("third-key third-customer\n")
+    os.utime(keys_file, (0, 1))
+
+    assert registry.check("first-key") is None
+    assert registry.check("third-key") == "third-customer"
+    assert registry.check("static-key") is not None
+
+    # A missing file keeps the last keys
+    keys_file.unlink()
+    assert registry.reload() is False
+    assert registry.check("third-key") == "third-customer"
+
+    assert registry.stats()["requests"]["third-customer"] == 2
+    assert registry.stats()["rejected"] == 3
+
+
+def test_secret_key_checker_middleware():
+    """
+    Tests if the middleware rejects the requests without a valid key and stores the key label.
+    """
+
+    test_app = FastAPI()
+    test_app.add_middleware(SecretKeyCheckerMiddleware, secret_key_name="X-Test-Secret", registry=SecretKeyRegistry(keys=["valid-key"]))
+
+    @test_app.get("/label")
+    async def label(request: Request) -> dict:
+        return {"label": request.state.secret_key_label}
+
+    client = TestClient(test_app)
+
+    assert client.get("/label").status_code == 400
+    assert client.get("/label", headers={"X-Test-Secret": "wrong-key"}).status_code == 400
+
+    response = client.get("/label", headers={"X-Test-Secret": "valid-key:suffix"})
+    assert response.status_code == 200
+    assert response.json()["label"] == get_key_label("valid-key")
+
+
+def test_secret_keys_file_fails_closed(tmp_path):
+    """
+    Tests if an empty or unreadable keys file keeps the last keys, and if the middleware rejects the requests while there are none.
+    """
+
+    keys_file = tmp_path / "keys.txt"
+    keys_file.write_text("")
+
+    registry = SecretKeyRegistry(keys_file=keys_file, reload_interval=0)
+    assert len(registry) == 0
+
+    test_app = FastAPI()
+    test_app.add_middleware(SecretKeyCheckerMiddleware, secret_key_name="X-Test-Secret", registry=registry)
+
+    @test_app.get("/")
+    async def root() -> dict:
+        return {"status": "OK"}
+
+    client = TestClient(test_app)
+
+    assert client.get("/").status_code == 400
+
+    keys_file.write_text("first-key first-customer\n")
+    os.utime(keys_file, (0, 1))
+    assert client.get("/", headers={"X-Test-Secret": "first-key"}).status_code == 200
+
+    # Truncated or undecodable while it is rewritten
+    keys_file.write_text("# only a comment\n")
+    os.utime(keys_file, (0, 2))
+    assert client.get("/", headers={"X-Test-Secret": "first-key"}).status_code == 200
+
+    keys_file.write_bytes(b"\xff\xfe\xfa")
+    os.utime(keys_file, (0, 3))
+    assert client.get("/", headers={"X-Test-Secret": "first-key"}).status_code == 200
+    assert client.get("/").status_code == 400
+    assert len(registry) == 1
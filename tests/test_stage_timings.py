@@ -0,0 +1,84 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.histogram import Histogram
+from app.utils.stage_timings import get_server_timing_header, run_with_timings, stage_histograms, time_stage
+
+client = TestClient(app)
+
+
+def test_server_timing_header():
+    """
+    Tests if the chart requests report the duration of their stages and aggregate them by endpoint.
+    """
+
+    stage_histograms.clear()
+
+    response = client.post(
+        "/api/v4/birth-chart",
+        json={
+            "subject": {
+                "name": "Stage Timings Unit Test",
+                "year": 1975,
+                "month": 5,
+                "day": 5,
+                "hour": 5,
+                "minute": 5,
+                "longitude": 0,
+                "latitude": 51.4825766,
+                "city": "London",
+                "nation": "GB",
+                "timezone": "Europe/London",
+            },
+            "wheel_only": True,
+        },
+    )
+
+    stages = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    assert {"aspects", "serialization", "total"} <= set(stages)
+
+    observed = {labels for labels, _ in stage_histograms.items()}
+    assert ("/api/v4/birth-chart", "total") in observed
+
+
+def test_run_with_timings():
+    """
+    Tests if the stages of a function are collected and summed.
+    """
+
+    def calculation() -> str:
+        with time_stage("subject"):
+            pass
+        with time_stage("subject"):
+            pass
+        return "done"
+
+    result, timings = run_with_timings(calculation)
+
+    assert result == "done"
+    assert list(timings) == ["subject"]
+    assert get_server_timing_header({"svg": 0.2304}) == "svg;dur=230.4"
+
+
+def test_histogram():
+    """
+    Tests the buckets and the quantiles of the histogram.
+    """
+
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative_counts() == [2, 3, 4]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.99) == float("inf")
+    assert histogram.sum == 2.65
@@ -0,0 +1,77 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+from app.types.request_models import SubjectModel
+from app.utils.build_astrological_subject import build_astrological_subject
+from app.utils.lru_cache import LRUCache
+from app.utils.subject_cache import subject_cache, get_subject_cache_key
+
+
+SUBJECT = {
+    "name": "Cache Unit Test",
+    "year": 1980,
+    "month": 12,
+    "day": 12,
+    "hour": 12,
+    "minute": 12,
+    "longitude": 0,
+    "latitude": 51.4825766,
+    "city": "London",
+    "nation": "GB",
+    "timezone": "Europe/London",
+}
+
+
+def test_subject_cache_key_is_canonical():
+    """
+    Tests if the key does not depend on the order of the arguments.
+    """
+
+    assert get_subject_cache_key({"a": 1, "b": "x"}) == get_subject_cache_key({"b": "x", "a": 1})
+    assert get_subject_cache_key({"a": 1}) != get_subject_cache_key({"a": 2})
+
+
+def test_lru_cache_eviction_and_ttl():
+    """
+    Tests the size and the time to live eviction of the LRU cache.
+    """
+
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+    expired_cache = LRUCache(max_size=2, ttl=1)
+    expired_cache.set("a", 1)
+    expired_cache._entries["a"] = (1.0, 1)
+
+    assert expired_cache.get("a") is None
+    assert len(expired_cache) == 0
+
+
+def test_subject_is_reused():
+    """
+    Tests if the same subject is calculated only once.
+    """
+
+    subject_cache.clear()
+
+    first = build_astrological_subject(SubjectModel(**SUBJECT))
+    second = build_astrological_subject(SubjectModel(**SUBJECT))
+    other = build_astrological_subject(SubjectModel(**{**SUBJECT, "minute": 13}))
+
+    assert first is second
+    assert other is not first
+    assert subject_cache.stats()["hits"] == 1
+    assert subject_cache.stats()["misses"] == 2
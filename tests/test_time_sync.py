@@ -0,0 +1,47 @@
+"""
+    This is part of Astrologer API (C) 2023 Giacomo Battaglia
+"""
+
+from sys import path
+from pathlib import Path
+
+path.append(str(Path(__file__).parent.parent))
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.utils.time_sync import TimeSync
+
+
+def unreachable_source() -> datetime:
+    raise TimeoutError("Timeout during NTP request")
+
+
+def test_time_sync_uses_local_clock_until_synchronized():
+    """
+    Tests if the local clock is used before the first synchronization and when every source fails.
+    """
+
+    time_sync = TimeSync(sources=[("ntp", unreachable_source)])
+
+    assert abs(time_sync.timestamp() - time.time()) < 1
+    assert time_sync.sync() is False
+    assert time_sync.stats()["source"] == "local"
+    assert time_sync.stats()["failures"] == 1
+
+
+def test_time_sync_applies_the_source_offset():
+    """
+    Tests if the synchronized time follows the source, falling back to the next source on errors.
+    """
+
+    def late_source() -> datetime:
+        # Naive datetimes, like the Google Date header, are UTC
+        return (datetime.now(timezone.utc) + timedelta(hours=1)).replace(tzinfo=None)
+
+    time_sync = TimeSync(sources=[("ntp", unreachable_source), ("google", late_source)])
+
+    assert time_sync.sync() is True
+    assert time_sync.stats()["source"] == "google"
+    assert abs(time_sync.offset - 3600) < 1
+    assert abs((time_sync.utcnow() - datetime.now(timezone.utc)).total_seconds() - 3600) < 1